@@ -1,15 +1,27 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, FileResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 import json
 import os
-from services.deepseek_service import generate_cover_html
+from services.deepseek_service import (
+    startup_deepseek_client, shutdown_deepseek_client, get_usage_stats, get_limiter_stats
+)
 from services.cache_service import cache_service
+from services.compression import accepts, decompress
+from services.template_registry import template_registry
+from services.singleflight import generation_flight
+from services.circuit_breaker import upstream_breaker
+from services.batch_service import generate_batch
+from services.job_queue import get_job_queue, shutdown_job_queue, startup_job_queue
+from services.cache_warmer import cache_warmer, prewarm_items
+from services.preview_renderer import etag_matches
+from services.metrics import MetricsMiddleware, registry as metrics_registry
+from services.static_assets import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, Asset, static_assets
+from routers.generate import GeneratePayload, router as generate_router
 
-TEMPLATES_JSON = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'templates.json')
-FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'frontend')
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'frontend')
 
 app = FastAPI(title='XHS Banner Generator API')
 
@@ -23,103 +35,225 @@ app.add_middleware(
     allow_methods=['*'],
     allow_headers=['*'],
 )
+app.add_middleware(MetricsMiddleware)
+app.include_router(generate_router)
+
 
+class BatchPayload(BaseModel):
+    items: list[GeneratePayload]
+    concurrency: int | None = None
 
-class GeneratePayload(BaseModel):
-    title: str
+
+class WarmPayload(BaseModel):
+    titles: list[str]
     author: str | None = ''
-    style_id: str
+    style_ids: list[str] | None = None
 
 
+@app.on_event('startup')
 def load_templates():
-    try:
-        with open(TEMPLATES_JSON, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data['templates']
-    except Exception as e:
-        print(f"Error loading templates: {e}")
-        return []
+    """启动时加载模板到内存"""
+    template_registry.load()
+
+
+@app.on_event('startup')
+def build_static_assets():
+    """启动时为前端资源生成带哈希的地址与预压缩版本"""
+    static_assets.build()
+
+
+@app.on_event('startup')
+async def warmup_deepseek():
+    """启动时创建共享的 DeepSeek 连接池并预热"""
+    await startup_deepseek_client()
+
+
+@app.on_event('shutdown')
+async def close_deepseek():
+    await shutdown_deepseek_client()
+
+
+@app.on_event('startup')
+async def start_job_workers():
+    """创建后台任务队列并启动工作协程"""
+    await startup_job_queue()
+
+
+@app.on_event('shutdown')
+async def stop_job_workers():
+    await shutdown_job_queue()
+
+
+@app.on_event('startup')
+async def start_cache_warmer():
+    """恢复热点列表并启动后台预热"""
+    if os.environ.get('WARM_ENABLED', '1') != '0':
+        await cache_warmer.start()
+
+
+@app.on_event('shutdown')
+async def stop_cache_warmer():
+    await cache_warmer.stop()
+
+
+def asset_response(request: Request, asset: Asset, immutable: bool) -> Response:
+    """
+    返回静态资源：带哈希的地址长期强缓存，其余地址要求回源校验 ETag
+    """
+    headers = {
+        'ETag': asset.etag,
+        'Cache-Control': IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+        'Vary': 'Accept-Encoding',
+    }
+    if etag_matches(request.headers.get('if-none-match', ''), asset.etag):
+        return Response(status_code=304, headers=headers)
+    encoding, data = asset.negotiate(request.headers.get('accept-encoding', ''))
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return Response(content=data, media_type=asset.media_type, headers=headers)
 
 
 @app.get('/')
-def serve_index():
-    """提供前端首页"""
-    return FileResponse(FRONTEND_DIR / 'index.html')
-
-
-@app.get('/styles')
-def list_styles():
-    templates = load_templates()
-    return [{
-        'id': t['id'],
-        'name': t['name'],
-        'description': t.get('description', ''),
-        'example_image': t.get('example_image', ''),
-    } for t in templates]
-
-
-@app.post('/generate/preview')
-def generate_preview(payload: GeneratePayload):
-    templates = load_templates()
-    target = next((t for t in templates if t['id'] == payload.style_id), None)
-    if not target:
-        return {'html': '<!doctype html><html><body>未找到该风格</body></html>'}
-
-    # 占位：这里不接AI，输出最小可用HTML，便于前端预览
-    title = payload.title
-    author = payload.author or ''
-    style_name = target['name']
-    html = f"""<!doctype html>
-<html lang='zh-CN'>
-<head>
-  <meta charset='utf-8'>
-  <meta name='viewport' content='width=device-width, initial-scale=1'>
-  <title>{style_name} - 预览</title>
-  <style>
-    body {{ margin:0; background:#f5f5f5; font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial; }}
-    .card {{ width: 720px; height: 960px; margin: 24px auto; background:#fff; display:flex; flex-direction:column; justify-content:center; align-items:center; border-radius: 8px; box-shadow:0 8px 24px rgba(0,0,0,.08); }}
-    h1 {{ font-size: 48px; margin: 0 24px 12px; text-align:center; }}
-    p {{ color:#666; margin: 0 24px; }}
-  </style>
-  </head>
-  <body>
-    <div class='card'>
-      <h1>{title}</h1>
-      <p>{author}</p>
-      <p style='margin-top:24px;color:#999;'>风格：{style_name}</p>
-    </div>
-  </body>
-</html>"""
-    return {'html': html}
-
-
-@app.post('/generate/ai')
-def generate_ai(payload: GeneratePayload):
-    templates = load_templates()
-    target = next((t for t in templates if t['id'] == payload.style_id), None)
-    if not target:
+def serve_index(request: Request):
+    """提供前端首页，其中的资源引用已改写为带哈希的地址"""
+    if static_assets.index is None:
+        return FileResponse(os.path.join(FRONTEND_DIR, 'index.html'))
+    return asset_response(request, static_assets.index, immutable=False)
+
+
+@app.get('/css/{name}')
+@app.get('/js/{name}')
+def serve_asset(name: str, request: Request):
+    """提供前端 CSS/JS 资源"""
+    found = static_assets.get(request.url.path.lstrip('/'))
+    if found is None:
+        raise HTTPException(status_code=404, detail='资源不存在')
+    asset, immutable = found
+    return asset_response(request, asset, immutable)
+
+
+@app.post('/generate/batch')
+async def generate_batch_endpoint(payload: BatchPayload):
+    """批量生成封面，以 NDJSON 按完成顺序流式返回每条结果"""
+    max_items = int(os.environ.get('BATCH_MAX_ITEMS', '2000'))
+    if len(payload.items) > max_items:
+        return JSONResponse(status_code=413, content={
+            'error': {
+                'code': 'BATCH_TOO_LARGE',
+                'message': f'单次最多提交 {max_items} 条'
+            }
+        })
+
+    async def lines():
+        items = [
+            {'title': item.title, 'author': item.author or '', 'style_id': item.style_id}
+            for item in payload.items
+        ]
+        async for result in generate_batch(items, payload.concurrency):
+            yield json.dumps(result, ensure_ascii=False) + '\n'
+
+    return StreamingResponse(lines(), media_type='application/x-ndjson')
+
+
+@app.post('/jobs', status_code=202)
+def submit_job(payload: GeneratePayload):
+    """提交异步生成任务，立即返回任务ID"""
+    if not template_registry.get(payload.style_id):
         return JSONResponse(status_code=404, content={
             'error': {
                 'code': 'STYLE_NOT_FOUND',
                 'message': '未找到该风格'
             }
         })
-    try:
-        html = generate_cover_html(payload.title, payload.author or '', target)
-        return { 'html': html }
-    except Exception as e:
-        return JSONResponse(status_code=500, content={
+    job_id = get_job_queue().submit(payload.title, payload.author or '', payload.style_id)
+    return {'job_id': job_id, 'status': 'queued'}
+
+
+@app.get('/jobs/stats')
+def get_job_stats():
+    """获取任务队列深度与等待时间"""
+    return get_job_queue().get_stats()
+
+
+@app.get('/jobs/{job_id}')
+async def get_job(job_id: str, wait: float = 0):
+    """查询任务状态；wait>0 时长轮询直到任务结束或超时（最多30秒）"""
+    job = await get_job_queue().wait(job_id, min(max(wait, 0), 30))
+    if job is None:
+        return JSONResponse(status_code=404, content={
             'error': {
-                'code': 'AI_GENERATE_FAILED',
-                'message': f'AI生成失败: {e}'
+                'code': 'JOB_NOT_FOUND',
+                'message': '任务不存在'
             }
         })
+    return job
+
+
+@app.get('/covers/{cache_key}')
+def get_cover(cache_key: str, request: Request):
+    """按缓存键直接返回封面HTML，客户端支持时原样下发压缩数据"""
+    encoded = cache_service.get_encoded(cache_key)
+    if encoded is None:
+        raise HTTPException(status_code=404, detail='封面不存在或已过期')
+    codec, data = encoded
+    headers = {'Vary': 'Accept-Encoding'}
+    if accepts(request.headers.get('accept-encoding', ''), codec):
+        headers['Content-Encoding'] = codec
+        return Response(content=data, media_type='text/html; charset=utf-8', headers=headers)
+    return Response(content=decompress(codec, data), media_type='text/html; charset=utf-8', headers=headers)
 
 
 @app.get('/cache/stats')
 def get_cache_stats():
     """获取缓存统计信息"""
-    return cache_service.get_cache_stats()
+    stats = cache_service.get_cache_stats()
+    stats['singleflight'] = generation_flight.get_stats()
+    stats['prompt_cache'] = get_usage_stats()
+    stats['warmer'] = cache_warmer.get_stats()
+    return stats
+
+
+@app.post('/cache/warm', status_code=202)
+def warm_cache(payload: WarmPayload):
+    """为标题列表在全部（或指定）风格下预生成封面，作为后台任务排队执行"""
+    unknown = [s for s in payload.style_ids or [] if not template_registry.get(s)]
+    if unknown:
+        return JSONResponse(status_code=404, content={
+            'error': {
+                'code': 'STYLE_NOT_FOUND',
+                'message': f"未找到该风格: {', '.join(unknown)}"
+            }
+        })
+    items = prewarm_items(payload.titles, payload.author or '', payload.style_ids)
+    max_items = int(os.environ.get('BATCH_MAX_ITEMS', '2000'))
+    if len(items) > max_items:
+        return JSONResponse(status_code=413, content={
+            'error': {
+                'code': 'BATCH_TOO_LARGE',
+                'message': f'单次最多预生成 {max_items} 个封面'
+            }
+        })
+    # 已有有效缓存的条目不再排队；预热不是用户访问，检查与执行都不计入命中统计与热度
+    pending = [i for i in items if cache_service.get(i['title'], i['author'], i['style_id'], record=False) is None]
+    job_queue = get_job_queue()
+    job_ids = [job_queue.submit(i['title'], i['author'], i['style_id'], prewarm=True) for i in pending]
+    return {'queued': len(job_ids), 'cached': len(items) - len(pending), 'job_ids': job_ids}
+
+
+@app.get('/upstream/stats')
+def get_upstream_stats():
+    """获取上游 DeepSeek 调用的限流状态与 token 用量"""
+    return {
+        'circuit_breaker': upstream_breaker.get_stats(),
+        'limiter': get_limiter_stats(),
+        'usage': get_usage_stats(),
+    }
+
+
+@app.get('/metrics')
+def get_metrics():
+    """以 Prometheus 文本格式导出请求、缓存与上游调用指标"""
+    return Response(content=metrics_registry.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 @app.post('/cache/clear')
@@ -129,6 +263,19 @@ def clear_cache():
     return {'message': f'已清理 {cleared_count} 个缓存文件'}
 
 
+@app.post('/cache/invalidate')
+async def invalidate_cache(style_id: str, rewarm: bool = False):
+    """只清除某个风格的缓存（如修改模板之后），可选按热度在后台限速重新生成"""
+    cleared_count, items = cache_service.invalidate_style(style_id)
+    queued = cache_warmer.rewarm(items) if rewarm and template_registry.get(style_id) else 0
+    return {
+        'message': f'已清理 {cleared_count} 个缓存文件',
+        'style_id': style_id,
+        'invalidated': cleared_count,
+        'rewarm_queued': queued,
+    }
+
+
 @app.post('/cache/clear-expired')
 def clear_expired_cache():
     """清理过期缓存"""
@@ -0,0 +1,6 @@
+"""
+backend/app.py 与 Vercel 入口 api/index.py 共用的路由
+
+路由模块在加载时只导入预览所需的轻量 services，AI生成相关模块在第一次请求时才导入，
+保证 serverless 冷启动不加载 httpx 与缓存后端。
+"""
@@ -0,0 +1,179 @@
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel
+
+from services.preview_renderer import NOT_FOUND_HTML, etag_matches, preview_etag, render_preview
+from services.static_assets import REVALIDATE_CACHE_CONTROL
+from services.template_registry import template_registry
+
+router = APIRouter()
+
+
+# Vercel 运行时为 Python 3.9，不能使用 X | None 写法
+class GeneratePayload(BaseModel):
+    title: str
+    author: Optional[str] = ''
+    style_id: str
+
+
+@router.get('/styles')
+def list_styles(request: Request):
+    # 风格列表只随 templates.json 变化，以其内容哈希作为 ETag
+    etag = f'"{template_registry.version[:32]}"'
+    headers = {'ETag': etag, 'Cache-Control': REVALIDATE_CACHE_CONTROL}
+    if etag_matches(request.headers.get('if-none-match', ''), etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=template_registry.list_styles(), headers=headers)
+
+
+def preview_response(request: Request, title: str, author: str, style_id: str, raw: bool) -> Response:
+    """
+    生成预览响应：携带强 ETag，客户端 If-None-Match 命中时返回 304 而不重新渲染
+
+    Args:
+        raw: True 时直接返回 text/html，否则返回 {'html': ...} JSON
+    """
+    target = template_registry.get(style_id)
+    if not target:
+        if raw:
+            return Response(content=NOT_FOUND_HTML, status_code=404, media_type='text/html; charset=utf-8')
+        return JSONResponse(content={'html': NOT_FOUND_HTML})
+
+    etag = preview_etag(title, author, style_id, template_registry.version)
+    # no-cache：浏览器每次都带 If-None-Match 回源校验，内容未变时只返回 304
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept'}
+    if etag_matches(request.headers.get('if-none-match', ''), etag):
+        return Response(status_code=304, headers=headers)
+
+    html = render_preview(title, author, target)
+    if raw:
+        return Response(content=html, media_type='text/html; charset=utf-8', headers=headers)
+    return JSONResponse(content={'html': html}, headers=headers)
+
+
+def wants_html(request: Request, format: Optional[str]) -> bool:
+    """format=html 或 Accept 头优先 text/html 时返回原始HTML"""
+    if format:
+        return format == 'html'
+    accept = request.headers.get('accept', '')
+    return 'text/html' in accept and 'application/json' not in accept
+
+
+@router.post('/generate/preview')
+def generate_preview(payload: GeneratePayload, request: Request, format: Optional[str] = None):
+    # 占位：这里不接AI，输出最小可用HTML，便于前端预览
+    return preview_response(request, payload.title, payload.author or '', payload.style_id,
+                            wants_html(request, format))
+
+
+@router.get('/generate/preview')
+def get_preview(request: Request, title: str, style_id: str, author: str = '', format: Optional[str] = None):
+    """GET 版本的预览，默认返回 text/html，便于浏览器按 ETag 缓存"""
+    return preview_response(request, title, author, style_id, format != 'json')
+
+
+@router.post('/generate/ai')
+async def generate_ai(payload: GeneratePayload):
+    target = template_registry.get(payload.style_id)
+    if not target:
+        return JSONResponse(status_code=404, content={
+            'error': {
+                'code': 'STYLE_NOT_FOUND',
+                'message': '未找到该风格'
+            }
+        })
+
+    # 延迟导入：只有真正需要调用AI的请求才加载 httpx 与缓存后端
+    from services.cache_service import cache_service
+    from services.circuit_breaker import CircuitOpenError
+    from services.deepseek_service import CachedFailureError, generate_cover_html
+
+    try:
+        html = await generate_cover_html(payload.title, payload.author or '', target)
+        return {
+            'html': html,
+            'cache_key': cache_service.cache_key(payload.title, payload.author or '', payload.style_id)
+        }
+    except CircuitOpenError as e:
+        return JSONResponse(status_code=503, content={
+            'error': {
+                'code': 'UPSTREAM_UNAVAILABLE',
+                'message': str(e)
+            }
+        })
+    except CachedFailureError as e:
+        # 最近生成失败，负缓存期内不再调用AI
+        return JSONResponse(status_code=500, headers={'Retry-After': str(int(e.retry_after) + 1)}, content={
+            'error': {
+                'code': 'AI_GENERATE_FAILED',
+                'message': f'AI生成失败: {e}',
+                'retry_after': round(e.retry_after, 1)
+            }
+        })
+    except Exception as e:
+        return JSONResponse(status_code=500, content={
+            'error': {
+                'code': 'AI_GENERATE_FAILED',
+                'message': f'AI生成失败: {e}'
+            }
+        })
+
+
+def sse_event(event: str, data: dict) -> str:
+    """编码一条 Server-Sent Events 消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post('/generate/ai/stream')
+async def generate_ai_stream(payload: GeneratePayload):
+    """以 SSE 流式返回AI生成的HTML片段"""
+    target = template_registry.get(payload.style_id)
+    if not target:
+        return JSONResponse(status_code=404, content={
+            'error': {
+                'code': 'STYLE_NOT_FOUND',
+                'message': '未找到该风格'
+            }
+        })
+
+    # 延迟导入，同 /generate/ai
+    from services.cache_service import cache_service
+    from services.circuit_breaker import CircuitOpenError
+    from services.deepseek_service import CachedFailureError, stream_cover_html
+
+    async def events():
+        try:
+            async for event, content in stream_cover_html(payload.title, payload.author or '', target):
+                if event == 'chunk':
+                    yield sse_event('chunk', {'delta': content})
+                else:
+                    # 片段是未经后处理的原始输出，完成时附上与缓存一致的最终HTML
+                    yield sse_event('done', {
+                        'cache_key': cache_service.cache_key(payload.title, payload.author or '', payload.style_id),
+                        'html': content
+                    })
+        except CircuitOpenError as e:
+            yield sse_event('error', {
+                'code': 'UPSTREAM_UNAVAILABLE',
+                'message': str(e)
+            })
+        except CachedFailureError as e:
+            yield sse_event('error', {
+                'code': 'AI_GENERATE_FAILED',
+                'message': f'AI生成失败: {e}',
+                'retry_after': round(e.retry_after, 1)
+            })
+        except Exception as e:
+            yield sse_event('error', {
+                'code': 'AI_GENERATE_FAILED',
+                'message': f'AI生成失败: {e}'
+            })
+
+    return StreamingResponse(events(), media_type='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # 关闭反向代理缓冲，保证片段及时到达浏览器
+        'X-Accel-Buffering': 'no',
+    })
@@ -0,0 +1,93 @@
+import asyncio
+import os
+from typing import AsyncIterator, Dict, Any, List
+
+from .cache_service import cache_service
+from .circuit_breaker import CircuitOpenError
+from .deepseek_service import generate_cover_html
+from .template_registry import template_registry
+
+
+DEFAULT_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', '8'))
+MAX_CONCURRENCY = int(os.environ.get('BATCH_MAX_CONCURRENCY', '32'))
+
+
+async def generate_batch(items: List[Dict[str, Any]], concurrency: int | None = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    批量生成封面，按完成顺序逐条产出结果
+
+    相同的 (标题, 作者, 风格) 只生成一次；缓存命中的条目立即返回，
+    未命中的条目以受限并发调用AI。单条失败只影响该条结果。
+
+    Args:
+        items: 每项包含 title、author、style_id
+        concurrency: 最大并发AI调用数，默认取 BATCH_CONCURRENCY
+
+    Yields:
+        每个去重后条目的结果，indexes 为它在原始列表中的位置
+    """
+    limit = max(1, min(concurrency or DEFAULT_CONCURRENCY, MAX_CONCURRENCY))
+
+    # 按缓存键去重，记录每个键对应的原始位置
+    unique: Dict[str, Dict[str, Any]] = {}
+    for index, item in enumerate(items):
+        title = item['title']
+        author = item.get('author') or ''
+        style_id = item['style_id']
+        key = cache_service.cache_key(title, author, style_id)
+        if key in unique:
+            unique[key]['indexes'].append(index)
+        else:
+            unique[key] = {
+                'indexes': [index],
+                'title': title,
+                'author': author,
+                'style_id': style_id,
+            }
+
+    misses = []
+    for key, entry in unique.items():
+        result = {**entry, 'cache_key': key}
+        if template_registry.get(entry['style_id']) is None:
+            yield {**result, 'status': 'error', 'error': {
+                'code': 'STYLE_NOT_FOUND',
+                'message': '未找到该风格'
+            }}
+            continue
+        # 这次查找计入统计与热度；未命中的条目在 generate_cover_html 中不再重复计数
+        html = cache_service.get(entry['title'], entry['author'], entry['style_id'])
+        if html:
+            yield {**result, 'status': 'ok', 'cached': True, 'html': html}
+        else:
+            misses.append(result)
+
+    if not misses:
+        return
+
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(result: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                template = template_registry.get(result['style_id'])
+                html = await generate_cover_html(result['title'], result['author'], template, record=False)
+                return {**result, 'status': 'ok', 'cached': False, 'html': html}
+            except CircuitOpenError as e:
+                return {**result, 'status': 'error', 'error': {
+                    'code': 'UPSTREAM_UNAVAILABLE',
+                    'message': str(e)
+                }}
+            except Exception as e:
+                return {**result, 'status': 'error', 'error': {
+                    'code': 'AI_GENERATE_FAILED',
+                    'message': f'AI生成失败: {e}'
+                }}
+
+    tasks = [asyncio.ensure_future(run(result)) for result in misses]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # 客户端中途断开时取消尚未开始的调用
+        for task in tasks:
+            task.cancel()
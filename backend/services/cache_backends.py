@@ -0,0 +1,1174 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+from .interprocess import FileLock, atomic_write
+
+try:
+    import redis
+except ImportError:  # 可选依赖，只有 CACHE_BACKEND=redis 时需要
+    redis = None
+
+# 视为 Redis 不可用、需要切换到后备存储的异常
+_REDIS_ERRORS = (
+    (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError, OSError)
+    if redis is not None else (ConnectionError, TimeoutError, OSError)
+)
+
+
+# 内容块：(编码, 压缩数据, 原始大小)
+BlobData = Tuple[str, bytes, int]
+
+
+class CacheBackend:
+    """
+    缓存存储后端接口
+
+    每条缓存记录是一个字典，至少包含 timestamp 字段，以及内联的 html 或指向内容块的 blob 摘要。
+    内容块按内容寻址并维护引用计数：记录写入时引用新块、覆盖或删除时释放旧块，计数归零的块被删除。
+    """
+
+    name = 'base'
+
+    def read(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取记录，不存在或已损坏时返回None"""
+        raise NotImplementedError
+
+    def write(self, key: str, record: Dict[str, Any], blob: Optional[BlobData] = None) -> None:
+        """
+        写入（覆盖）记录
+
+        blob 为记录引用的内容块 (编码, 压缩数据, 原始大小)：与记录在同一个锁或事务内保存并增加引用，
+        避免先 put_blob、后 write 之间内容块被并发删除，留下指向缺失内容块的记录
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str) -> bool:
+        """删除记录，返回是否存在"""
+        raise NotImplementedError
+
+    def delete_older_than(self, cutoff: float) -> int:
+        """删除 timestamp 早于 cutoff 的记录（以及损坏的记录），返回删除数量"""
+        raise NotImplementedError
+
+    def clear(self) -> int:
+        """删除全部记录，返回删除数量"""
+        raise NotImplementedError
+
+    def count(self, cutoff: float) -> Dict[str, int]:
+        """统计记录数量与内容总字节数，timestamp 早于 cutoff 的视为过期"""
+        raise NotImplementedError
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """遍历全部有效记录，用于迁移"""
+        raise NotImplementedError
+
+    def style_entries(self, style_id: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """按风格查找记录（风格 -> 缓存键的二级索引），用于只失效某个风格的缓存"""
+        raise NotImplementedError
+
+    def put_blob(self, digest: str, codec: str, data: bytes, raw_size: int) -> None:
+        """保存内容块（已存在则跳过），引用计数由 write 维护"""
+        raise NotImplementedError
+
+    def get_blob(self, digest: str) -> Optional[Tuple[str, bytes]]:
+        """读取内容块，返回 (编码, 压缩数据)"""
+        raise NotImplementedError
+
+    def blob_stats(self) -> Dict[str, int]:
+        """统计内容块数量、原始字节数与实际占用字节数"""
+        raise NotImplementedError
+
+    def read_failure(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取失败记录（负缓存），不存在时返回None"""
+        raise NotImplementedError
+
+    def write_failure(self, key: str, record: Dict[str, Any]) -> None:
+        """写入失败记录，record 包含 timestamp、expires_at、failures、error"""
+        raise NotImplementedError
+
+    def delete_failure(self, key: str) -> None:
+        """删除失败记录"""
+        raise NotImplementedError
+
+    def clear_failures(self, before: Optional[float] = None) -> int:
+        """删除 expires_at 早于 before 的失败记录（before 为None时全部删除），返回删除数量"""
+        raise NotImplementedError
+
+    def count_failures(self, now: float) -> int:
+        """统计仍在有效期内的失败记录数量"""
+        raise NotImplementedError
+
+    def location(self) -> str:
+        """存储位置描述"""
+        raise NotImplementedError
+
+
+class JsonDirBackend(CacheBackend):
+    """
+    每条记录一个 JSON 文件的目录存储（原有格式），内容块存放在 blobs 子目录
+
+    所有文件都以临时文件加 rename 的方式原子写入；修改记录与引用计数的操作
+    在 cache_dir/.lock 的文件锁下进行，多个 worker 共用同一目录时也不会互相覆盖计数。
+    风格 -> 缓存键的索引保存在 styles/<风格>/<缓存键> 空文件中，随记录的写入与删除在同一把锁下增删，
+    按风格查找只需列出该风格的目录，不用读取全部记录。
+    """
+
+    name = 'json'
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(exist_ok=True)
+        self.blob_dir = self.cache_dir / 'blobs'
+        self.blob_dir.mkdir(exist_ok=True)
+        self.failure_dir = self.cache_dir / 'failures'
+        self.failure_dir.mkdir(exist_ok=True)
+        # 引用计数的读-改-写需要在线程和进程之间串行化
+        self._lock = FileLock(self.cache_dir / '.lock')
+        self.index_dir = self.cache_dir / 'styles'
+        with self._lock:
+            if not (self.index_dir / '.built').exists():
+                self._build_style_index_locked()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _load(self, cache_file: Path) -> Dict[str, Any]:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            record = json.load(f)
+        if 'timestamp' not in record or ('html' not in record and 'blob' not in record):
+            raise KeyError('timestamp')
+        return record
+
+    def read(self, key: str) -> Optional[Dict[str, Any]]:
+        cache_file = self._path(key)
+        try:
+            return self._load(cache_file)
+        except FileNotFoundError:
+            # 不存在，或刚被其他 worker 删除
+            return None
+        except (json.JSONDecodeError, KeyError, OSError):
+            # 缓存文件损坏（写入是原子的，不会是写了一半的文件），删除它
+            cache_file.unlink(missing_ok=True)
+            return None
+
+    def _style_dir(self, style_id: str) -> Path:
+        # quote 不会产生单独的 '%'，用它表示空风格
+        return self.index_dir / (quote(style_id, safe='') or '%')
+
+    def _style_marker(self, style_id: str, key: str) -> Path:
+        return self._style_dir(style_id) / key
+
+    def _build_style_index_locked(self) -> None:
+        """为索引出现之前写入的记录建立风格索引，每个缓存目录只执行一次；调用方需持有 self._lock"""
+        self.index_dir.mkdir(exist_ok=True)
+        for key, record in self.items():
+            marker = self._style_marker(record.get('style_id', ''), key)
+            marker.parent.mkdir(exist_ok=True)
+            marker.touch()
+        (self.index_dir / '.built').touch()
+
+    def write(self, key: str, record: Dict[str, Any], blob: Optional[BlobData] = None) -> None:
+        with self._lock:
+            old = self.read(key)
+            if record.get('blob'):
+                if blob is not None:
+                    self._put_blob_locked(record['blob'], *blob)
+                self._adjust_ref_locked(record['blob'], 1)
+            atomic_write(self._path(key), json.dumps(record, ensure_ascii=False, indent=2))
+            marker = self._style_marker(record.get('style_id', ''), key)
+            marker.parent.mkdir(parents=True, exist_ok=True)
+            marker.touch()
+            if old is not None:
+                if old.get('style_id', '') != record.get('style_id', ''):
+                    self._style_marker(old.get('style_id', ''), key).unlink(missing_ok=True)
+                if old.get('blob'):
+                    self._adjust_ref_locked(old['blob'], -1)
+
+    def _unlink(self, cache_file: Path) -> None:
+        """删除记录文件并释放其引用的内容块"""
+        with self._lock:
+            try:
+                old = self._load(cache_file)
+            except (json.JSONDecodeError, KeyError, OSError):
+                old = None
+            cache_file.unlink(missing_ok=True)
+            if old is not None:
+                self._style_marker(old.get('style_id', ''), cache_file.stem).unlink(missing_ok=True)
+                if old.get('blob'):
+                    self._adjust_ref_locked(old['blob'], -1)
+
+    def delete(self, key: str) -> bool:
+        cache_file = self._path(key)
+        if not cache_file.exists():
+            return False
+        self._unlink(cache_file)
+        return True
+
+    def delete_older_than(self, cutoff: float) -> int:
+        cleared_count = 0
+        for cache_file in self.cache_dir.glob("*.json"):
+            try:
+                record = self._load(cache_file)
+                if record['timestamp'] < cutoff:
+                    self._unlink(cache_file)
+                    cleared_count += 1
+            except FileNotFoundError:
+                # 已被其他 worker 删除
+                continue
+            except (json.JSONDecodeError, KeyError, OSError):
+                # 损坏的缓存文件也删除
+                cache_file.unlink(missing_ok=True)
+                cleared_count += 1
+        return cleared_count
+
+    def clear(self) -> int:
+        # 删除记录与删除内容块在同一把锁下完成：并发写入要么整体在清空之前（一并被清除），
+        # 要么整体在之后（记录与它引用的内容块都保留）
+        cleared_count = 0
+        with self._lock:
+            for cache_file in self.cache_dir.glob("*.json"):
+                try:
+                    cache_file.unlink()
+                    cleared_count += 1
+                except OSError:
+                    pass
+            shutil.rmtree(self.blob_dir, ignore_errors=True)
+            self.blob_dir.mkdir(exist_ok=True)
+            shutil.rmtree(self.index_dir, ignore_errors=True)
+            self.index_dir.mkdir(exist_ok=True)
+            (self.index_dir / '.built').touch()
+        self.clear_failures()
+        return cleared_count
+
+    def count(self, cutoff: float) -> Dict[str, int]:
+        cache_files = list(self.cache_dir.glob("*.json"))
+        valid = expired = corrupted = logical_bytes = 0
+        for cache_file in cache_files:
+            try:
+                record = self._load(cache_file)
+                if record['timestamp'] < cutoff:
+                    expired += 1
+                else:
+                    valid += 1
+                logical_bytes += record.get('size') or len(record.get('html', '').encode('utf-8'))
+            except (json.JSONDecodeError, KeyError, OSError):
+                corrupted += 1
+        return {
+            'total': len(cache_files),
+            'valid': valid,
+            'expired': expired,
+            'corrupted': corrupted,
+            'logical_bytes': logical_bytes,
+        }
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for cache_file in self.cache_dir.glob("*.json"):
+            record = self.read(cache_file.stem)
+            if record is not None:
+                yield cache_file.stem, record
+
+    def style_entries(self, style_id: str) -> List[Tuple[str, Dict[str, Any]]]:
+        try:
+            keys = sorted(marker.name for marker in self._style_dir(style_id).iterdir())
+        except FileNotFoundError:
+            return []
+        entries = []
+        for key in keys:
+            record = self.read(key)
+            if record is not None and record.get('style_id', '') == style_id:
+                entries.append((key, record))
+                continue
+            # 记录已损坏或被外部删除：在锁内确认后清理残留的索引项
+            with self._lock:
+                record = self.read(key)
+                if record is None or record.get('style_id', '') != style_id:
+                    self._style_marker(style_id, key).unlink(missing_ok=True)
+        return entries
+
+    def _blob_paths(self, digest: str) -> Tuple[Path, Path]:
+        return self.blob_dir / digest, self.blob_dir / f"{digest}.meta"
+
+    def _adjust_ref_locked(self, digest: str, delta: int) -> None:
+        """调整内容块引用计数，调用方需持有 self._lock"""
+        data_path, meta_path = self._blob_paths(digest)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return
+        meta['refs'] = meta.get('refs', 0) + delta
+        if meta['refs'] <= 0:
+            meta_path.unlink(missing_ok=True)
+            data_path.unlink(missing_ok=True)
+            return
+        atomic_write(meta_path, json.dumps(meta))
+
+    def _put_blob_locked(self, digest: str, codec: str, data: bytes, raw_size: int) -> None:
+        """保存内容块（已存在则跳过），调用方需持有 self._lock"""
+        data_path, meta_path = self._blob_paths(digest)
+        if meta_path.exists():
+            return
+        # 先写数据再写元数据，读取方以元数据存在作为内容块完整的标志
+        atomic_write(data_path, data)
+        atomic_write(meta_path, json.dumps({'codec': codec, 'raw_size': raw_size, 'size': len(data), 'refs': 0}))
+
+    def put_blob(self, digest: str, codec: str, data: bytes, raw_size: int) -> None:
+        with self._lock:
+            self._put_blob_locked(digest, codec, data, raw_size)
+
+    def get_blob(self, digest: str) -> Optional[Tuple[str, bytes]]:
+        data_path, meta_path = self._blob_paths(digest)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            return meta['codec'], data_path.read_bytes()
+        except (json.JSONDecodeError, KeyError, OSError):
+            return None
+
+    def blob_stats(self) -> Dict[str, int]:
+        blobs = raw_bytes = stored_bytes = 0
+        for meta_path in self.blob_dir.glob("*.meta"):
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                continue
+            blobs += 1
+            raw_bytes += meta.get('raw_size', 0)
+            stored_bytes += meta.get('size', 0)
+        return {'blobs': blobs, 'raw_bytes': raw_bytes, 'stored_bytes': stored_bytes}
+
+    def read_failure(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.failure_dir / f"{key}.json", 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return None
+
+    def write_failure(self, key: str, record: Dict[str, Any]) -> None:
+        atomic_write(self.failure_dir / f"{key}.json", json.dumps(record, ensure_ascii=False))
+
+    def delete_failure(self, key: str) -> None:
+        (self.failure_dir / f"{key}.json").unlink(missing_ok=True)
+
+    def clear_failures(self, before: Optional[float] = None) -> int:
+        cleared_count = 0
+        for failure_file in self.failure_dir.glob("*.json"):
+            if before is not None:
+                record = self.read_failure(failure_file.stem)
+                if record is not None and record.get('expires_at', 0) >= before:
+                    continue
+            failure_file.unlink(missing_ok=True)
+            cleared_count += 1
+        return cleared_count
+
+    def count_failures(self, now: float) -> int:
+        active = 0
+        for failure_file in self.failure_dir.glob("*.json"):
+            record = self.read_failure(failure_file.stem)
+            if record is not None and record.get('expires_at', 0) > now:
+                active += 1
+        return active
+
+    def location(self) -> str:
+        return str(self.cache_dir)
+
+
+class SQLiteBackend(CacheBackend):
+    """单个 SQLite 数据库（WAL 模式）存储，过期清理与统计走 timestamp 索引"""
+
+    name = 'sqlite'
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # 多个 worker 共用同一数据库时，写锁冲突等待而不是立即报错
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None,
+                                     timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            ' key TEXT PRIMARY KEY,'
+            ' timestamp REAL NOT NULL,'
+            ' title TEXT,'
+            ' author TEXT,'
+            ' style_id TEXT,'
+            ' html TEXT NOT NULL)'
+        )
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(entries)')}
+        if 'blob' not in columns:
+            self._conn.execute('ALTER TABLE entries ADD COLUMN blob TEXT')
+        if 'size' not in columns:
+            self._conn.execute('ALTER TABLE entries ADD COLUMN size INTEGER NOT NULL DEFAULT 0')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_timestamp ON entries(timestamp)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_blob ON entries(blob)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_style ON entries(style_id)')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS blobs ('
+            ' digest TEXT PRIMARY KEY,'
+            ' codec TEXT NOT NULL,'
+            ' data BLOB NOT NULL,'
+            ' raw_size INTEGER NOT NULL,'
+            ' refs INTEGER NOT NULL DEFAULT 0)'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS failures ('
+            ' key TEXT PRIMARY KEY,'
+            ' timestamp REAL NOT NULL,'
+            ' expires_at REAL NOT NULL,'
+            ' failures INTEGER NOT NULL,'
+            ' error TEXT)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_failures_expires ON failures(expires_at)')
+
+    def read(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT timestamp, title, author, style_id, html, blob, size FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        record = {
+            'timestamp': row[0],
+            'title': row[1],
+            'author': row[2],
+            'style_id': row[3],
+            'size': row[6],
+        }
+        if row[5]:
+            record['blob'] = row[5]
+        else:
+            record['html'] = row[4]
+        return record
+
+    def _release_where(self, where: str, params: tuple) -> int:
+        """删除满足条件的记录并释放其内容块引用（调用方需持有锁并处于事务中）"""
+        digests = [row[0] for row in self._conn.execute(
+            f'SELECT DISTINCT blob FROM entries WHERE blob IS NOT NULL AND {where}', params
+        )]
+        self._conn.execute(
+            'UPDATE blobs SET refs = refs - (SELECT COUNT(*) FROM entries'
+            f' WHERE entries.blob = blobs.digest AND {where})'
+            f' WHERE digest IN (SELECT blob FROM entries WHERE {where})',
+            params + params
+        )
+        cursor = self._conn.execute(f'DELETE FROM entries WHERE {where}', params)
+        # 只回收本次释放的内容块，避免误删其他线程刚写入、尚未被引用的块
+        self._conn.executemany(
+            'DELETE FROM blobs WHERE digest = ? AND refs <= 0', [(d,) for d in digests]
+        )
+        return cursor.rowcount
+
+    def write(self, key: str, record: Dict[str, Any], blob: Optional[BlobData] = None) -> None:
+        digest = record.get('blob')
+        html = record.get('html', '')
+        size = record.get('size') or len(html.encode('utf-8'))
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                if digest:
+                    if blob is not None:
+                        self._conn.execute(
+                            'INSERT OR IGNORE INTO blobs (digest, codec, data, raw_size, refs) VALUES (?, ?, ?, ?, 0)',
+                            (digest, *blob)
+                        )
+                    self._conn.execute('UPDATE blobs SET refs = refs + 1 WHERE digest = ?', (digest,))
+                self._release_where('key = ?', (key,))
+                self._conn.execute(
+                    'INSERT INTO entries (key, timestamp, title, author, style_id, html, blob, size) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (key, record['timestamp'], record.get('title'), record.get('author'),
+                     record.get('style_id'), '' if digest else html, digest, size)
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def _delete_where(self, where: str, params: tuple) -> int:
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                deleted = self._release_where(where, params)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return deleted
+
+    def delete(self, key: str) -> bool:
+        return self._delete_where('key = ?', (key,)) > 0
+
+    def delete_older_than(self, cutoff: float) -> int:
+        return self._delete_where('timestamp < ?', (cutoff,))
+
+    def clear(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute('DELETE FROM entries')
+            self._conn.execute('DELETE FROM blobs')
+            self._conn.execute('DELETE FROM failures')
+        return cursor.rowcount
+
+    def count(self, cutoff: float) -> Dict[str, int]:
+        with self._lock:
+            total, logical_bytes = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries'
+            ).fetchone()
+            expired = self._conn.execute(
+                'SELECT COUNT(*) FROM entries WHERE timestamp < ?', (cutoff,)
+            ).fetchone()[0]
+        return {
+            'total': total,
+            'valid': total - expired,
+            'expired': expired,
+            'corrupted': 0,
+            'logical_bytes': logical_bytes,
+        }
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            keys = [row[0] for row in self._conn.execute('SELECT key FROM entries')]
+        for key in keys:
+            record = self.read(key)
+            if record is not None:
+                yield key, record
+
+    def style_entries(self, style_id: str) -> List[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            keys = [row[0] for row in self._conn.execute(
+                'SELECT key FROM entries WHERE style_id = ? ORDER BY key', (style_id,)
+            )]
+        entries = []
+        for key in keys:
+            record = self.read(key)
+            if record is not None:
+                entries.append((key, record))
+        return entries
+
+    def put_blob(self, digest: str, codec: str, data: bytes, raw_size: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR IGNORE INTO blobs (digest, codec, data, raw_size, refs) VALUES (?, ?, ?, ?, 0)',
+                (digest, codec, data, raw_size)
+            )
+
+    def get_blob(self, digest: str) -> Optional[Tuple[str, bytes]]:
+        with self._lock:
+            row = self._conn.execute('SELECT codec, data FROM blobs WHERE digest = ?', (digest,)).fetchone()
+        if row is None:
+            return None
+        return row[0], bytes(row[1])
+
+    def blob_stats(self) -> Dict[str, int]:
+        with self._lock:
+            blobs, raw_bytes, stored_bytes = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM blobs'
+            ).fetchone()
+        return {'blobs': blobs, 'raw_bytes': raw_bytes, 'stored_bytes': stored_bytes}
+
+    def read_failure(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT timestamp, expires_at, failures, error FROM failures WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'timestamp': row[0], 'expires_at': row[1], 'failures': row[2], 'error': row[3]}
+
+    def write_failure(self, key: str, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO failures (key, timestamp, expires_at, failures, error) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, record['timestamp'], record['expires_at'], record['failures'], record.get('error'))
+            )
+
+    def delete_failure(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute('DELETE FROM failures WHERE key = ?', (key,))
+
+    def clear_failures(self, before: Optional[float] = None) -> int:
+        with self._lock:
+            if before is None:
+                cursor = self._conn.execute('DELETE FROM failures')
+            else:
+                cursor = self._conn.execute('DELETE FROM failures WHERE expires_at < ?', (before,))
+        return cursor.rowcount
+
+    def count_failures(self, now: float) -> int:
+        with self._lock:
+            return self._conn.execute(
+                'SELECT COUNT(*) FROM failures WHERE expires_at > ?', (now,)
+            ).fetchone()[0]
+
+    def location(self) -> str:
+        return str(self.db_path)
+
+
+class MemoryBackend(CacheBackend):
+    """
+    进程内存储，用作 Redis 不可用时的临时后备（也可单独使用）
+
+    重启即丢失；记录超过 max_entries 时淘汰最早写入的记录。
+    """
+
+    name = 'memory'
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        # 摘要 -> [编码, 压缩数据, 原始大小, 引用计数]
+        self._blobs: Dict[str, list] = {}
+        self._failures: Dict[str, Dict[str, Any]] = {}
+
+    def read(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._entries.get(key)
+            return dict(record) if record is not None else None
+
+    def _release_locked(self, key: str) -> Optional[Dict[str, Any]]:
+        old = self._entries.pop(key, None)
+        if old is not None and old.get('blob') in self._blobs:
+            blob = self._blobs[old['blob']]
+            blob[3] -= 1
+            if blob[3] <= 0:
+                del self._blobs[old['blob']]
+        return old
+
+    def write(self, key: str, record: Dict[str, Any], blob: Optional[BlobData] = None) -> None:
+        with self._lock:
+            if record.get('blob') and blob is not None:
+                self._blobs.setdefault(record['blob'], [*blob, 0])
+            if record.get('blob') in self._blobs:
+                self._blobs[record['blob']][3] += 1
+            self._release_locked(key)
+            self._entries[key] = dict(record)
+            while len(self._entries) > self.max_entries:
+                self._release_locked(next(iter(self._entries)))
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._release_locked(key) is not None
+
+    def delete_older_than(self, cutoff: float) -> int:
+        with self._lock:
+            expired = [k for k, r in self._entries.items() if r['timestamp'] < cutoff]
+            for key in expired:
+                self._release_locked(key)
+        return len(expired)
+
+    def clear(self) -> int:
+        with self._lock:
+            cleared_count = len(self._entries)
+            self._entries.clear()
+            self._blobs.clear()
+            self._failures.clear()
+        return cleared_count
+
+    def count(self, cutoff: float) -> Dict[str, int]:
+        with self._lock:
+            records = list(self._entries.values())
+        expired = sum(1 for r in records if r['timestamp'] < cutoff)
+        return {
+            'total': len(records),
+            'valid': len(records) - expired,
+            'expired': expired,
+            'corrupted': 0,
+            'logical_bytes': sum(r.get('size') or len(r.get('html', '').encode('utf-8')) for r in records),
+        }
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            entries = [(k, dict(r)) for k, r in self._entries.items()]
+        yield from entries
+
+    def style_entries(self, style_id: str) -> List[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            return sorted((k, dict(r)) for k, r in self._entries.items() if r.get('style_id') == style_id)
+
+    def put_blob(self, digest: str, codec: str, data: bytes, raw_size: int) -> None:
+        with self._lock:
+            self._blobs.setdefault(digest, [codec, data, raw_size, 0])
+
+    def get_blob(self, digest: str) -> Optional[Tuple[str, bytes]]:
+        with self._lock:
+            blob = self._blobs.get(digest)
+        return (blob[0], blob[1]) if blob is not None else None
+
+    def blob_stats(self) -> Dict[str, int]:
+        with self._lock:
+            blobs = list(self._blobs.values())
+        return {
+            'blobs': len(blobs),
+            'raw_bytes': sum(b[2] for b in blobs),
+            'stored_bytes': sum(len(b[1]) for b in blobs),
+        }
+
+    def read_failure(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._failures.get(key)
+            return dict(record) if record is not None else None
+
+    def write_failure(self, key: str, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self._failures[key] = dict(record)
+
+    def delete_failure(self, key: str) -> None:
+        with self._lock:
+            self._failures.pop(key, None)
+
+    def clear_failures(self, before: Optional[float] = None) -> int:
+        with self._lock:
+            keys = [k for k, r in self._failures.items() if before is None or r.get('expires_at', 0) < before]
+            for key in keys:
+                del self._failures[key]
+        return len(keys)
+
+    def count_failures(self, now: float) -> int:
+        with self._lock:
+            return sum(1 for r in self._failures.values() if r.get('expires_at', 0) > now)
+
+    def location(self) -> str:
+        return 'memory'
+
+
+def _text(value: Any) -> str:
+    return value.decode('utf-8') if isinstance(value, bytes) else str(value)
+
+
+class RedisBackend(CacheBackend):
+    """
+    Redis（或兼容 Redis 协议的服务，如 KeyDB、Valkey、Dragonfly）存储，多个节点共享同一份缓存
+
+    - 记录、内容块、失败记录各为一个 hash，过期由服务端 TTL 负责，不依赖 clear_expired
+    - 每个风格一个 set 保存其缓存键（风格 -> 键的二级索引），TTL 随最新写入的记录刷新；
+      记录过期或被删除后留下的成员在按风格查找时顺带移除
+    - 内容块不维护引用计数：每次写入引用它的记录前刷新内容块的 TTL，
+      使其不早于任何引用它的记录过期
+    - 多步操作用 pipeline 合并为一次往返，扫描类操作按批 SCAN 并批量读取
+    - 连接失败或超时时切换到进程内的 MemoryBackend，retry_interval 秒后再尝试 Redis；
+      后备期间写入的内容不会回写到 Redis
+    """
+
+    name = 'redis'
+
+    def __init__(self, url: str = 'redis://localhost:6379/0', prefix: str = 'covers:',
+                 entry_ttl: Optional[float] = None, failure_keep: float = 600,
+                 max_connections: int = 32, socket_timeout: float = 0.5,
+                 retry_interval: float = 30.0, client: Any = None):
+        """
+        Args:
+            url: Redis 连接地址
+            prefix: 键前缀，多个应用共用同一个 Redis 时区分命名空间
+            entry_ttl: 记录在服务端保留的时间（秒），通常为 cache_ttl + stale_ttl；None 表示不过期
+            failure_keep: 失败记录过期后继续保留的时间（秒），用于延续退避计数
+            max_connections: 连接池大小
+            socket_timeout: 连接与读写超时（秒），超时视为 Redis 不可用
+            retry_interval: 切换到后备存储后，再次尝试 Redis 的间隔（秒）
+            client: 已创建的客户端（如测试用的 fakeredis.FakeRedis），传入时忽略 url 与连接参数；
+                    内容块是二进制数据，客户端不能开启 decode_responses
+        """
+        if client is None:
+            if redis is None:
+                raise RuntimeError('未安装 redis，无法使用 redis 缓存后端（pip install redis）')
+            pool = redis.ConnectionPool.from_url(
+                url, max_connections=max_connections,
+                socket_timeout=socket_timeout, socket_connect_timeout=socket_timeout
+            )
+            client = redis.Redis(connection_pool=pool)
+        self.client = client
+        self.url = url
+        self.prefix = prefix
+        self.entry_ttl = entry_ttl
+        self.failure_keep = failure_keep
+        self.retry_interval = retry_interval
+        self.fallback = MemoryBackend()
+        self.fallback_calls = 0
+        self._down_until = 0.0
+
+    def _key(self, kind: str, key: str) -> str:
+        return f"{self.prefix}{kind}:{key}"
+
+    def _run(self, op: str, *args: Any) -> Any:
+        """在 Redis 上执行 _redis_<op>，不可用时改为在后备存储上执行同名方法"""
+        if time.time() >= self._down_until:
+            try:
+                return getattr(self, f"_redis_{op}")(*args)
+            except _REDIS_ERRORS as e:
+                self._down_until = time.time() + self.retry_interval
+                print(f"Redis 不可用，{self.retry_interval:.0f} 秒内改用进程内缓存: {e}")
+        self.fallback_calls += 1
+        return getattr(self.fallback, op)(*args)
+
+    def _scan(self, kind: str, batch: int = 500) -> Iterator[list]:
+        """按批返回某类键的完整键名"""
+        keys: list = []
+        for name in self.client.scan_iter(match=self._key(kind, '*'), count=batch):
+            keys.append(name)
+            if len(keys) >= batch:
+                yield keys
+                keys = []
+        if keys:
+            yield keys
+
+    def _strip(self, kind: str, name: Any) -> str:
+        return _text(name)[len(self._key(kind, '')):]
+
+    @staticmethod
+    def _decode_record(raw: Dict[Any, Any]) -> Optional[Dict[str, Any]]:
+        if not raw:
+            return None
+        record = {_text(k): v for k, v in raw.items()}
+        try:
+            result: Dict[str, Any] = {
+                'timestamp': float(record['timestamp']),
+                'title': _text(record.get('title', b'')),
+                'author': _text(record.get('author', b'')),
+                'style_id': _text(record.get('style_id', b'')),
+                'size': int(record.get('size', 0)),
+            }
+        except (KeyError, ValueError):
+            return None
+        if record.get('blob'):
+            result['blob'] = _text(record['blob'])
+        elif 'html' in record:
+            result['html'] = _text(record['html'])
+        else:
+            return None
+        return result
+
+    # --- 记录 ---
+
+    def _redis_read(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._decode_record(self.client.hgetall(self._key('e', key)))
+
+    def _redis_write(self, key: str, record: Dict[str, Any], blob: Optional[BlobData] = None) -> None:
+        # 内容块的 TTL 长于记录且每次写入时刷新，不维护引用计数，先保存内容块即可
+        if record.get('blob') and blob is not None:
+            self._redis_put_blob(record['blob'], *blob)
+        mapping = {
+            'timestamp': record['timestamp'],
+            'title': record.get('title') or '',
+            'author': record.get('author') or '',
+            'style_id': record.get('style_id') or '',
+            'size': record.get('size') or len(record.get('html', '').encode('utf-8')),
+        }
+        if record.get('blob'):
+            mapping['blob'] = record['blob']
+        else:
+            mapping['html'] = record.get('html', '')
+        name = self._key('e', key)
+        style_set = self._key('s', mapping['style_id'])
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(name)
+        pipe.hset(name, mapping=mapping)
+        pipe.sadd(style_set, key)
+        if self.entry_ttl is not None:
+            ttl = max(int(record['timestamp'] + self.entry_ttl - time.time()), 1)
+            pipe.expire(name, ttl)
+            pipe.expire(style_set, ttl + 60)
+        pipe.execute()
+
+    def _redis_delete(self, key: str) -> bool:
+        return self.client.delete(self._key('e', key)) > 0
+
+    def _redis_delete_older_than(self, cutoff: float) -> int:
+        # 正常情况下服务端 TTL 已经删除了这些记录，这里处理 TTL 配置变更前写入的旧记录
+        cleared_count = 0
+        for names in self._scan('e'):
+            pipe = self.client.pipeline(transaction=False)
+            for name in names:
+                pipe.hget(name, 'timestamp')
+            stale = [n for n, ts in zip(names, pipe.execute()) if ts is None or float(ts) < cutoff]
+            if stale:
+                cleared_count += self.client.delete(*stale)
+        return cleared_count
+
+    def _redis_style_entries(self, style_id: str) -> list:
+        style_set = self._key('s', style_id)
+        keys = sorted(_text(member) for member in self.client.smembers(style_set))
+        if not keys:
+            return []
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(self._key('e', key))
+        entries, dead = [], []
+        for key, raw in zip(keys, pipe.execute()):
+            record = self._decode_record(raw)
+            if record is None:
+                dead.append(key)
+            else:
+                entries.append((key, record))
+        if dead:
+            self.client.srem(style_set, *dead)
+        return entries
+
+    def _redis_clear(self) -> int:
+        cleared_count = 0
+        for kind in ('e', 'b', 'f', 's'):
+            for names in self._scan(kind):
+                deleted = self.client.delete(*names)
+                if kind == 'e':
+                    cleared_count += deleted
+        return cleared_count
+
+    def _redis_count(self, cutoff: float) -> Dict[str, int]:
+        total = expired = corrupted = logical_bytes = 0
+        for names in self._scan('e'):
+            pipe = self.client.pipeline(transaction=False)
+            for name in names:
+                pipe.hmget(name, 'timestamp', 'size')
+            for timestamp, size in pipe.execute():
+                total += 1
+                if timestamp is None:
+                    corrupted += 1
+                    continue
+                if float(timestamp) < cutoff:
+                    expired += 1
+                logical_bytes += int(size or 0)
+        return {
+            'total': total,
+            'valid': total - expired - corrupted,
+            'expired': expired,
+            'corrupted': corrupted,
+            'logical_bytes': logical_bytes,
+        }
+
+    def _redis_items(self) -> list:
+        items = []
+        for names in self._scan('e'):
+            pipe = self.client.pipeline(transaction=False)
+            for name in names:
+                pipe.hgetall(name)
+            for name, raw in zip(names, pipe.execute()):
+                record = self._decode_record(raw)
+                if record is not None:
+                    items.append((self._strip('e', name), record))
+        return items
+
+    # --- 内容块 ---
+
+    def _blob_ttl(self) -> Optional[int]:
+        # 比记录多保留一分钟，保证先写内容块、后写记录时内容块不会先过期
+        return int(self.entry_ttl) + 60 if self.entry_ttl is not None else None
+
+    def _redis_put_blob(self, digest: str, codec: str, data: bytes, raw_size: int) -> None:
+        name = self._key('b', digest)
+        ttl = self._blob_ttl()
+        # 已存在时只刷新 TTL，不重复传输内容
+        if ttl is not None and self.client.expire(name, ttl):
+            return
+        if ttl is None and self.client.exists(name):
+            return
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(name, mapping={'codec': codec, 'data': data, 'raw_size': raw_size})
+        if ttl is not None:
+            pipe.expire(name, ttl)
+        pipe.execute()
+
+    def _redis_get_blob(self, digest: str) -> Optional[Tuple[str, bytes]]:
+        codec, data = self.client.hmget(self._key('b', digest), 'codec', 'data')
+        if codec is None or data is None:
+            return None
+        return _text(codec), data
+
+    def _redis_blob_stats(self) -> Dict[str, int]:
+        blobs = raw_bytes = stored_bytes = 0
+        for names in self._scan('b'):
+            pipe = self.client.pipeline(transaction=False)
+            for name in names:
+                pipe.hget(name, 'raw_size')
+                pipe.hstrlen(name, 'data')
+            results = pipe.execute()
+            for raw_size, stored in zip(results[::2], results[1::2]):
+                blobs += 1
+                raw_bytes += int(raw_size or 0)
+                stored_bytes += int(stored or 0)
+        return {'blobs': blobs, 'raw_bytes': raw_bytes, 'stored_bytes': stored_bytes}
+
+    # --- 失败记录 ---
+
+    def _redis_read_failure(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = self.client.hgetall(self._key('f', key))
+        if not raw:
+            return None
+        record = {_text(k): _text(v) for k, v in raw.items()}
+        try:
+            return {
+                'timestamp': float(record['timestamp']),
+                'expires_at': float(record['expires_at']),
+                'failures': int(record['failures']),
+                'error': record.get('error', ''),
+            }
+        except (KeyError, ValueError):
+            return None
+
+    def _redis_write_failure(self, key: str, record: Dict[str, Any]) -> None:
+        name = self._key('f', key)
+        ttl = record['expires_at'] - time.time() + self.failure_keep
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(name)
+        pipe.hset(name, mapping={
+            'timestamp': record['timestamp'],
+            'expires_at': record['expires_at'],
+            'failures': record['failures'],
+            'error': record.get('error') or '',
+        })
+        pipe.expire(name, max(int(ttl), 1))
+        pipe.execute()
+
+    def _redis_delete_failure(self, key: str) -> None:
+        self.client.delete(self._key('f', key))
+
+    def _redis_clear_failures(self, before: Optional[float] = None) -> int:
+        cleared_count = 0
+        for names in self._scan('f'):
+            if before is not None:
+                pipe = self.client.pipeline(transaction=False)
+                for name in names:
+                    pipe.hget(name, 'expires_at')
+                names = [n for n, exp in zip(names, pipe.execute()) if exp is None or float(exp) < before]
+            if names:
+                cleared_count += self.client.delete(*names)
+        return cleared_count
+
+    def _redis_count_failures(self, now: float) -> int:
+        active = 0
+        for names in self._scan('f'):
+            pipe = self.client.pipeline(transaction=False)
+            for name in names:
+                pipe.hget(name, 'expires_at')
+            active += sum(1 for exp in pipe.execute() if exp is not None and float(exp) > now)
+        return active
+
+    # --- CacheBackend 接口 ---
+
+    def read(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._run('read', key)
+
+    def write(self, key: str, record: Dict[str, Any], blob: Optional[BlobData] = None) -> None:
+        self._run('write', key, record, blob)
+
+    def delete(self, key: str) -> bool:
+        return self._run('delete', key)
+
+    def delete_older_than(self, cutoff: float) -> int:
+        return self._run('delete_older_than', cutoff)
+
+    def clear(self) -> int:
+        # 后备存储中的内容同时清空
+        self.fallback.clear()
+        return self._run('clear')
+
+    def count(self, cutoff: float) -> Dict[str, int]:
+        return self._run('count', cutoff)
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        return iter(self._run('items'))
+
+    def style_entries(self, style_id: str) -> List[Tuple[str, Dict[str, Any]]]:
+        return self._run('style_entries', style_id)
+
+    def put_blob(self, digest: str, codec: str, data: bytes, raw_size: int) -> None:
+        self._run('put_blob', digest, codec, data, raw_size)
+
+    def get_blob(self, digest: str) -> Optional[Tuple[str, bytes]]:
+        return self._run('get_blob', digest)
+
+    def blob_stats(self) -> Dict[str, int]:
+        return self._run('blob_stats')
+
+    def read_failure(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._run('read_failure', key)
+
+    def write_failure(self, key: str, record: Dict[str, Any]) -> None:
+        self._run('write_failure', key, record)
+
+    def delete_failure(self, key: str) -> None:
+        self._run('delete_failure', key)
+
+    def clear_failures(self, before: Optional[float] = None) -> int:
+        return self._run('clear_failures', before)
+
+    def count_failures(self, now: float) -> int:
+        return self._run('count_failures', now)
+
+    def location(self) -> str:
+        # 不暴露连接地址中的密码
+        location = self.url.split('@')[-1] if '@' in self.url else self.url
+        if time.time() < self._down_until:
+            location += '（不可用，当前使用进程内后备缓存）'
+        return location
+
+
+def create_backend(kind: str, cache_dir: Path, entry_ttl: Optional[float] = None,
+                   failure_keep: float = 600) -> CacheBackend:
+    """
+    按名称创建存储后端
+
+    Args:
+        kind: 'json'（每条记录一个文件）、'sqlite'（cache_dir/cache.db）、
+              'redis'（连接 REDIS_URL，键前缀 REDIS_KEY_PREFIX）或 'memory'（进程内）
+        cache_dir: 缓存目录路径
+        entry_ttl: 记录的保留时间（秒），只用于 redis 的服务端 TTL
+        failure_keep: 失败记录过期后的保留时间（秒），只用于 redis
+    """
+    if kind == 'json':
+        return JsonDirBackend(cache_dir)
+    if kind == 'sqlite':
+        Path(cache_dir).mkdir(exist_ok=True)
+        return SQLiteBackend(Path(cache_dir) / 'cache.db')
+    if kind == 'redis':
+        return RedisBackend(
+            url=os.environ.get('REDIS_URL', 'redis://localhost:6379/0'),
+            prefix=os.environ.get('REDIS_KEY_PREFIX', 'covers:'),
+            entry_ttl=entry_ttl,
+            failure_keep=failure_keep,
+            max_connections=int(os.environ.get('REDIS_MAX_CONNECTIONS', '32')),
+            socket_timeout=float(os.environ.get('REDIS_TIMEOUT', '0.5'))
+        )
+    if kind == 'memory':
+        return MemoryBackend()
+    raise ValueError(f"未知的缓存后端: {kind}")
+
+
+def migrate(source: CacheBackend, target: CacheBackend) -> int:
+    """
+    将 source 中的全部记录（连同引用的内容块）复制到 target
+
+    Returns:
+        迁移的记录数量
+    """
+    migrated = 0
+    for key, record in source.items():
+        if record.get('blob'):
+            blob = source.get_blob(record['blob'])
+            if blob is None:
+                continue
+            target.write(key, record, (blob[0], blob[1], record.get('size', 0)))
+        else:
+            target.write(key, record)
+        migrated += 1
+    return migrated
+
+
+if __name__ == '__main__':
+    # 用法: python -m services.cache_backends json sqlite [cache_dir]
+    import sys
+
+    if len(sys.argv) < 3:
+        print("用法: python -m services.cache_backends <源后端> <目标后端> [缓存目录]")
+        sys.exit(1)
+    directory = Path(sys.argv[3] if len(sys.argv) > 3 else 'cache')
+    count = migrate(create_backend(sys.argv[1], directory), create_backend(sys.argv[2], directory))
+    print(f"已迁移 {count} 条缓存记录")
@@ -1,26 +1,90 @@
 import hashlib
-import json
+import os
 import time
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
+
+from .cache_backends import CacheBackend, create_backend
+from .compression import compress, decompress
+from .interprocess import GenerationLocks, SharedCounters
+from .memory_cache import MemoryCache
+from .metrics import cache_evictions, cache_lookups
+from .normalization import normalize_text
+from .popularity import PopularityTracker
+from .similarity_index import SimilarityIndex
+from .template_registry import template_registry
+
+
+# 各层查找的可能结果
+_LOOKUP_TIERS = (
+    ('memory', ('hit', 'miss')),
+    ('disk', ('hit', 'stale', 'miss')),
+    ('similar', ('hit', 'miss')),
+    ('negative', ('hit', 'miss')),
+)
+
+# 多 worker 共享的统计计数：各层查找结果，以及规范化、负缓存、跨 worker 生成锁的计数；
+# memory_epoch 不是统计项，每次清空或按风格失效时加一，通知其他 worker 丢弃内存层
+SHARED_COUNTERS = tuple(
+    f"{tier}_{result}" for tier, results in _LOOKUP_TIERS for result in results
+) + ('normalized_hits', 'negative_recorded', 'writes', 'generation_waits', 'generation_reused',
+     'memory_epoch')
 
 
 class CacheService:
-    def __init__(self, cache_dir: str = "cache", cache_ttl: int = 3600 * 24):
+    def __init__(self, cache_dir: str = "cache", cache_ttl: int = 3600 * 24,
+                 memory_max_bytes: int = 64 * 1024 * 1024, backend: str = "json",
+                 codec: str = "gzip", stale_ttl: int = 3600 * 24,
+                 negative_ttl: int = 30, negative_max_ttl: int = 600,
+                 normalize_titles: bool = True, similarity_threshold: float = 0.0):
         """
         初始化缓存服务
         
         Args:
             cache_dir: 缓存目录路径
             cache_ttl: 缓存过期时间（秒），默认24小时
+            memory_max_bytes: 内存缓存层的字节上限，为0时禁用内存层
+            backend: 存储后端，'json'（每条一个文件）、'sqlite'（单个WAL数据库）、
+                     'redis'（多节点共享，见 REDIS_URL）或 'memory'（进程内）
+            codec: HTML内容的压缩编码，'gzip' 或 'zstd'
+            stale_ttl: 过期后继续保留的宽限时间（秒），期间可作为旧内容返回并在后台刷新
+            negative_ttl: 生成失败后首次记录的负缓存时间（秒），连续失败时逐次翻倍
+            negative_max_ttl: 负缓存时间的上限（秒）
+            normalize_titles: 生成缓存键前是否规范化标题与作者（NFKC、空白与标点折叠）
+            similarity_threshold: 精确未命中时返回同风格同作者下相似标题的缓存，
+                                  取值为 n-gram Jaccard 相似度下限，0 表示关闭
         """
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True)
         self.cache_ttl = cache_ttl
+        self.stale_ttl = stale_ttl
+        self.backend: CacheBackend = create_backend(backend, self.cache_dir, entry_ttl=cache_ttl + stale_ttl,
+                                                    failure_keep=negative_max_ttl)
+        self.codec = codec
+        # 磁盘缓存前的内存层，热点键命中时不访问文件系统；
+        # 每个 worker 各有一份，只用来返回未过期的内容，是否过期、是否需要刷新以存储后端为准
+        self.memory = MemoryCache(memory_max_bytes) if memory_max_bytes > 0 else None
+        self.negative_ttl = negative_ttl
+        self.negative_max_ttl = negative_max_ttl
+        self.normalize_titles = normalize_titles
+        # 统计计数放在共享内存映射文件中，uvicorn 多 worker 时统计接口返回全部 worker 的合计
+        # normalized_hits 为原始文本不同、规范化后命中的次数，即规范化带来的额外命中
+        self.counters = SharedCounters(self.cache_dir / 'stats', SHARED_COUNTERS)
+        # 跨 worker 的生成锁：同一键在多个 worker 中同时未命中时只有一个调用AI
+        self.generation_locks = GenerationLocks(self.cache_dir / 'locks')
+        self._memory_epoch = self.counters.get('memory_epoch')
+        self.similarity = SimilarityIndex(similarity_threshold) if similarity_threshold > 0 else None
+        self._similarity_loaded = False
+        # 按键统计访问热度，供后台预热使用；清空缓存时保留，以便重新预热热点
+        # 放在子目录中，避免被 json 后端当作缓存条目
+        self.popularity = PopularityTracker(self.cache_dir / 'popularity' / 'hot_keys.json')
     
     def _generate_cache_key(self, title: str, author: str, style_id: str) -> str:
         """
-        基于标题、作者和风格ID生成缓存键
+        基于标题、作者、风格ID和模板版本生成缓存键
+        
+        模板版本为模板内容（提示词、要求、样式细节）的哈希，模板修改后旧缓存不再命中，
+        其他风格的缓存不受影响。
         
         Args:
             title: 标题
@@ -30,15 +94,28 @@ class CacheService:
         Returns:
             缓存键的MD5哈希值
         """
+        if self.normalize_titles:
+            title = normalize_text(title)
+            author = normalize_text(author)
         # 将输入参数组合成字符串，然后生成MD5哈希
         cache_input = f"{title}|{author or ''}|{style_id}"
+        version = template_registry.version_of(style_id)
+        if version:
+            cache_input = f"{cache_input}|{version}"
         return hashlib.md5(cache_input.encode('utf-8')).hexdigest()
     
-    def _get_cache_file_path(self, cache_key: str) -> Path:
-        """获取缓存文件路径"""
-        return self.cache_dir / f"{cache_key}.json"
+    def cache_key(self, title: str, author: str, style_id: str) -> str:
+        """获取请求对应的缓存键"""
+        return self._generate_cache_key(title, author, style_id)
+    
+    def _count(self, tier: str, result: str, record: bool = True) -> None:
+        """记录一次查找结果（本进程的 Prometheus 指标与跨 worker 的共享计数）"""
+        if not record:
+            return
+        cache_lookups.inc(tier, result)
+        self.counters.add(f"{tier}_{result}")
     
-    def get(self, title: str, author: str, style_id: str) -> Optional[str]:
+    def get(self, title: str, author: str, style_id: str, record: bool = True) -> Optional[str]:
         """
         从缓存中获取HTML内容
         
@@ -46,32 +123,193 @@ class CacheService:
             title: 标题
             author: 作者
             style_id: 风格ID
+            record: 是否计入命中统计与访问热度，见 lookup
             
         Returns:
             缓存的HTML内容，如果不存在或已过期则返回None
         """
+        hit = self.lookup(title, author, style_id, record)
+        if hit is None or hit[1]:
+            return None
+        return hit[0]
+    
+    def lookup(self, title: str, author: str, style_id: str,
+               record: bool = True) -> Optional[Tuple[str, bool]]:
+        """
+        从缓存中获取HTML内容，包括已过期但仍在宽限期内的旧内容
+        
+        Args:
+            title: 标题
+            author: 作者
+            style_id: 风格ID
+            record: 是否计入命中统计与访问热度；预检查（预热、批量生成之后还会再查一次）
+                    传 False，避免同一请求重复计数，也避免预热抬高被预热键的热度
+            
+        Returns:
+            (HTML内容, 是否已过期)，不存在或超出宽限期则返回None
+        """
         cache_key = self._generate_cache_key(title, author, style_id)
-        cache_file = self._get_cache_file_path(cache_key)
+        if record:
+            self.popularity.record(cache_key, title, author, style_id)
+        origin = f"{title}|{author or ''}"
+        hit = self._lookup_key(cache_key, origin, record)
+        if hit is not None or self.similarity is None:
+            return hit
         
-        if not cache_file.exists():
+        # 精确未命中时查找同风格同作者下的相似标题
+        self._load_similarity_index()
+        match = self.similarity.query(self._similarity_group(style_id),
+                                      normalize_text(author, casefold=True), normalize_text(title, casefold=True))
+        if match is None:
+            self._count('similar', 'miss', record)
             return None
+        hit = self._lookup_key(match[0], None, record)
+        if hit is None:
+            self.similarity.remove(match[0])
+            self._count('similar', 'miss', record)
+            return None
+        self._count('similar', 'hit', record)
+        return hit
+    
+    def _lookup_key(self, cache_key: str, origin: Optional[str],
+                    record: bool = True) -> Optional[Tuple[str, bool]]:
+        """
+        按缓存键依次查找内存层与存储后端
+        
+        origin 为请求的原始 "标题|作者"，与缓存记录不同时说明是规范化带来的命中；
+        近似匹配时传None，不计入规范化命中。record 为 False 时不计入任何统计。
+        """
+        now = time.time()
+        self._sync_memory_epoch()
         
+        if self.memory is not None:
+            # 本地副本过期后不再返回：其他 worker 可能已经刷新，交给存储后端判断
+            entry = self.memory.get(cache_key, max_age=self.cache_ttl, record=record)
+            if entry is not None:
+                _, html, stored_origin = entry
+                self._count('memory', 'hit', record)
+                if record and origin is not None and stored_origin != origin:
+                    self.counters.add('normalized_hits')
+                return html, False
+            self._count('memory', 'miss', record)
+        
+        cache_data = self.backend.read(cache_key)
+        if cache_data is None:
+            self._count('disk', 'miss', record)
+            return None
+        
+        # 检查是否过期；宽限期内保留旧内容，超出宽限期才删除
+        age = now - cache_data['timestamp']
+        if age > self.cache_ttl + self.stale_ttl:
+            self.backend.delete(cache_key)
+            cache_evictions.inc('disk')
+            self._count('disk', 'miss', record)
+            return None
+        
+        html = self._load_html(cache_key, cache_data)
+        if html is None:
+            self._count('disk', 'miss', record)
+            return None
+        
+        self._count('disk', 'stale' if age > self.cache_ttl else 'hit', record)
+        stored_origin = f"{cache_data.get('title', '')}|{cache_data.get('author', '')}"
+        if record and origin is not None and stored_origin != origin:
+            self.counters.add('normalized_hits')
+        if self.memory is not None and age <= self.cache_ttl:
+            self.memory.set(cache_key, cache_data['timestamp'], html, stored_origin)
+        return html, age > self.cache_ttl
+    
+    @staticmethod
+    def _similarity_group(style_id: str) -> str:
+        """近似匹配按 风格+模板版本 分组，不会返回旧版本模板生成的内容"""
+        return f"{style_id}@{template_registry.version_of(style_id)}"
+    
+    def _load_similarity_index(self) -> None:
+        """首次近似查找时用已有缓存记录建立索引"""
+        if self._similarity_loaded:
+            return
+        self._similarity_loaded = True
+        for cache_key, record in self.backend.items():
+            style_id = record.get('style_id', '')
+            # 键与当前模板版本不符的是旧版本模板生成的记录
+            if self._generate_cache_key(record.get('title', ''), record.get('author', ''), style_id) != cache_key:
+                continue
+            self.similarity.add(cache_key, self._similarity_group(style_id),
+                                normalize_text(record.get('author', ''), casefold=True),
+                                normalize_text(record.get('title', ''), casefold=True))
+    
+    def _load_html(self, cache_key: str, cache_data: Dict[str, Any]) -> Optional[str]:
+        """从记录中取出HTML，内容块缺失或损坏时删除该记录"""
+        if 'html' in cache_data:
+            return cache_data['html']
+        blob = self.backend.get_blob(cache_data['blob'])
         try:
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                cache_data = json.load(f)
+            if blob is None:
+                raise ValueError('内容块缺失')
+            return decompress(*blob)
+        except (ValueError, OSError, RuntimeError):
+            self.backend.delete(cache_key)
+            return None
+    
+    def _sync_memory_epoch(self) -> None:
+        """其他 worker 清空或按风格失效了缓存时，丢弃本进程的内存层与近似索引"""
+        epoch = self.counters.get('memory_epoch')
+        if epoch == self._memory_epoch:
+            return
+        self._memory_epoch = epoch
+        if self.memory is not None:
+            self.memory.clear()
+        if self.similarity is not None:
+            self.similarity.clear()
+            self._similarity_loaded = False
+    
+    def _bump_memory_epoch(self) -> None:
+        self.counters.add('memory_epoch', flush=True)
+        self._sync_memory_epoch()
+    
+    def entry_timestamp(self, cache_key: str) -> Optional[float]:
+        """获取存储后端中缓存条目的写入时间（不看本进程的内存层），不存在时返回None"""
+        cache_data = self.backend.read(cache_key)
+        return cache_data['timestamp'] if cache_data is not None else None
+    
+    def written_since(self, cache_key: str, since: float) -> Optional[str]:
+        """
+        获取 since 之后写入存储后端的HTML（跳过本进程的内存层）
+        
+        用于等待其他 worker 的生成锁之后，判断对方是否已经生成并写入了同一个键。
+        
+        Args:
+            cache_key: 缓存键
+            since: 时间戳
             
-            # 检查是否过期
-            if time.time() - cache_data['timestamp'] > self.cache_ttl:
-                # 删除过期缓存
-                cache_file.unlink()
-                return None
+        Returns:
+            HTML内容，没有更新的记录时返回None
+        """
+        cache_data = self.backend.read(cache_key)
+        if cache_data is None or cache_data['timestamp'] < since:
+            return None
+        html = self._load_html(cache_key, cache_data)
+        if html is not None and self.memory is not None:
+            origin = f"{cache_data.get('title', '')}|{cache_data.get('author', '')}"
+            self.memory.set(cache_key, cache_data['timestamp'], html, origin)
+        return html
+    
+    def get_encoded(self, cache_key: str) -> Optional[Tuple[str, bytes]]:
+        """
+        按缓存键获取压缩存储的HTML，便于直接以 Content-Encoding 下发
+        
+        Args:
+            cache_key: 缓存键
             
-            return cache_data['html']
-        except (json.JSONDecodeError, KeyError, OSError):
-            # 缓存文件损坏，删除它
-            if cache_file.exists():
-                cache_file.unlink()
+        Returns:
+            (编码, 压缩数据)，不存在、已过期或为旧格式内联记录时返回None
+        """
+        cache_data = self.backend.read(cache_key)
+        if cache_data is None or not cache_data.get('blob'):
             return None
+        if time.time() - cache_data['timestamp'] > self.cache_ttl:
+            return None
+        return self.backend.get_blob(cache_data['blob'])
     
     def set(self, title: str, author: str, style_id: str, html: str) -> None:
         """
@@ -84,64 +322,146 @@ class CacheService:
             html: 要缓存的HTML内容
         """
         cache_key = self._generate_cache_key(title, author, style_id)
-        cache_file = self._get_cache_file_path(cache_key)
+        raw = html.encode('utf-8')
+        # 按内容寻址：不同键生成了相同HTML时只保存一份压缩数据
+        digest = hashlib.sha256(raw).hexdigest()
         
         cache_data = {
             'timestamp': time.time(),
             'title': title,
             'author': author or '',
             'style_id': style_id,
-            'html': html
+            'blob': digest,
+            'size': len(raw)
         }
         
+        if self.memory is not None:
+            self.memory.set(cache_key, cache_data['timestamp'], html, f"{title}|{author or ''}")
+        if self.similarity is not None:
+            self.similarity.add(cache_key, self._similarity_group(style_id),
+                                normalize_text(author, casefold=True), normalize_text(title, casefold=True))
+        
         try:
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(cache_data, f, ensure_ascii=False, indent=2)
-        except OSError as e:
+            codec, data = compress(html, self.codec)
+            # 内容块与记录一起写入，保证记录引用的内容块不会在两步之间被并发删除
+            self.backend.write(cache_key, cache_data, (codec, data, len(raw)))
+            self.counters.add('writes')
+        except Exception as e:
             # 写入失败，记录错误但不影响主流程
             print(f"缓存写入失败: {e}")
     
-    def clear_expired(self) -> int:
+    def get_failure(self, cache_key: str) -> Optional[Dict[str, Any]]:
         """
-        清理过期的缓存文件
+        获取仍在负缓存期内的失败记录
         
+        Args:
+            cache_key: 缓存键
+            
         Returns:
-            清理的文件数量
+            失败记录（含 error、failures、retry_after），没有或已过期时返回None
         """
-        cleared_count = 0
-        current_time = time.time()
-        
-        for cache_file in self.cache_dir.glob("*.json"):
-            try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    cache_data = json.load(f)
-                
-                if current_time - cache_data['timestamp'] > self.cache_ttl:
-                    cache_file.unlink()
-                    cleared_count += 1
-            except (json.JSONDecodeError, KeyError, OSError):
-                # 损坏的缓存文件也删除
-                cache_file.unlink()
-                cleared_count += 1
+        if self.negative_ttl <= 0:
+            return None
+        record = self.backend.read_failure(cache_key)
+        remaining = record['expires_at'] - time.time() if record is not None else 0
+        if remaining <= 0:
+            self._count('negative', 'miss')
+            return None
+        self._count('negative', 'hit')
+        return {**record, 'retry_after': remaining}
+    
+    def record_failure(self, cache_key: str, error: str) -> None:
+        """
+        记录一次生成失败，在负缓存期内相同请求直接返回该错误而不再调用AI
         
+        负缓存时间从 negative_ttl 开始，每次连续失败翻倍，最多 negative_max_ttl。
+        上一条记录过期后超过 negative_max_ttl 仍未再失败时重新计数。
+        
+        Args:
+            cache_key: 缓存键
+            error: 错误信息
+        """
+        if self.negative_ttl <= 0:
+            return
+        now = time.time()
+        try:
+            previous = self.backend.read_failure(cache_key)
+            failures = 1
+            if previous is not None and now - previous['expires_at'] < self.negative_max_ttl:
+                failures = previous['failures'] + 1
+            ttl = min(self.negative_ttl * 2 ** min(failures - 1, 30), self.negative_max_ttl)
+            self.backend.write_failure(cache_key, {
+                'timestamp': now,
+                'expires_at': now + ttl,
+                'failures': failures,
+                'error': error,
+            })
+            self.counters.add('negative_recorded')
+        except Exception as e:
+            print(f"失败记录写入失败: {e}")
+    
+    def clear_failure(self, cache_key: str) -> None:
+        """生成成功后删除该键的失败记录"""
+        try:
+            self.backend.delete_failure(cache_key)
+        except Exception as e:
+            print(f"失败记录删除失败: {e}")
+    
+    def clear_expired(self) -> int:
+        """
+        清理超出宽限期的过期缓存
+        
+        Returns:
+            清理的条目数量
+        """
+        now = time.time()
+        # 过期的失败记录已不再生效，但保留 negative_max_ttl 以便延续退避计数
+        self.backend.clear_failures(now - self.negative_max_ttl)
+        cleared_count = self.backend.delete_older_than(now - self.cache_ttl - self.stale_ttl)
+        cache_evictions.inc('disk', amount=cleared_count)
         return cleared_count
     
     def clear_all(self) -> int:
         """
-        清理所有缓存文件
+        清理所有缓存
         
         Returns:
-            清理的文件数量
+            清理的条目数量
+        """
+        cleared_count = self.backend.clear()
+        self._bump_memory_epoch()
+        return cleared_count
+    
+    def invalidate_style(self, style_id: str) -> Tuple[int, List[Dict[str, str]]]:
+        """
+        清除某个风格的全部缓存（包括旧模板版本的记录与失败记录），其他风格不受影响
+        
+        Args:
+            style_id: 风格ID
+            
+        Returns:
+            (清除的条目数量, 被清除的 {title, author, style_id})；后者按当前热度从高到低排列，
+            同一请求（规范化后相同）只出现一次，可直接用于重新预热
         """
         cleared_count = 0
-        for cache_file in self.cache_dir.glob("*.json"):
-            try:
-                cache_file.unlink()
+        invalidated: Dict[str, Dict[str, str]] = {}
+        for cache_key, record in self.backend.style_entries(style_id):
+            if self.backend.delete(cache_key):
                 cleared_count += 1
-            except OSError:
-                pass
-        
-        return cleared_count
+            self.backend.delete_failure(cache_key)
+            if self.memory is not None:
+                self.memory.delete(cache_key)
+            if self.similarity is not None:
+                self.similarity.remove(cache_key)
+            title, author = record.get('title', ''), record.get('author', '')
+            invalidated.setdefault(self._generate_cache_key(title, author, style_id), {
+                'title': title, 'author': author, 'style_id': style_id,
+            })
+        cache_evictions.inc('disk', amount=cleared_count)
+        if cleared_count:
+            self._bump_memory_epoch()
+        ranked = sorted(invalidated.items(), key=lambda item: self.popularity.count(item[0]), reverse=True)
+        return cleared_count, [item for _, item in ranked]
     
     def get_cache_stats(self) -> Dict[str, Any]:
         """
@@ -150,34 +470,66 @@ class CacheService:
         Returns:
             包含缓存统计信息的字典
         """
-        cache_files = list(self.cache_dir.glob("*.json"))
-        total_files = len(cache_files)
-        valid_files = 0
-        expired_files = 0
-        corrupted_files = 0
-        current_time = time.time()
-        
-        for cache_file in cache_files:
-            try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    cache_data = json.load(f)
-                
-                if current_time - cache_data['timestamp'] > self.cache_ttl:
-                    expired_files += 1
-                else:
-                    valid_files += 1
-            except (json.JSONDecodeError, KeyError, OSError):
-                corrupted_files += 1
+        now = time.time()
+        counts = self.backend.count(now - self.cache_ttl)
+        blobs = self.backend.blob_stats()
+        counters = self.counters.snapshot()
         
         return {
-            'total_files': total_files,
-            'valid_files': valid_files,
-            'expired_files': expired_files,
-            'corrupted_files': corrupted_files,
-            'cache_dir': str(self.cache_dir),
-            'cache_ttl': self.cache_ttl
+            'total_files': counts['total'],
+            'valid_files': counts['valid'],
+            'expired_files': counts['expired'],
+            'corrupted_files': counts['corrupted'],
+            'backend': self.backend.name,
+            'cache_dir': self.backend.location(),
+            'cache_ttl': self.cache_ttl,
+            'stale_ttl': self.stale_ttl,
+            'storage': {
+                'codec': self.codec,
+                'blobs': blobs['blobs'],
+                # 各条目HTML原始大小之和 / 去重后的原始大小 / 压缩后实际占用
+                'logical_bytes': counts['logical_bytes'],
+                'unique_bytes': blobs['raw_bytes'],
+                'stored_bytes': blobs['stored_bytes'],
+                'saved_bytes': max(counts['logical_bytes'] - blobs['stored_bytes'], 0),
+            },
+            'memory': self.memory.get_stats() if self.memory is not None else None,
+            # 以下计数为同一缓存目录下全部 worker 的合计
+            'lookups': {
+                tier: {result: counters[f"{tier}_{result}"] for result in results}
+                for tier, results in _LOOKUP_TIERS if tier != 'negative'
+            },
+            'writes': counters['writes'],
+            'shared_counters': self.counters.shared,
+            'generation_locks': {
+                'waits': counters['generation_waits'],
+                'reused': counters['generation_reused'],
+            },
+            'normalization': {
+                'enabled': self.normalize_titles,
+                'hits': counters['normalized_hits'],
+            },
+            'similarity': self.similarity.get_stats() if self.similarity is not None else None,
+            'popularity': self.popularity.get_stats(),
+            'negative': {
+                'entries': self.backend.count_failures(now),
+                'hits': counters['negative_hit'],
+                'recorded': counters['negative_recorded'],
+                'ttl': self.negative_ttl,
+                'max_ttl': self.negative_max_ttl,
+            }
         }
 
 
 # 全局缓存实例
-cache_service = CacheService()
\ No newline at end of file
+cache_service = CacheService(
+    cache_dir=os.environ.get('CACHE_DIR', 'cache'),
+    memory_max_bytes=int(os.environ.get('CACHE_MEMORY_MAX_BYTES', str(64 * 1024 * 1024))),
+    backend=os.environ.get('CACHE_BACKEND', 'json'),
+    codec=os.environ.get('CACHE_CODEC', 'gzip'),
+    stale_ttl=int(os.environ.get('CACHE_STALE_TTL', str(3600 * 24))),
+    negative_ttl=int(os.environ.get('NEGATIVE_CACHE_TTL', '30')),
+    negative_max_ttl=int(os.environ.get('NEGATIVE_CACHE_MAX_TTL', '600')),
+    normalize_titles=os.environ.get('CACHE_NORMALIZE_TITLES', '1') != '0',
+    similarity_threshold=float(os.environ.get('CACHE_SIMILARITY_THRESHOLD', '0'))
+)
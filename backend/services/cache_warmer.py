@@ -0,0 +1,213 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+from .cache_service import cache_service
+from .template_registry import template_registry
+
+
+class CacheWarmer:
+    def __init__(self, interval: float = 60.0, top_n: int = 100, rate: float = 0.5,
+                 refresh_ahead: float = 0.2, min_count: float = 3.0):
+        """
+        初始化后台缓存预热
+
+        周期性检查访问最频繁的键：缓存已丢失（如重新部署、清空缓存后），
+        或剩余有效期不足 refresh_ahead * cache_ttl 时，在过期前重新生成。
+
+        Args:
+            interval: 两轮检查之间的间隔（秒）
+            top_n: 每轮检查的热点键数量
+            rate: 每秒最多发起的预热生成次数
+            refresh_ahead: 剩余有效期占 cache_ttl 的比例低于该值时提前刷新
+            min_count: 热度低于该值的键不预热
+        """
+        self.interval = interval
+        self.top_n = top_n
+        self.rate = rate
+        self.refresh_ahead = refresh_ahead
+        self.min_count = min_count
+        self.refreshed = 0
+        self.failed = 0
+        self.last_run: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        # 失效后等待按 rate 逐个重新生成的条目
+        self._rewarm_queue: deque = deque()
+        self._rewarm_task: Optional[asyncio.Task] = None
+
+    def _fresh_after(self, now: float) -> float:
+        """写入时间晚于该时间戳的条目剩余有效期足够，不需要提前刷新"""
+        return now - cache_service.cache_ttl * (1 - self.refresh_ahead)
+
+    def _needs_refresh(self, cache_key: str, now: float) -> bool:
+        # 以存储后端中的写入时间为准：其他 worker 刷新过的键不会因本进程内存层的旧副本而重复刷新
+        timestamp = cache_service.entry_timestamp(cache_key)
+        return timestamp is None or timestamp < self._fresh_after(now)
+
+    async def run_once(self) -> int:
+        """
+        执行一轮预热
+
+        Returns:
+            本轮重新生成的条目数量
+        """
+        from .deepseek_service import refresh_cover_html
+
+        refreshed = 0
+        now = time.time()
+        for item in cache_service.popularity.top(self.top_n, self.min_count):
+            if self._stopping:
+                break
+            if not self._needs_refresh(item['cache_key'], now):
+                continue
+            template = template_registry.get(item['style_id'])
+            if template is None:
+                cache_service.popularity.forget(item['cache_key'])
+                continue
+            try:
+                # 多个 worker 同时判断需要刷新时，在生成锁内再确认一次，只有一个 worker 调用AI
+                await refresh_cover_html(item['title'], item['author'], template, self._fresh_after(now))
+                refreshed += 1
+                self.refreshed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"缓存预热失败: {item['title']} - {item['style_id']}: {e}")
+            # 限速，避免预热占满上游配额
+            await asyncio.sleep(1 / self.rate if self.rate > 0 else 0)
+        self.last_run = time.time()
+        return refreshed
+
+    def rewarm(self, items: List[Dict[str, str]]) -> int:
+        """
+        在后台按 rate 限速逐个重新生成失效的条目（如 /cache/invalidate 清除的风格缓存），
+        避免同一时间集中调用上游；需在事件循环中调用
+
+        Args:
+            items: {title, author, style_id} 列表，按优先级排列
+
+        Returns:
+            加入队列的条目数量
+        """
+        self._rewarm_queue.extend(items)
+        if items and (self._rewarm_task is None or self._rewarm_task.done()):
+            self._rewarm_task = asyncio.ensure_future(self._drain_rewarm())
+        return len(items)
+
+    async def _drain_rewarm(self) -> None:
+        from .deepseek_service import refresh_cover_html
+
+        while self._rewarm_queue and not self._stopping:
+            item = self._rewarm_queue.popleft()
+            template = template_registry.get(item['style_id'])
+            # 风格已被删除，或排队期间已有请求重新生成
+            cache_key = cache_service.cache_key(item['title'], item['author'], item['style_id'])
+            if template is None or cache_service.entry_timestamp(cache_key) is not None:
+                continue
+            try:
+                await refresh_cover_html(item['title'], item['author'], template,
+                                         time.time() - cache_service.cache_ttl)
+                self.refreshed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"缓存重新预热失败: {item['title']} - {item['style_id']}: {e}")
+            await asyncio.sleep(1 / self.rate if self.rate > 0 else 0)
+
+    async def _loop(self) -> None:
+        while not self._stopping:
+            try:
+                await self.run_once()
+                cache_service.popularity.save()
+            except Exception as e:
+                print(f"缓存预热出错: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        """恢复持久化的热点列表并启动后台预热"""
+        restored = cache_service.popularity.load()
+        if restored:
+            print(f"已恢复 {restored} 个热点缓存键")
+        self._stopping = False
+        self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self) -> None:
+        """停止后台预热并保存热点列表"""
+        self._stopping = True
+        for task in (self._task, self._rewarm_task):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._task = self._rewarm_task = None
+        cache_service.popularity.save()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'running': self._task is not None,
+            'refreshed': self.refreshed,
+            'failed': self.failed,
+            'last_run': self.last_run,
+            'rewarm_pending': len(self._rewarm_queue),
+        }
+
+
+def prewarm_items(titles: List[str], author: str = '', style_ids: Optional[List[str]] = None) -> List[Dict[str, str]]:
+    """展开为 标题 × 风格 的生成条目；未指定风格时使用全部模板"""
+    if not style_ids:
+        style_ids = [t['id'] for t in template_registry.all()]
+    return [
+        {'title': title, 'author': author, 'style_id': style_id}
+        for title in titles if title.strip()
+        for style_id in style_ids
+    ]
+
+
+async def _prewarm(args: argparse.Namespace) -> int:
+    from .batch_service import generate_batch
+    from .deepseek_service import shutdown_deepseek_client
+
+    with open(args.titles, 'r', encoding='utf-8') as f:
+        titles = [line.strip() for line in f]
+    items = prewarm_items(titles, args.author, args.styles)
+    print(f"预生成 {len(items)} 个封面（{len(set(i['title'] for i in items))} 个标题）")
+    failed = 0
+    try:
+        async for result in generate_batch(items, args.concurrency):
+            if result['status'] == 'ok':
+                state = '缓存命中' if result['cached'] else '已生成'
+            else:
+                failed += 1
+                state = f"失败: {result['error']['message']}"
+            print(f"  {result['title']} - {result['style_id']}: {state}")
+    finally:
+        await shutdown_deepseek_client()
+    return 1 if failed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='为标题列表在全部模板下预生成封面')
+    parser.add_argument('titles', help='标题列表文件，每行一个标题')
+    parser.add_argument('--author', default='')
+    parser.add_argument('--styles', nargs='+', help='只预生成指定风格，默认全部模板')
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+    template_registry.load()
+    return asyncio.run(_prewarm(args))
+
+
+# 全局缓存预热实例
+cache_warmer = CacheWarmer(
+    interval=float(os.environ.get('WARM_INTERVAL', '60')),
+    top_n=int(os.environ.get('WARM_TOP_N', '100')),
+    rate=float(os.environ.get('WARM_RATE', '0.5')),
+    refresh_ahead=float(os.environ.get('WARM_REFRESH_AHEAD', '0.2')),
+    min_count=float(os.environ.get('WARM_MIN_HITS', '3'))
+)
+
+
+if __name__ == '__main__':
+    # 用法: python -m services.cache_warmer titles.txt [--author 作者] [--styles style_1 style_2]
+    sys.exit(main())
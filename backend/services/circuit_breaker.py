@@ -0,0 +1,119 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator
+
+from .metrics import registry
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器处于打开状态，上游调用被快速拒绝"""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, trial_timeout: float = 210.0):
+        """
+        初始化熔断器
+
+        连续失败达到阈值后打开，期间所有调用快速失败；经过 reset_timeout 后进入半开状态，
+        只放行一次试探调用，成功则关闭，失败则重新打开。
+        试探调用没有记录结果就结束（客户端断开、请求被合并、中途抛出其他异常）时，
+        由 trial() 释放试探名额；超过 trial_timeout 仍未结束的试探视为已丢失。
+
+        Args:
+            failure_threshold: 触发熔断的连续失败次数
+            reset_timeout: 打开状态持续的时间（秒）
+            trial_timeout: 试探调用的最长占用时间（秒），应不短于一次上游请求（含重试）的耗时
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.trial_timeout = trial_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._trial_in_flight = False
+        self._trial_started = 0.0
+        self._trial_id = 0
+
+    def allow(self) -> bool:
+        """判断当前是否允许发起上游调用"""
+        if self.state == 'closed':
+            return True
+        if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = 'half_open'
+            self._trial_in_flight = False
+        if self.state == 'half_open' and self._trial_in_flight \
+                and time.monotonic() - self._trial_started >= self.trial_timeout:
+            print('熔断器试探调用超时未结束，重新放行试探')
+            self._trial_in_flight = False
+        if self.state == 'half_open' and not self._trial_in_flight:
+            self._trial_in_flight = True
+            self._trial_started = time.monotonic()
+            self._trial_id += 1
+            return True
+        self.rejected += 1
+        return False
+
+    @contextmanager
+    def trial(self) -> Iterator[None]:
+        """
+        包裹一次上游调用：不允许时抛出 CircuitOpenError；
+        本次调用占用了半开状态的试探名额而结束时仍未记录结果，则释放名额
+        """
+        if not self.allow():
+            raise CircuitOpenError('AI服务暂时不可用，请稍后重试')
+        trial_id = self._trial_id if self.state == 'half_open' else None
+        try:
+            yield
+        finally:
+            if (trial_id is not None and self.state == 'half_open'
+                    and self._trial_in_flight and self._trial_id == trial_id):
+                self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        self.state = 'closed'
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """
+        记录一次失败
+
+        只有进入打开状态时才记录打开时间；打开期间陆续返回的、熔断前就已发出的调用失败
+        不会推迟半开时间。
+        """
+        self.failures += 1
+        if self.state == 'open':
+            return
+        if self.state == 'half_open' or self.failures >= self.failure_threshold:
+            print(f"上游熔断器打开，连续失败 {self.failures} 次")
+            self.state = 'open'
+            self.opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取熔断器状态"""
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'rejected': self.rejected,
+        }
+
+
+# 全局上游熔断器实例
+upstream_breaker = CircuitBreaker(
+    failure_threshold=int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', '5')),
+    reset_timeout=float(os.environ.get('CIRCUIT_RESET_TIMEOUT', '30')),
+    # 默认覆盖一次上游请求的全部重试
+    trial_timeout=float(os.environ.get(
+        'CIRCUIT_TRIAL_TIMEOUT',
+        float(os.environ.get('DEEPSEEK_TIMEOUT', '60')) * int(os.environ.get('DEEPSEEK_RETRY', '3')) + 30
+    ))
+)
+
+registry.callback('circuit_breaker_state', 'Upstream circuit breaker state (1 for the current state)', 'gauge',
+                  lambda: {(state,): int(upstream_breaker.state == state) for state in ('closed', 'open', 'half_open')},
+                  ('state',))
+registry.callback('circuit_breaker_rejected_total', 'Calls rejected while the breaker was open', 'counter',
+                  lambda: {(): upstream_breaker.rejected})
@@ -0,0 +1,59 @@
+import gzip
+from typing import Iterable, Tuple
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖，未安装时只使用 gzip
+    zstandard = None
+
+
+# 编码名称与 HTTP Content-Encoding 取值保持一致，命中时可直接原样下发
+SUPPORTED_CODECS = ('gzip', 'zstd') if zstandard is not None else ('gzip',)
+
+
+def compress(text: str, codec: str = 'gzip') -> Tuple[str, bytes]:
+    """
+    压缩文本
+
+    Args:
+        text: 原始文本
+        codec: 'gzip' 或 'zstd'（需安装 zstandard，否则回退到 gzip）
+
+    Returns:
+        (实际使用的编码, 压缩后的字节)
+    """
+    raw = text.encode('utf-8')
+    if codec == 'zstd' and zstandard is not None:
+        return 'zstd', zstandard.ZstdCompressor(level=10).compress(raw)
+    # mtime=0 保证相同内容压缩结果完全一致
+    return 'gzip', gzip.compress(raw, compresslevel=9, mtime=0)
+
+
+def decompress(codec: str, data: bytes) -> str:
+    """解压缩为文本"""
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('未安装 zstandard，无法解压 zstd 数据')
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    if codec == 'gzip':
+        return gzip.decompress(data).decode('utf-8')
+    raise ValueError(f"未知的压缩编码: {codec}")
+
+
+def accepts(accept_encoding: str, codec: str) -> bool:
+    """判断客户端的 Accept-Encoding 是否接受指定编码"""
+    accepted = _parse_accept_encoding(accept_encoding)
+    return codec in accepted or '*' in accepted
+
+
+def _parse_accept_encoding(header: str) -> Iterable[str]:
+    accepted = set()
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(name)
+    return accepted
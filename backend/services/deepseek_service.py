@@ -1,7 +1,82 @@
+import asyncio
+import json
 import os
-import httpx
+import random
 import time
-from typing import Dict, Any
+import httpx
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, Any, Optional, Tuple
+
+from .circuit_breaker import CircuitOpenError, upstream_breaker
+from .html_postprocess import postprocess_html
+from .metrics import deepseek_latency, deepseek_responses, deepseek_retries, deepseek_tokens, registry
+from .rate_limiter import AdaptiveLimiter, parse_retry_after
+
+
+# 可重试的状态码；其余 4xx（如参数错误、鉴权失败、内容审核拒绝）直接失败
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+# 表示上游限流或过载、需要降低并发的状态码
+THROTTLE_STATUS = {429, 503}
+
+
+# 上游返回的 token 用量累计，prompt_cache_hit_tokens 为命中上下文缓存的提示词 token
+usage_stats: Dict[str, int] = {
+    'requests': 0,
+    'prompt_tokens': 0,
+    'completion_tokens': 0,
+    'prompt_cache_hit_tokens': 0,
+    'prompt_cache_miss_tokens': 0,
+}
+
+
+def record_usage(usage: Optional[Dict[str, Any]], style_id: str = '') -> None:
+    """累计一次调用的 token 用量，并按风格计入指标"""
+    if not usage:
+        return
+    usage_stats['requests'] += 1
+    for field in ('prompt_tokens', 'completion_tokens', 'prompt_cache_hit_tokens', 'prompt_cache_miss_tokens'):
+        amount = int(usage.get(field) or 0)
+        usage_stats[field] += amount
+        if amount:
+            deepseek_tokens.inc(style_id, field[:-len('_tokens')], amount=amount)
+
+
+def _observe_attempt(mode: str, start: float, status: str) -> None:
+    """记录一次上游尝试的耗时与结果"""
+    deepseek_latency.observe(time.perf_counter() - start, mode)
+    deepseek_responses.inc(mode, status)
+
+
+def _error_status(exc: Exception) -> str:
+    if isinstance(exc, httpx.TimeoutException):
+        return 'timeout'
+    if isinstance(exc, httpx.TransportError):
+        return 'connect_error'
+    return 'error'
+
+
+def get_usage_stats() -> Dict[str, Any]:
+    """获取 token 用量与上下文缓存命中率"""
+    stats: Dict[str, Any] = dict(usage_stats)
+    cached = stats['prompt_cache_hit_tokens'] + stats['prompt_cache_miss_tokens']
+    stats['prompt_cache_hit_ratio'] = round(stats['prompt_cache_hit_tokens'] / cached, 4) if cached else 0
+    return stats
+
+
+class DeepSeekError(RuntimeError):
+    """上游调用失败；retryable 表示失败原因是超时、限流或服务端错误等暂时性问题"""
+
+    def __init__(self, message: str, retryable: bool = True) -> None:
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class CachedFailureError(DeepSeekError):
+    """同一请求最近生成失败，负缓存期内直接返回上次的错误；retry_after 为剩余秒数"""
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message, retryable=True)
+        self.retry_after = retry_after
 
 
 class DeepSeekClient:
@@ -12,45 +87,299 @@ class DeepSeekClient:
         # 可覆盖基础地址与模型名
         self.base_url = os.environ.get('DEEPSEEK_API_BASE', 'https://api.deepseek.com').rstrip('/')
         self.model = os.environ.get('DEEPSEEK_MODEL', 'deepseek-chat')
+        self.timeout = float(os.environ.get('DEEPSEEK_TIMEOUT', '60'))
+        # 整个进程共享一个连接池，复用 keep-alive 连接，避免每次请求都做 TLS 握手
+        max_connections = int(os.environ.get('DEEPSEEK_MAX_CONNECTIONS', '200'))
+        self._http = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={
+                'Authorization': f"Bearer {self.api_key}",
+                'Content-Type': 'application/json',
+            },
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=float(os.environ.get('DEEPSEEK_KEEPALIVE', '120')),
+            ),
+        )
+        # 进程内所有上游调用共用的自适应限流器
+        self.limiter = AdaptiveLimiter.from_env()
+
+    async def warmup(self) -> None:
+        """预先建立到上游的连接，让第一个真实请求不用承担握手开销"""
+        try:
+            await self._http.get('/v1/models')
+        except httpx.HTTPError as e:
+            print(f"DeepSeek连接预热失败: {e}")
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+    def _retry_delay(self, attempt: int, exc: Exception) -> Optional[float]:
+        """
+        计算失败后的重试等待时间
+
+        只有超时、连接错误以及可重试的状态码才会重试；服务端给出 Retry-After 时优先遵循，
+        否则使用带完全抖动的指数退避，避免所有请求同时重试。
+
+        Returns:
+            等待秒数，不应重试时返回None
+        """
+        base_delay = float(os.environ.get('DEEPSEEK_RETRY_BASE', '0.8'))
+        max_delay = float(os.environ.get('DEEPSEEK_RETRY_MAX_DELAY', '20'))
+        if isinstance(exc, httpx.HTTPStatusError):
+            if exc.response.status_code not in RETRYABLE_STATUS:
+                return None
+            retry_after = parse_retry_after(exc.response.headers.get('retry-after'))
+            if retry_after is not None:
+                return min(retry_after, max_delay) + random.uniform(0, base_delay)
+        elif not isinstance(exc, (httpx.TimeoutException, httpx.TransportError)):
+            return None
+        return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+    @staticmethod
+    def _response_outcome(resp: httpx.Response) -> Tuple[str, Optional[float]]:
+        """
+        根据响应状态判断限流器应记录的结果，并解析 Retry-After
 
-    def chat(self, messages: list[Dict[str, str]], temperature: float = 0.7, max_tokens: int = 2000) -> str:
-        url = f"{self.base_url}/v1/chat/completions"
-        headers = {
-            'Authorization': f"Bearer {self.api_key}",
-            'Content-Type': 'application/json',
+        Returns:
+            ('throttled' 或 'error', Retry-After 秒数)；成功与否要等响应读完才能确定，
+            因此 2xx 也先记为 'error'，由调用方在读完后改为 'success'
+        """
+        if resp.status_code in THROTTLE_STATUS:
+            return 'throttled', parse_retry_after(resp.headers.get('retry-after'))
+        return 'error', None
+
+    async def chat(self, messages: list[Dict[str, str]], temperature: float = 0.7, max_tokens: int = 2000,
+                   style_id: str = '') -> str:
+        payload: Dict[str, Any] = {
+            'model': self.model,
+            'messages': messages,
+            'temperature': temperature,
+            'max_tokens': max_tokens,
         }
+        # 至少尝试一次：DEEPSEEK_RETRY=0 时也要发起请求
+        attempts = max(1, int(os.environ.get('DEEPSEEK_RETRY', '3')))
+        last_exc: Exception | None = None
+        delay: Optional[float] = None
+        for i in range(attempts):
+            await self.limiter.acquire()
+            outcome, retry_after = 'error', None
+            start, status = time.perf_counter(), 'error'
+            try:
+                resp = await self._http.post('/v1/chat/completions', json=payload)
+                status = str(resp.status_code)
+                outcome, retry_after = self._response_outcome(resp)
+                resp.raise_for_status()
+                data = resp.json()
+                record_usage(data.get('usage'), style_id)
+                content = data['choices'][0]['message']['content']
+                outcome = 'success'
+                return content
+            except Exception as e:
+                last_exc = e
+                if not isinstance(e, httpx.HTTPStatusError):
+                    status = _error_status(e)
+            finally:
+                _observe_attempt('chat', start, status)
+                await self.limiter.release(outcome, retry_after)
+            delay = self._retry_delay(i, last_exc)
+            if delay is None or i == attempts - 1:
+                break
+            deepseek_retries.inc('chat')
+            # 退避期间让出事件循环，不占用工作线程
+            await asyncio.sleep(delay)
+        raise DeepSeekError(f"DeepSeek请求失败: {last_exc}", retryable=delay is not None)
+
+    async def stream_chat(self, messages: list[Dict[str, str]], temperature: float = 0.7,
+                          max_tokens: int = 2000, style_id: str = '') -> AsyncIterator[str]:
+        """以流式方式调用对话接口，逐段产出生成的文本"""
         payload: Dict[str, Any] = {
             'model': self.model,
             'messages': messages,
             'temperature': temperature,
             'max_tokens': max_tokens,
+            'stream': True,
+            # 让最后一个数据块携带 token 用量
+            'stream_options': {'include_usage': True},
         }
-        # 简单指数退避重试
-        attempts = int(os.environ.get('DEEPSEEK_RETRY', '3'))
-        base_delay = float(os.environ.get('DEEPSEEK_RETRY_BASE', '0.8'))
-        timeout = float(os.environ.get('DEEPSEEK_TIMEOUT', '60'))
+        # 只在收到第一个字节之前重试，已经开始输出后无法透明地重来
+        attempts = max(1, int(os.environ.get('DEEPSEEK_RETRY', '3')))
         last_exc: Exception | None = None
+        delay: Optional[float] = None
         for i in range(attempts):
+            started = False
+            await self.limiter.acquire()
+            outcome, retry_after = 'error', None
+            start, status = time.perf_counter(), 'error'
             try:
-                with httpx.Client(timeout=timeout) as client:
-                    resp = client.post(url, headers=headers, json=payload)
+                async with self._http.stream('POST', '/v1/chat/completions', json=payload) as resp:
+                    status = str(resp.status_code)
+                    outcome, retry_after = self._response_outcome(resp)
                     resp.raise_for_status()
-                    data = resp.json()
-                    return data['choices'][0]['message']['content']
+                    async for line in resp.aiter_lines():
+                        if not line.startswith('data:'):
+                            continue
+                        data = line[5:].strip()
+                        if data == '[DONE]':
+                            outcome = 'success'
+                            return
+                        chunk = json.loads(data)
+                        record_usage(chunk.get('usage'), style_id)
+                        if not chunk.get('choices'):
+                            continue
+                        delta = chunk['choices'][0].get('delta', {}).get('content')
+                        if delta:
+                            started = True
+                            yield delta
+                outcome = 'success'
+                return
             except Exception as e:
+                if not isinstance(e, httpx.HTTPStatusError):
+                    status = _error_status(e)
+                if started:
+                    raise DeepSeekError(f"DeepSeek流式响应中断: {e}")
                 last_exc = e
-                if i < attempts - 1:
-                    time.sleep(base_delay * (2 ** i))
-        raise RuntimeError(f"DeepSeek请求失败: {last_exc}")
+            finally:
+                _observe_attempt('stream', start, status)
+                await self.limiter.release(outcome, retry_after)
+            delay = self._retry_delay(i, last_exc)
+            if delay is None or i == attempts - 1:
+                break
+            deepseek_retries.inc('stream')
+            await asyncio.sleep(delay)
+        raise DeepSeekError(f"DeepSeek请求失败: {last_exc}", retryable=delay is not None)
 
 
-def build_prompt_html(title: str, author: str, template: Dict[str, Any]) -> list[Dict[str, str]]:
-    # 将模板信息串联成系统与用户消息
-    system = (
-        "你是一名资深网页与营销视觉设计师，返回完整、可运行的HTML页面（内联CSS/JS允许），"
-        "确保比例3:4，文字为主体，并遵循给定设计风格要点。仅返回HTML字符串，不要解释。"
-    )
+class FenceStripper:
+    """
+    增量去除Markdown代码围栏
+
+    逐段输入模型输出，去掉开头的 ```html 行与结尾的 ```，以及首尾空白；
+    结果与对完整字符串做一次性处理一致。
+    """
+
+    def __init__(self) -> None:
+        self._head = ''
+        self._head_done = False
+        self._fenced = False
+        self._fence_line = ''
+        self._tail = ''
+
+    def feed(self, chunk: str) -> str:
+        """输入一段文本，返回当前可以安全输出的部分"""
+        if not self._head_done:
+            self._head += chunk
+            text = self._head.lstrip()
+            if not self._fenced:
+                if len(text) < 3 and not text.strip('`'):
+                    # 还无法判断开头是否为围栏
+                    return ''
+                if text.startswith('```'):
+                    if '\n' not in text:
+                        return ''
+                    self._fenced = True
+                    self._fence_line, text = text.split('\n', 1)
+                    text = text.lstrip()
+            if not text:
+                # 围栏行之后的空白也要去掉，继续等待正文
+                self._head = ''
+                return ''
+            self._head_done = True
+            self._head = ''
+            chunk = text
+        # 末尾的空白与反引号可能属于结尾围栏，先暂存
+        text = self._tail + chunk
+        end = len(text.rstrip(' \t\r\n`'))
+        self._tail = text[end:]
+        return text[:end]
+
+    def finish(self) -> str:
+        """输入结束，返回剩余的输出"""
+        if not self._head_done:
+            # 只有 ```html 这样的单行时原样保留
+            return self._fence_line.rstrip() if self._fenced else self._head.strip()
+        tail = self._tail.rstrip()
+        if self._fenced and tail.endswith('```'):
+            tail = tail[:-3].rstrip()
+        self._tail = ''
+        return tail
+
+
+def strip_code_fence(content: str) -> str:
+    """去除完整模型输出中可能的Markdown代码围栏"""
+    stripper = FenceStripper()
+    return stripper.feed(content) + stripper.finish()
+
+
+_client: Optional[DeepSeekClient] = None
+
+
+def get_deepseek_client() -> DeepSeekClient:
+    """获取进程内共享的 DeepSeek 客户端（首次调用时创建）"""
+    global _client
+    if _client is None:
+        _client = DeepSeekClient()
+    return _client
 
+
+def get_limiter_stats() -> Optional[Dict[str, Any]]:
+    """获取上游限流器状态，客户端尚未创建时返回None"""
+    return _client.limiter.get_stats() if _client is not None else None
+
+
+registry.callback('deepseek_in_flight', 'DeepSeek requests currently holding a limiter slot', 'gauge',
+                  lambda: {(): _client.limiter.in_flight if _client is not None else 0})
+registry.callback('deepseek_concurrency_limit', 'Current adaptive concurrency limit', 'gauge',
+                  lambda: {(): _client.limiter.limit if _client is not None else 0})
+
+
+async def startup_deepseek_client() -> None:
+    """应用启动时创建共享客户端并预热连接池"""
+    try:
+        client = get_deepseek_client()
+    except RuntimeError as e:
+        # 未配置密钥时仍允许服务启动，只是AI接口不可用
+        print(f"DeepSeek客户端未初始化: {e}")
+        return
+    await client.warmup()
+
+
+async def shutdown_deepseek_client() -> None:
+    """应用关闭时释放连接池"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+SYSTEM_PROMPT = (
+    "你是一名资深网页与营销视觉设计师，返回完整、可运行的HTML页面（内联CSS/JS允许），"
+    "确保比例3:4，文字为主体，并遵循给定设计风格要点。仅返回HTML字符串，不要解释。"
+)
+
+
+@dataclass(frozen=True)
+class PromptPlan:
+    """
+    预编译的提示词
+
+    系统消息与模板相关的静态内容只拼接一次；每次请求只在固定位置追加标题和作者，
+    使同一模板的请求共享尽可能长的逐字节相同前缀，从而命中 DeepSeek 的上下文缓存。
+    """
+    system: str
+    user_prefix: str
+
+    def render(self, title: str, author: str) -> list[Dict[str, str]]:
+        return [
+            { 'role': 'system', 'content': self.system },
+            { 'role': 'user', 'content': f"{self.user_prefix}- 标题：{title}\n- 作者：{author or ''}" }
+        ]
+
+
+def compile_prompt_plan(template: Dict[str, Any]) -> PromptPlan:
+    """将模板的静态部分编译为提示词计划"""
     style_desc = template.get('style_details', {})
     requirements = template.get('requirements', {})
 
@@ -65,48 +394,298 @@ def build_prompt_html(title: str, author: str, template: Dict[str, Any]) -> list
         '\n\n【视觉元素风格】',
         style_desc.get('视觉元素风格', ''),
         '\n\n【用户输入】',
-        f"- 标题：{title}",
-        f"- 作者：{author or ''}",
     ]
+    return PromptPlan(
+        system=SYSTEM_PROMPT,
+        user_prefix='\n'.join([p for p in parts if p]) + '\n',
+    )
 
-    user = '\n'.join([p for p in parts if p])
-    return [
-        { 'role': 'system', 'content': system },
-        { 'role': 'user', 'content': user }
-    ]
+
+def finalize_html(html: str) -> str:
+    """写入缓存前的HTML后处理（压缩、去重、画布比例归一），出错时保留原内容"""
+    if os.environ.get('HTML_POSTPROCESS', '1') == '0':
+        return html
+    try:
+        return postprocess_html(html)
+    except Exception as e:
+        print(f"HTML后处理失败，保留原内容: {e}")
+        return html
 
 
-def generate_cover_html(title: str, author: str, template: Dict[str, Any]) -> str:
+# 模板ID -> (模板对象, 提示词计划)；注册表重新加载后模板对象变化，计划随之重新编译
+_plan_cache: Dict[str, Tuple[Dict[str, Any], PromptPlan]] = {}
+
+
+def get_prompt_plan(template: Dict[str, Any]) -> PromptPlan:
+    """获取模板对应的提示词计划，首次使用时编译"""
+    style_id = template.get('id', '')
+    cached = _plan_cache.get(style_id)
+    if cached is not None and cached[0] is template:
+        return cached[1]
+    plan = compile_prompt_plan(template)
+    _plan_cache[style_id] = (template, plan)
+    return plan
+
+
+def build_prompt_html(title: str, author: str, template: Dict[str, Any]) -> list[Dict[str, str]]:
+    # 将模板信息串联成系统与用户消息
+    return get_prompt_plan(template).render(title, author)
+
+
+async def _generate_and_cache(title: str, author: str, template: Dict[str, Any],
+                              fresh_after: Optional[float] = None) -> str:
+    """
+    调用AI生成封面并写入缓存，结果计入熔断器
+
+    多个 worker 同时为同一键生成时，只有拿到跨进程生成锁的 worker 调用AI；
+    其余 worker 等锁释放后直接使用对方写入的缓存。
+    指定 fresh_after 时，拿到锁后存储后端中已有 fresh_after 之后写入的内容则直接使用，
+    用于后台预热：其他 worker 刚刷新过的键不再重复生成。
+    """
     from .cache_service import cache_service
-    
+
     style_id = template.get('id', '')
-    
-    # 尝试从缓存获取
-    cached_html = cache_service.get(title, author, style_id)
-    if cached_html:
-        print(f"缓存命中: {title} - {style_id}")
-        return cached_html
-    
-    # 缓存未命中，调用AI生成
-    print(f"缓存未命中，调用AI生成: {title} - {style_id}")
-    client = DeepSeekClient()
+    cache_key = cache_service.cache_key(title, author, style_id)
+    started = time.time()
+    async with cache_service.generation_locks.hold(cache_key) as waited:
+        if waited:
+            html = _reuse_after_wait(cache_key, started)
+            if html is not None:
+                return html
+        if fresh_after is not None:
+            html = cache_service.written_since(cache_key, fresh_after)
+            if html is not None:
+                cache_service.counters.add('generation_reused')
+                return html
+        return await _call_and_cache(title, author, template, cache_key)
+
+
+def _reuse_after_wait(cache_key: str, started: float) -> Optional[str]:
+    """
+    等到其他 worker 释放生成锁后调用：返回对方在 started 之后写入的内容，没有时返回 None
+
+    对方生成失败时沿用它记录的负缓存，抛出 CachedFailureError，不再重复调用。
+    """
+    from .cache_service import cache_service
+
+    cache_service.counters.add('generation_waits')
+    html = cache_service.written_since(cache_key, started)
+    if html is not None:
+        cache_service.counters.add('generation_reused')
+        return html
+    _raise_cached_failure(cache_key)
+    return None
+
+
+async def _call_and_cache(title: str, author: str, template: Dict[str, Any], cache_key: str) -> str:
+    from .cache_service import cache_service
+
+    style_id = template.get('id', '')
+    client = get_deepseek_client()
     messages = build_prompt_html(title, author, template)
-    content = client.chat(messages)
+    try:
+        content = await client.chat(messages, style_id=style_id)
+    except DeepSeekError as e:
+        _record_outcome(e)
+        cache_service.record_failure(cache_key, str(e))
+        raise
+    upstream_breaker.record_success()
     
-    # 去除可能的Markdown代码围栏
-    content = content.strip()
-    if content.startswith('```'):
-        # 形如 ```html\n...\n``` 或 ```\n...\n```
-        parts = content.split('\n', 1)
-        if len(parts) == 2:
-            body = parts[1]
-            if body.endswith('```'):
-                body = body[:-3]
-            content = body.strip()
+    # 去除可能的Markdown代码围栏，形如 ```html\n...\n``` 或 ```\n...\n```
+    content = finalize_html(strip_code_fence(content))
     
     # 将结果存入缓存
     cache_service.set(title, author, style_id, content)
+    cache_service.clear_failure(cache_key)
     
     return content
 
 
+def _record_outcome(exc: DeepSeekError) -> None:
+    """只有超时、限流、5xx 等说明上游不健康的失败才计入熔断"""
+    if exc.retryable:
+        upstream_breaker.record_failure()
+    else:
+        upstream_breaker.record_success()
+
+
+# 持有后台刷新任务的引用，避免被垃圾回收
+_refresh_tasks: set = set()
+
+
+def _refresh_done(task: asyncio.Task) -> None:
+    _refresh_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"后台刷新失败: {task.exception()}")
+
+
+def _raise_cached_failure(cache_key: str) -> None:
+    """该键处于负缓存期内时抛出 CachedFailureError"""
+    from .cache_service import cache_service
+
+    failure = cache_service.get_failure(cache_key)
+    if failure is not None:
+        raise CachedFailureError(failure.get('error') or 'AI生成失败', failure['retry_after'])
+
+
+def _schedule_refresh(title: str, author: str, template: Dict[str, Any], cache_key: str) -> None:
+    """在后台重新生成已过期的缓存；熔断打开或最近刷新失败时跳过"""
+    from .cache_service import cache_service
+    from .singleflight import generation_flight
+
+    if cache_service.get_failure(cache_key) is not None:
+        return
+
+    async def refresh() -> None:
+        try:
+            with upstream_breaker.trial():
+                await generation_flight.do(
+                    cache_key,
+                    lambda: _generate_and_cache(title, author, template)
+                )
+        except CircuitOpenError:
+            pass
+
+    task = asyncio.ensure_future(refresh())
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_done)
+
+
+async def refresh_cover_html(title: str, author: str, template: Dict[str, Any],
+                             fresh_after: Optional[float] = None) -> str:
+    """
+    不查缓存，直接重新生成并写入缓存，用于预热热点条目
+
+    fresh_after 不为 None 时，在跨 worker 生成锁内确认存储后端中没有该时间之后写入的内容才生成，
+    多个 worker 的预热不会重复刷新同一个键。
+    负缓存期内抛出 CachedFailureError，熔断打开时抛出 CircuitOpenError。
+    """
+    from .cache_service import cache_service
+    from .singleflight import generation_flight
+
+    cache_key = cache_service.cache_key(title, author, template.get('id', ''))
+    _raise_cached_failure(cache_key)
+    with upstream_breaker.trial():
+        return await generation_flight.do(
+            cache_key,
+            lambda: _generate_and_cache(title, author, template, fresh_after)
+        )
+
+
+async def generate_cover_html(title: str, author: str, template: Dict[str, Any], record: bool = True) -> str:
+    """
+    获取封面HTML：命中缓存时直接返回，否则调用AI生成并写入缓存
+
+    调用方已经查过一次缓存（批量生成）或并非用户访问（预热任务）时传 record=False，
+    这里的缓存查找不再计入命中统计与访问热度。
+    """
+    from .cache_service import cache_service
+    from .singleflight import generation_flight
+    
+    style_id = template.get('id', '')
+    cache_key = cache_service.cache_key(title, author, style_id)
+    
+    # 尝试从缓存获取
+    hit = cache_service.lookup(title, author, style_id, record)
+    if hit:
+        cached_html, stale = hit
+        if stale:
+            # 已过期但在宽限期内：立即返回旧内容，后台刷新
+            print(f"缓存过期，返回旧内容并后台刷新: {title} - {style_id}")
+            _schedule_refresh(title, author, template, cache_key)
+        else:
+            print(f"缓存命中: {title} - {style_id}")
+        return cached_html
+    
+    # 最近生成失败过的请求在负缓存期内直接返回错误
+    _raise_cached_failure(cache_key)
+    
+    # 上游不健康时快速失败，不再堆积超时请求；
+    # 半开状态下的试探调用无论以何种方式结束都会释放试探名额
+    with upstream_breaker.trial():
+        # 缓存未命中，调用AI生成；相同请求并发到达时只发起一次上游调用
+        print(f"缓存未命中，调用AI生成: {title} - {style_id}")
+        return await generation_flight.do(
+            cache_key,
+            lambda: _generate_and_cache(title, author, template)
+        )
+
+
+async def stream_cover_html(title: str, author: str, template: Dict[str, Any]) -> AsyncIterator[Tuple[str, str]]:
+    """
+    流式生成封面HTML
+
+    产出 (事件, 内容)：'chunk' 为生成过程中的片段（已去除代码围栏），
+    最后的 'done' 为后处理后的完整HTML，与写入缓存的内容一致。
+    缓存命中时只产出 'done'（已过期的旧内容同时触发后台刷新）；
+    未命中时相同请求共享同一次流式调用，后到的请求先补发已生成的片段。
+    """
+    from .cache_service import cache_service
+    from .singleflight import stream_flight
+
+    style_id = template.get('id', '')
+    cache_key = cache_service.cache_key(title, author, style_id)
+
+    hit = cache_service.lookup(title, author, style_id)
+    if hit:
+        cached_html, stale = hit
+        if stale:
+            print(f"缓存过期，返回旧内容并后台刷新: {title} - {style_id}")
+            _schedule_refresh(title, author, template, cache_key)
+        else:
+            print(f"缓存命中: {title} - {style_id}")
+        yield 'done', cached_html
+        return
+
+    _raise_cached_failure(cache_key)
+
+    # 客户端中途断开时生成器被关闭，trial() 同样会释放试探名额；共享的上游调用继续完成并写入缓存
+    with upstream_breaker.trial():
+        print(f"缓存未命中，流式调用AI生成: {title} - {style_id}")
+        async for event in stream_flight.subscribe(
+            cache_key,
+            lambda publish: _stream_and_cache(title, author, template, cache_key, publish)
+        ):
+            yield event
+
+
+async def _stream_and_cache(title: str, author: str, template: Dict[str, Any], cache_key: str,
+                            publish: Callable[[str], None]) -> str:
+    """
+    流式调用AI，逐段发布片段，完成后写入缓存并返回后处理后的完整HTML
+
+    和非流式生成一样先取得跨 worker 生成锁；等待过其他 worker 时直接使用它写入的缓存。
+    """
+    from .cache_service import cache_service
+
+    style_id = template.get('id', '')
+    started = time.time()
+    async with cache_service.generation_locks.hold(cache_key) as waited:
+        if waited:
+            html = _reuse_after_wait(cache_key, started)
+            if html is not None:
+                return html
+        client = get_deepseek_client()
+        messages = build_prompt_html(title, author, template)
+        stripper = FenceStripper()
+        parts: list[str] = []
+        try:
+            async for delta in client.stream_chat(messages, style_id=style_id):
+                text = stripper.feed(delta)
+                if text:
+                    parts.append(text)
+                    publish(text)
+        except DeepSeekError as e:
+            _record_outcome(e)
+            cache_service.record_failure(cache_key, str(e))
+            raise
+        upstream_breaker.record_success()
+        text = stripper.finish()
+        if text:
+            parts.append(text)
+            publish(text)
+
+        content = finalize_html(''.join(parts))
+        cache_service.set(title, author, style_id, content)
+        cache_service.clear_failure(cache_key)
+        return content
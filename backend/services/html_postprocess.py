@@ -0,0 +1,271 @@
+import re
+from typing import List, Optional, Set, Tuple
+
+
+# 注释、需要整体处理的原样块、标签、文本
+_TOKEN = re.compile(
+    r'<!--.*?-->'
+    r'|<(script|style|pre|textarea)\b[^>]*>.*?</\1\s*>'
+    r'|<[^>]*>'
+    r'|[^<]+'
+    r'|<',
+    re.S | re.I,
+)
+_TAG_NAME = re.compile(r'</?\s*([a-zA-Z][\w:-]*)')
+_QUOTED = re.compile(r'("[^"]*"|\'[^\']*\')')
+_WHITESPACE = re.compile(r'\s+')
+_HREF = re.compile(r'\bhref\s*=\s*("([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.I)
+_REL = re.compile(r'\brel\s*=\s*("([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.I)
+_STYLE_ATTR = re.compile(r'(\bstyle\s*=\s*)("([^"]*)"|\'([^\']*)\')', re.I)
+_CLASS = re.compile(r'\bclass\s*=\s*("([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.I)
+_ID = re.compile(r'\bid\s*=\s*("([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.I)
+
+# CSS：字符串原样保留，注释删除
+_CSS_STRING_OR_COMMENT = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/', re.S)
+_CSS_SPACE_AROUND = re.compile(r'\s*([{};,>])\s*')
+_CSS_SPACE_AFTER_COLON = re.compile(r':\s+')
+_PLACEHOLDER = re.compile(r'\x00(\d+)\x00')
+_CSS_IMPORT = re.compile(r'@import\s*(?:url\(\s*)?["\']?([^"\')\s;]+)["\']?\s*\)?[^;]*;', re.I)
+_CSS_BLOCK = re.compile(r'\{([^{}]*)\}')
+_CSS_WIDTH = re.compile(r'(?:^|;)\s*width:\s*(\d+(?:\.\d+)?)px', re.I)
+_CSS_HEIGHT = re.compile(r'((?:^|;)\s*height:\s*)(\d+(?:\.\d+)?)px', re.I)
+
+# 两侧是这些块级标签时，标签之间的纯空白不影响渲染，可以删除
+_BLOCK_TAGS = frozenset((
+    'html', 'head', 'body', 'meta', 'link', 'title', 'style', 'script', 'base',
+    'div', 'section', 'article', 'header', 'footer', 'main', 'nav', 'aside',
+    'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li', 'dl', 'dt', 'dd',
+    'table', 'thead', 'tbody', 'tfoot', 'tr', 'td', 'th', 'figure', 'figcaption',
+    'blockquote', 'hr', 'br', 'svg', 'canvas', '!doctype',
+))
+
+# 画布的最小宽度，排除装饰性的小元素
+_MIN_CANVAS_WIDTH = 300
+CANVAS_RATIO = 4 / 3
+# 高宽比与 3:4 相差在此比例内的元素才视为画布（根容器除外），横幅、正方形背景等不会被拉伸
+_CANVAS_TOLERANCE = 0.15
+# 确定根容器时跳过的标签：根容器是 <body> 或其中第一个元素
+_NON_CONTAINER_TAGS = frozenset((
+    '!doctype', 'html', 'head', 'meta', 'link', 'title', 'style', 'script', 'base', 'noscript', 'body',
+))
+
+
+def _tag_name(tag: str) -> str:
+    if tag.startswith('<!'):
+        return '!doctype'
+    match = _TAG_NAME.match(tag)
+    return match.group(1).lower() if match else ''
+
+
+def _collapse_tag(tag: str) -> str:
+    """合并标签内（引号外）的连续空白"""
+    parts = _QUOTED.split(tag)
+    for i in range(0, len(parts), 2):
+        parts[i] = _WHITESPACE.sub(' ', parts[i])
+    tag = ''.join(parts)
+    return tag.replace(' >', '>').replace(' />', '/>')
+
+
+def _normalize_url(url: str) -> str:
+    return url.strip().rstrip('/').lower()
+
+
+def _attr_value(pattern: 're.Pattern[str]', tag: str) -> Optional[str]:
+    match = pattern.search(tag)
+    if match is None:
+        return None
+    return next(g for g in match.groups()[1:] if g is not None)
+
+
+def minify_css(css: str, seen_imports: Optional[Set[str]] = None) -> str:
+    """
+    压缩CSS：删除注释、合并空白、去掉分隔符两侧空白，并删除重复的 @import
+
+    Args:
+        css: CSS 文本
+        seen_imports: 已出现过的导入地址，跨多个 <style> 块去重时传入同一个集合
+    """
+    # 字符串先换成占位符，删除注释并压缩后再还原
+    strings: List[str] = []
+
+    def stash(match: 're.Match[str]') -> str:
+        if match.group(1) is None:
+            return ' '
+        strings.append(match.group(1))
+        return f"\x00{len(strings) - 1}\x00"
+
+    code = _CSS_STRING_OR_COMMENT.sub(stash, css)
+    code = _WHITESPACE.sub(' ', code)
+    code = _CSS_SPACE_AROUND.sub(r'\1', code)
+    code = _CSS_SPACE_AFTER_COLON.sub(':', code).strip().replace(';}', '}')
+    result = _PLACEHOLDER.sub(lambda m: strings[int(m.group(1))], code)
+
+    if seen_imports is None:
+        seen_imports = set()
+
+    def dedupe(match: 're.Match[str]') -> str:
+        url = _normalize_url(match.group(1))
+        if url in seen_imports:
+            return ''
+        seen_imports.add(url)
+        return match.group(0)
+
+    return _CSS_IMPORT.sub(dedupe, result)
+
+
+def _dimensions(declarations: str) -> Optional[Tuple[float, float]]:
+    width = _CSS_WIDTH.search(declarations)
+    height = _CSS_HEIGHT.search(declarations)
+    if width is None or height is None:
+        return None
+    return float(width.group(1)), float(height.group(2))
+
+
+def _root_selectors(tag: Optional[str]) -> Set[str]:
+    """根容器在 CSS 中可能使用的选择器"""
+    selectors = {'html', 'body'}
+    if tag is None:
+        return selectors
+    selectors.update(f".{name}" for name in (_attr_value(_CLASS, tag) or '').split())
+    element_id = _attr_value(_ID, tag)
+    if element_id:
+        selectors.add(f"#{element_id.strip()}")
+    return selectors
+
+
+def _near_canvas_ratio(width: float, height: float) -> bool:
+    return abs(height / width - CANVAS_RATIO) <= CANVAS_RATIO * _CANVAS_TOLERANCE
+
+
+def _fix_height(declarations: str, width: float) -> str:
+    height = round(width * CANVAS_RATIO)
+    return _CSS_HEIGHT.sub(lambda m: f"{m.group(1)}{height}px", declarations, count=1)
+
+
+def postprocess_html(html: str) -> str:
+    """
+    AI生成的HTML在写入缓存前的一次性后处理
+
+    - 删除注释（保留 IE 条件注释），合并文本与标签内的空白，删除块级标签之间的缩进；
+      <script>、<pre>、<textarea> 内容保持原样
+    - 压缩 <style> 中的 CSS
+    - 删除重复的 <link>（rel 与 href 都相同）以及重复的 CSS @import（常见于重复引入的字体）；
+      先 preload 再以 stylesheet 引入同一地址时两者都保留
+    - 画布比例归一为 3:4：在 CSS 规则和内联样式中找出同时声明了像素宽高的元素，
+      已有元素是 3:4 时不做修改，否则按宽度修正其中最宽的画布的高度；
+      画布指根容器（<body> 或其中第一个元素）以及高宽比已接近 3:4 的元素
+    """
+    if '<' not in html:
+        return html
+
+    # 删除注释（保留条件注释），注释两侧的文本合并为一个节点，之后按普通空白处理
+    tokens: List[str] = []
+    for match in _TOKEN.finditer(html):
+        token = match.group(0)
+        if token.startswith('<!--') and not token.startswith('<!--[if'):
+            continue
+        if not token.startswith('<') and tokens and not tokens[-1].startswith('<'):
+            tokens[-1] += token
+            continue
+        tokens.append(token)
+    names = [_tag_name(t) if t.startswith('<') and not t.startswith('<!--') else None for t in tokens]
+    output: List[str] = []
+    seen_links: Set[Tuple[str, str]] = set()
+    seen_imports: Set[str] = set()
+    # (宽度, 高度, 输出位置, 起止偏移, 选择器)：候选画布，内联样式的选择器为 None
+    canvases: List[Tuple[float, float, int, int, int, Optional[str]]] = []
+    # 根容器的开始标签及其输出位置
+    root_tag: Optional[str] = None
+    root_indexes: Set[int] = set()
+
+    for i, token in enumerate(tokens):
+        if token.startswith('<!--'):
+            output.append(token)
+            continue
+
+        name = names[i]
+        if name is None:
+            # 文本节点
+            if token.strip():
+                output.append(_WHITESPACE.sub(' ', token))
+                continue
+            # 纯空白节点：相邻的是块级标签、条件注释或位于文档首尾时删除，否则保留一个空格
+            prev_name = names[i - 1] if i > 0 else None
+            next_name = names[i + 1] if i + 1 < len(names) else None
+            if prev_name is None or next_name is None or prev_name in _BLOCK_TAGS or next_name in _BLOCK_TAGS:
+                continue
+            output.append(' ')
+            continue
+
+        if name in ('style', 'script', 'pre', 'textarea') and not token.startswith('</'):
+            open_end = token.index('>') + 1
+            close_start = token.lower().rindex('</')
+            open_tag = _collapse_tag(token[:open_end])
+            inner = token[open_end:close_start]
+            close_tag = _collapse_tag(token[close_start:])
+            if name == 'style':
+                inner = minify_css(inner, seen_imports)
+                offset = len(open_tag)
+                for block in _CSS_BLOCK.finditer(inner):
+                    dims = _dimensions(block.group(1))
+                    if dims is not None:
+                        head = inner[:block.start()]
+                        selector = head[max(head.rfind('}'), head.rfind('{')) + 1:]
+                        canvases.append((*dims, len(output), offset + block.start(1), offset + block.end(1), selector))
+                if not inner:
+                    # 去重后为空的样式块整体删除
+                    continue
+            elif name == 'script':
+                inner = inner.strip()
+            output.append(open_tag + inner + close_tag)
+            continue
+
+        tag = _collapse_tag(token)
+        if not token.startswith('</'):
+            if name == 'body':
+                root_indexes.add(len(output))
+            elif root_tag is None and name not in _NON_CONTAINER_TAGS:
+                root_tag = tag
+                root_indexes.add(len(output))
+        if name == 'link':
+            href = _attr_value(_HREF, tag)
+            if href is not None:
+                url = _normalize_url(href)
+                rel = ' '.join((_attr_value(_REL, tag) or '').lower().split())
+                if (rel, url) in seen_links:
+                    continue
+                # 样式表与 CSS @import 引入同一地址时效果相同，只保留先出现的一个
+                if rel == 'stylesheet':
+                    if url in seen_imports:
+                        continue
+                    seen_imports.add(url)
+                seen_links.add((rel, url))
+        style = _STYLE_ATTR.search(tag)
+        if style is not None:
+            value_group = 3 if style.group(3) is not None else 4
+            dims = _dimensions(style.group(value_group))
+            if dims is not None:
+                canvases.append((*dims, len(output), style.start(value_group), style.end(value_group), None))
+        output.append(tag)
+
+    canvases = [c for c in canvases if c[0] >= _MIN_CANVAS_WIDTH]
+    # 已有 3:4 的元素说明画布本身正确，其余元素（如正方形背景）不应被改动
+    if any(abs(height - width * CANVAS_RATIO) <= 1 for width, height, *_ in canvases):
+        canvases = []
+    root_selectors = _root_selectors(root_tag)
+
+    def is_canvas(candidate: Tuple[float, float, int, int, int, Optional[str]]) -> bool:
+        width, height, index, _, _, selector = candidate
+        if selector is None:
+            is_root = index in root_indexes
+        else:
+            is_root = any(part.strip() in root_selectors for part in selector.split(','))
+        return is_root or _near_canvas_ratio(width, height)
+
+    canvases = [c for c in canvases if is_canvas(c)]
+    if canvases:
+        width, _, index, start, end, _ = max(canvases, key=lambda c: c[0])
+        part = output[index]
+        output[index] = part[:start] + _fix_height(part[start:end], width) + part[end:]
+
+    return ''.join(output).strip()
@@ -0,0 +1,327 @@
+import asyncio
+import atexit
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, Optional, Union
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 没有 fcntl：文件锁退化为进程内的线程锁
+    fcntl = None
+
+
+def atomic_write(path: Union[str, Path], data: Union[str, bytes]) -> None:
+    """
+    原子写入文件：先写同目录下的临时文件，再 os.replace 替换
+
+    其他进程（uvicorn 多 worker）读取时要么看到旧文件，要么看到完整的新文件，
+    不会读到写了一半的内容。临时文件以 .tmp 结尾，不会被 *.json 等通配匹配到。
+    """
+    path = Path(path)
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class FileLock:
+    def __init__(self, path: Union[str, Path]):
+        """
+        初始化跨进程互斥锁（fcntl.flock 建议锁），同时串行化本进程内的线程
+
+        不可重入：持有期间不要再次获取同一把锁。
+
+        Args:
+            path: 锁文件路径，不存在时创建
+        """
+        self.path = Path(path)
+        self._thread_lock = threading.Lock()
+        self._fd: Optional[int] = None
+        if fcntl is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+
+    def __enter__(self) -> 'FileLock':
+        self._thread_lock.acquire()
+        if self._fd is not None:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            except BaseException:
+                self._thread_lock.release()
+                raise
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+
+class GenerationLocks:
+    def __init__(self, lock_dir: Union[str, Path], timeout: float = 120.0, max_waiters: int = 64):
+        """
+        初始化跨 worker 的生成锁
+
+        进程内的相同请求已由 SingleFlight 合并；多个 worker 之间则按缓存键
+        对各自的锁文件加 flock，拿到锁的 worker 调用AI，其余 worker
+        等待后直接读取它写入的缓存。每个键一个锁文件，不同键之间互不等待；
+        锁文件在释放前删除，不会随键数量累积。
+        等待者在专用线程中阻塞于 flock，持有者释放后立即被内核唤醒，不占用事件循环。
+
+        Args:
+            lock_dir: 锁文件目录
+            timeout: 最长等待时间（秒），超时后不再等待、自行生成
+            max_waiters: 同时阻塞等待的线程数上限，超出的等待者排队，仍受 timeout 约束
+        """
+        self.lock_dir = Path(lock_dir)
+        self.timeout = timeout
+        self.max_waiters = max_waiters
+        self.waits = 0
+        self.timeouts = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        if fcntl is not None:
+            self.lock_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.lock_dir / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.lock"
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_waiters, thread_name_prefix='generation-lock')
+            return self._executor
+
+    @staticmethod
+    def _lock(path: Path, blocking: bool) -> Optional[int]:
+        """
+        锁定锁文件，成功时返回文件描述符；非阻塞模式下锁被占用时返回 None
+
+        持有者会在释放前删除锁文件，因此加锁成功后还要确认锁住的仍是路径上的文件，
+        否则锁住的是已被删除的旧文件，需要重新打开。
+        """
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        while True:
+            fd = os.open(str(path), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, flags)
+            except BlockingIOError:
+                os.close(fd)
+                return None
+            except BaseException:
+                os.close(fd)
+                raise
+            try:
+                current = os.stat(str(path))
+            except FileNotFoundError:
+                current = None
+            if current is not None and current.st_ino == os.fstat(fd).st_ino:
+                return fd
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    @staticmethod
+    def _release(path: Path, fd: int) -> None:
+        # 先删除再解锁：等待者拿到锁后会发现文件已被替换并重新打开
+        try:
+            os.unlink(str(path))
+        except FileNotFoundError:
+            pass
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    async def _wait(self, path: Path) -> Optional[int]:
+        """
+        在线程中阻塞等待锁，超时返回 None
+
+        超时或被取消后线程仍阻塞在 flock 上，之后拿到的锁由线程自行释放，
+        不会留给已经放弃等待的调用方。
+        """
+        state = threading.Lock()
+        abandoned = False
+        delivered = False
+
+        def acquire() -> Optional[int]:
+            nonlocal delivered
+            fd = self._lock(path, blocking=True)
+            with state:
+                if not abandoned:
+                    delivered = True
+                    return fd
+            self._release(path, fd)
+            return None
+
+        future = self._get_executor().submit(acquire)
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+        except BaseException:
+            with state:
+                abandoned = True
+                taken = delivered
+            if taken:
+                # 线程恰好在放弃前拿到了锁：调用方不再使用，由这里释放
+                self._release(path, future.result())
+            raise
+
+    @asynccontextmanager
+    async def hold(self, key: str) -> AsyncIterator[bool]:
+        """
+        持有键对应的生成锁
+
+        Yields:
+            是否等待过其他 worker（等待过时调用方应先检查缓存是否已被写入）
+        """
+        if fcntl is None:
+            yield False
+            return
+        path = self._path(key)
+        waited = False
+        fd = self._lock(path, blocking=False)
+        if fd is None:
+            waited = True
+            self.waits += 1
+            try:
+                fd = await self._wait(path)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+        try:
+            yield waited
+        finally:
+            if fd is not None:
+                self._release(path, fd)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            'waits': self.waits,
+            'timeouts': self.timeouts,
+        }
+
+
+_SLOT = struct.Struct('<q')
+
+
+class SharedCounters:
+    def __init__(self, directory: Union[str, Path], fields: Iterable[str], flush_interval: float = 1.0):
+        """
+        初始化多 worker 共享的计数器
+
+        计数保存在 directory 下的内存映射文件中，同一台机器上的全部 worker
+        映射同一个文件，统计接口看到的是全部 worker 的合计。
+        增加计数只累加到本进程的待写入计数，最多每 flush_interval 秒在 flock 保护下合并一次，
+        热路径上的每次查找不再各自加锁；其他 worker 看到的计数因此最多滞后 flush_interval。
+        文件名包含字段列表的摘要，字段变化后换用新文件，不会错位读取旧计数。
+        计数跨重启累积；映射失败时退化为进程内计数。
+
+        Args:
+            directory: 计数文件所在目录
+            fields: 计数器名称
+            flush_interval: 合并到共享文件的最长间隔（秒）
+        """
+        self.fields = tuple(fields)
+        self.flush_interval = flush_interval
+        self._index = {name: i for i, name in enumerate(self.fields)}
+        self._thread_lock = threading.Lock()
+        self._local = [0] * len(self.fields)
+        self._pending = [0] * len(self.fields)
+        self._last_flush = time.monotonic()
+        self._mmap: Optional[mmap.mmap] = None
+        self._fd: Optional[int] = None
+        digest = hashlib.sha1('\n'.join(self.fields).encode('utf-8')).hexdigest()[:8]
+        self.path = Path(directory) / f"counters-{digest}.bin"
+        size = _SLOT.size * len(self.fields)
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                self._flock(fd, True)
+                try:
+                    if os.fstat(fd).st_size < size:
+                        os.ftruncate(fd, size)
+                finally:
+                    self._flock(fd, False)
+                self._mmap = mmap.mmap(fd, size)
+                self._fd = fd
+            except (OSError, ValueError):
+                os.close(fd)
+                raise
+        except (OSError, ValueError) as e:
+            print(f"共享计数初始化失败，改用进程内计数: {e}")
+        if self._mmap is not None:
+            # 进程正常退出时写入尚未合并的计数
+            atexit.register(self.flush)
+
+    @staticmethod
+    def _flock(fd: int, exclusive: bool) -> None:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_UN)
+
+    def add(self, name: str, amount: int = 1, flush: bool = False) -> None:
+        """
+        增加计数
+
+        Args:
+            flush: 是否立即合并到共享文件；用作跨 worker 通知的计数（如缓存失效的代数）需要立即可见
+        """
+        index = self._index[name]
+        with self._thread_lock:
+            if self._mmap is None:
+                self._local[index] += amount
+                return
+            self._pending[index] += amount
+            if not flush and time.monotonic() - self._last_flush < self.flush_interval:
+                return
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        """把待写入计数合并到共享文件，调用方需持有 self._thread_lock"""
+        self._last_flush = time.monotonic()
+        if not any(self._pending):
+            return
+        self._flock(self._fd, True)
+        try:
+            for index, amount in enumerate(self._pending):
+                if amount:
+                    offset = index * _SLOT.size
+                    _SLOT.pack_into(self._mmap, offset, _SLOT.unpack_from(self._mmap, offset)[0] + amount)
+        finally:
+            self._flock(self._fd, False)
+        self._pending = [0] * len(self.fields)
+
+    def flush(self) -> None:
+        """立即合并本进程的待写入计数"""
+        with self._thread_lock:
+            if self._mmap is not None:
+                self._flush_locked()
+
+    def get(self, name: str) -> int:
+        """读取计数：全部 worker 已合并的计数加上本进程尚未合并的部分"""
+        index = self._index[name]
+        if self._mmap is None:
+            return self._local[index]
+        return _SLOT.unpack_from(self._mmap, index * _SLOT.size)[0] + self._pending[index]
+
+    def snapshot(self) -> Dict[str, int]:
+        """读取全部计数"""
+        return {name: self.get(name) for name in self.fields}
+
+    @property
+    def shared(self) -> bool:
+        return self._mmap is not None
@@ -0,0 +1,321 @@
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+
+class JobQueue:
+    def __init__(self, db_path: str = "cache/jobs.db", workers: int = 4,
+                 poll_interval: float = 1.0, retention: int = 3600 * 24, lease: float = 60.0):
+        """
+        初始化持久化任务队列
+
+        任务保存在 SQLite 中，本进程内的工作协程负责消费队列。
+        领取任务的进程记为任务的所有者，并定期刷新心跳；多个 worker 共用同一个数据库时，
+        只有心跳超过 lease 未刷新（所有者已退出或崩溃）的任务才会重新排队。
+
+        Args:
+            db_path: 队列数据库路径
+            workers: 工作协程数量
+            poll_interval: 空闲时轮询数据库的间隔（秒），用于发现其他进程提交的任务
+            retention: 已完成任务的保留时间（秒）
+            lease: 执行中任务的租约（秒），心跳超过该时间未刷新的任务视为所有者已失效
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.lease = lease
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            ' id TEXT PRIMARY KEY,'
+            ' status TEXT NOT NULL,'
+            ' title TEXT NOT NULL,'
+            ' author TEXT,'
+            ' style_id TEXT NOT NULL,'
+            ' html TEXT,'
+            ' error TEXT,'
+            ' created_at REAL NOT NULL,'
+            ' started_at REAL,'
+            ' finished_at REAL,'
+            ' owner TEXT,'
+            ' heartbeat_at REAL,'
+            ' prewarm INTEGER NOT NULL DEFAULT 0)'
+        )
+        # 旧版本创建的表没有租约与预热字段
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(jobs)')}
+        for column, kind in (('owner', 'TEXT'), ('heartbeat_at', 'REAL'), ('prewarm', 'INTEGER NOT NULL DEFAULT 0')):
+            if column not in columns:
+                self._conn.execute(f'ALTER TABLE jobs ADD COLUMN {column} {kind}')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)')
+        self._tasks: List[asyncio.Task] = []
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waiters: Dict[str, asyncio.Event] = {}
+        self.completed = 0
+        self.failed = 0
+        self._wait_total = 0.0
+        self._wait_count = 0
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def submit(self, title: str, author: str, style_id: str, prewarm: bool = False) -> str:
+        """
+        提交生成任务；可在线程池中调用（同步接口），唤醒工作协程时切回事件循环线程
+
+        Args:
+            prewarm: 是否为预热任务；预热任务查缓存时不计入命中统计与访问热度
+
+        Returns:
+            任务ID
+        """
+        job_id = uuid.uuid4().hex
+        self._execute(
+            'INSERT INTO jobs (id, status, title, author, style_id, created_at, prewarm) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (job_id, 'queued', title, author or '', style_id, time.time(), int(prewarm))
+        )
+        if self._wakeup is not None:
+            # asyncio.Event 不是线程安全的，不能在线程池中直接 set
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务状态，不存在则返回None"""
+        row = self._execute(
+            'SELECT id, status, title, author, style_id, html, error, created_at, started_at, finished_at '
+            'FROM jobs WHERE id = ?', (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job = {
+            'job_id': row[0],
+            'status': row[1],
+            'title': row[2],
+            'author': row[3],
+            'style_id': row[4],
+            'created_at': row[7],
+            'started_at': row[8],
+            'finished_at': row[9],
+        }
+        if row[1] == 'done':
+            job['html'] = row[5]
+        elif row[1] == 'failed':
+            job['error'] = row[6]
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        长轮询：等待任务结束或超时后返回当前状态
+
+        Args:
+            job_id: 任务ID
+            timeout: 最长等待时间（秒）
+        """
+        job = self.get(job_id)
+        if job is None or job['status'] in ('done', 'failed') or timeout <= 0:
+            return job
+        event = self._waiters.setdefault(job_id, asyncio.Event())
+        try:
+            # 任务可能由其他进程完成，按轮询间隔分段等待并回查数据库
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(event.wait(), min(remaining, self.poll_interval))
+                    break
+                except asyncio.TimeoutError:
+                    job = self.get(job_id)
+                    if job is None or job['status'] in ('done', 'failed'):
+                        return job
+        finally:
+            # 同一任务的其他等待者即使失去事件，也会按轮询间隔回查数据库
+            self._waiters.pop(job_id, None)
+        return self.get(job_id)
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """领取最早排队的任务；通过条件更新保证多个进程不会领取同一任务"""
+        while True:
+            row = self._execute(
+                "SELECT id, title, author, style_id, created_at, prewarm FROM jobs "
+                "WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            cursor = self._execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, owner = ?, heartbeat_at = ? "
+                "WHERE id = ? AND status = 'queued'",
+                (now, self.owner, now, row[0])
+            )
+            if cursor.rowcount == 1:
+                self._wait_total += now - row[4]
+                self._wait_count += 1
+                return {'id': row[0], 'title': row[1], 'author': row[2], 'style_id': row[3], 'prewarm': bool(row[5])}
+
+    def _finish(self, job_id: str, html: Optional[str], error: Optional[str]) -> None:
+        status = 'done' if error is None else 'failed'
+        self._execute(
+            'UPDATE jobs SET status = ?, html = ?, error = ?, finished_at = ? WHERE id = ?',
+            (status, html, error, time.time(), job_id)
+        )
+        if error is None:
+            self.completed += 1
+        else:
+            self.failed += 1
+        event = self._waiters.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        from .deepseek_service import generate_cover_html
+        from .template_registry import template_registry
+
+        template = template_registry.get(job['style_id'])
+        if template is None:
+            self._finish(job['id'], None, '未找到该风格')
+            return
+        try:
+            html = await generate_cover_html(job['title'], job['author'], template, record=not job['prewarm'])
+        except Exception as e:
+            self._finish(job['id'], None, f'AI生成失败: {e}')
+            return
+        self._finish(job['id'], html, None)
+
+    async def _worker(self) -> None:
+        # 取消与唤醒同时发生时 wait_for 可能吞掉取消，因此同时检查停止标志
+        while not self._stopping:
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                # 多个 worker 争用数据库时可能暂时被锁（database is locked），退避后继续，不能让工作协程退出
+                print(f"领取任务失败: {e}")
+                await asyncio.sleep(self.poll_interval * random.uniform(1, 2))
+                continue
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._run(job)
+            except sqlite3.Error as e:
+                # 结果写入失败：任务仍为本进程执行中，停止时或租约过期后重新排队
+                print(f"任务结果写入失败: {job['id']}: {e}")
+
+    def requeue_expired(self) -> int:
+        """租约过期（所有者已失效）的执行中任务重新排队，返回数量"""
+        cursor = self._execute(
+            "UPDATE jobs SET status = 'queued', started_at = NULL, owner = NULL, heartbeat_at = NULL "
+            "WHERE status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+            (time.time() - self.lease,)
+        )
+        return cursor.rowcount
+
+    async def _heartbeat(self) -> None:
+        """刷新本进程执行中任务的心跳，并回收其他进程遗留的过期任务"""
+        while not self._stopping:
+            try:
+                self._execute(
+                    "UPDATE jobs SET heartbeat_at = ? WHERE status = 'running' AND owner = ?",
+                    (time.time(), self.owner)
+                )
+                if self.requeue_expired() and self._wakeup is not None:
+                    self._wakeup.set()
+            except sqlite3.Error as e:
+                print(f"任务心跳失败: {e}")
+            await asyncio.sleep(self.lease / 3)
+
+    def purge_finished(self) -> int:
+        """删除超过保留时间的已完成任务"""
+        cursor = self._execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+            (time.time() - self.retention,)
+        )
+        return cursor.rowcount
+
+    async def start(self) -> None:
+        """启动工作协程；所有者已失效的执行中任务重新排队，其他 worker 正在执行的任务不受影响"""
+        self._stopping = False
+        self.requeue_expired()
+        self.purge_finished()
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        self._heartbeat_task = asyncio.ensure_future(self._heartbeat())
+
+    async def stop(self) -> None:
+        """停止工作协程，本进程未完成的任务立即重新排队，由其他 worker 或下次启动时执行"""
+        self._stopping = True
+        tasks = self._tasks + ([self._heartbeat_task] if self._heartbeat_task is not None else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._heartbeat_task = None
+        self._execute(
+            "UPDATE jobs SET status = 'queued', started_at = NULL, owner = NULL, heartbeat_at = NULL "
+            "WHERE status = 'running' AND owner = ?", (self.owner,)
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取队列深度与等待时间等指标"""
+        counts = dict(self._execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+        oldest = self._execute(
+            "SELECT MIN(created_at) FROM jobs WHERE status = 'queued'"
+        ).fetchone()[0]
+        return {
+            'depth': counts.get('queued', 0),
+            'running': counts.get('running', 0),
+            'done': counts.get('done', 0),
+            'failed': counts.get('failed', 0),
+            'oldest_wait_seconds': round(time.time() - oldest, 3) if oldest else 0,
+            'avg_wait_seconds': round(self._wait_total / self._wait_count, 3) if self._wait_count else 0,
+            'completed_since_start': self.completed,
+            'failed_since_start': self.failed,
+            'workers': len(self._tasks),
+        }
+
+
+_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """获取进程内共享的任务队列（首次调用时创建数据库）"""
+    global _queue
+    if _queue is None:
+        _queue = JobQueue(
+            # 默认与缓存放在同一目录（CACHE_DIR），不随启动时的工作目录散落
+            db_path=os.environ.get('JOB_QUEUE_DB') or os.path.join(os.environ.get('CACHE_DIR', 'cache'), 'jobs.db'),
+            workers=int(os.environ.get('JOB_WORKERS', '4')),
+            lease=float(os.environ.get('JOB_LEASE', '60'))
+        )
+    return _queue
+
+
+async def startup_job_queue() -> None:
+    """应用启动时创建任务队列并启动工作协程；导入本模块不会创建数据库"""
+    await get_job_queue().start()
+
+
+async def shutdown_job_queue() -> None:
+    """应用关闭时停止工作协程，未完成的任务重新排队"""
+    if _queue is not None:
+        await _queue.stop()
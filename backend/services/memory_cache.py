@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from .metrics import cache_evictions
+
+
+class MemoryCache:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        """
+        初始化进程内 LRU 缓存
+
+        Args:
+            max_bytes: 缓存内容占用的字节上限，超出后淘汰最久未使用的条目
+        """
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[float, str, int, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def get(self, key: str, max_age: Optional[float] = None,
+            record: bool = True) -> Optional[Tuple[float, str, str]]:
+        """
+        获取缓存条目
+
+        Args:
+            key: 缓存键
+            max_age: 条目的最长存活时间（秒），超过时删除该条目并按未命中计
+            record: 是否计入命中/未命中次数
+
+        Returns:
+            (写入时间戳, HTML内容, 来源标记)，不存在或已过期则返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and max_age is not None and time.time() - entry[0] > max_age:
+                del self._entries[key]
+                self.current_bytes -= entry[2]
+                self.expired += 1
+                cache_evictions.inc('memory')
+                entry = None
+            if entry is None:
+                if record:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if record:
+                self.hits += 1
+            return entry[0], entry[1], entry[3]
+
+    def set(self, key: str, timestamp: float, html: str, origin: str = '') -> None:
+        """写入缓存条目，必要时淘汰旧条目；origin 为调用方自定义的来源标记"""
+        size = len(html.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[2]
+            self._entries[key] = (timestamp, html, size, origin)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted[2]
+                self.evictions += 1
+                cache_evictions.inc('memory')
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[2]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取内存缓存统计信息"""
+        return {
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expired': self.expired,
+        }
@@ -0,0 +1,218 @@
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+
+
+# 默认的延迟分桶（秒），覆盖从缓存命中到完整AI生成的范围
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """
+    单调递增计数器
+
+    写入不加锁：请求处理都在事件循环线程内完成，少量在线程池中的并发写入
+    最多丢失个别增量，对监控用途可以接受。
+    """
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+            for labels, value in list(self._values.items())
+        ]
+
+
+class Gauge(Counter):
+    """可增可减的瞬时值"""
+    kind = 'gauge'
+
+    def set(self, *labels: str, value: float) -> None:
+        self._values[labels] = value
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class CallbackMetric(_Metric):
+    """抓取时才调用回调读取现有统计值，请求路径上没有任何开销"""
+
+    def __init__(self, name: str, documentation: str, kind: str,
+                 callback: Callable[[], Dict[Labels, float]], labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.callback = callback
+
+    def samples(self) -> List[str]:
+        return [
+            f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+            for labels, value in self.callback().items()
+        ]
+
+
+class Histogram(_Metric):
+    """
+    固定分桶直方图
+
+    每个标签组合对应一个预分配的列表：各桶（非累计）计数、+Inf 计数和总和，
+    observe 只做一次二分查找和两次加法，累计值在抓取时计算。
+    """
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        bucket_names = self.labelnames + ('le',)
+        for labels, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{_format_labels(bucket_names, labels + (_format_value(bound),))} {int(cumulative)}'
+                )
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_value(series[-1])}')
+            lines.append(f'{self.name}_count{label_text} {int(cumulative)}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, kind: str,
+                 callback: Callable[[], Dict[Labels, float]], labelnames: Tuple[str, ...] = ()) -> None:
+        """注册在抓取时读取的指标，kind 为 'counter' 或 'gauge'"""
+        self.register(CallbackMetric(name, documentation, kind, callback, labelnames))
+
+    def render(self) -> str:
+        """以 Prometheus 文本格式导出全部指标"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                print(f"指标采集失败 {metric.name}: {e}")
+                continue
+            lines.extend(metric.header())
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+# 全局指标注册表
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    'http_requests_total', 'HTTP requests by route and status', ('method', 'route', 'status'))
+http_latency = registry.histogram(
+    'http_request_duration_seconds', 'HTTP request latency including streamed bodies', ('method', 'route'))
+
+cache_lookups = registry.counter(
+    'cache_lookups_total', 'Cache lookups by tier and result (hit, stale, miss)', ('tier', 'result'))
+cache_evictions = registry.counter(
+    'cache_evictions_total', 'Cache entries removed by expiry or capacity', ('tier',))
+
+deepseek_latency = registry.histogram(
+    'deepseek_request_duration_seconds', 'Latency of each DeepSeek attempt', ('mode',))
+deepseek_responses = registry.counter(
+    'deepseek_responses_total', 'DeepSeek attempts by HTTP status or error kind', ('mode', 'status'))
+deepseek_retries = registry.counter(
+    'deepseek_retries_total', 'DeepSeek attempts that were retried', ('mode',))
+deepseek_tokens = registry.counter(
+    'deepseek_tokens_total', 'Tokens reported by DeepSeek by style and type', ('style_id', 'type'))
+
+
+class MetricsMiddleware:
+    """
+    ASGI 中间件：按路由模板（而非原始路径）统计请求数与延迟，避免标签基数随参数增长
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # 路由匹配后框架会把路由对象写回同一个 scope
+            route = getattr(scope.get('route'), 'path', 'unmatched')
+            method = scope['method']
+            http_requests.inc(method, route, str(status))
+            http_latency.observe(time.perf_counter() - start, method, route)
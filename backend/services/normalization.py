@@ -0,0 +1,52 @@
+import re
+import unicodedata
+
+
+# NFKC 不会处理的中文标点，折叠为对应的 ASCII 形式
+_PUNCT_TABLE = str.maketrans({
+    '。': '.', '、': ',', '；': ';', '：': ':',
+    '“': '"', '”': '"', '„': '"', '‟': '"', '«': '"', '»': '"',
+    '‘': "'", '’': "'", '‚': "'", '‛': "'",
+    '「': '"', '」': '"', '『': '"', '』': '"',
+    '《': '<', '》': '>', '〈': '<', '〉': '>',
+    '【': '[', '】': ']', '〔': '[', '〕': ']', '〖': '[', '〗': ']',
+    '～': '~', '〜': '~', '—': '-', '–': '-', '―': '-', '‐': '-', '－': '-',
+    '…': '...', '・': '·',
+})
+
+_WHITESPACE = re.compile(r'\s+')
+# 连续重复的同一标点（如 "!!!"、"......"）折叠为一个
+_REPEATED_PUNCT = re.compile(r'([!?.,;:~\-·])\1+')
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum()
+
+
+def normalize_text(text: str, casefold: bool = False) -> str:
+    """
+    规范化标题或作者，用于生成缓存键
+
+    依次做 Unicode NFKC（全角转半角、兼容字符统一）、中文标点折叠、
+    重复标点合并，并去掉首尾空白；中间的空白只在两侧都是 ASCII 字母数字时保留一个，
+    因此 "5 个省钱技巧" 与 "5个省钱技巧" 得到相同结果，而 "hello world" 不会被粘连。
+
+    封面会原样渲染标题文字，大小写不同的标题不能共用缓存，因此缓存键默认保留大小写；
+    casefold=True 时额外做大小写折叠，只用于近似标题匹配的特征。
+    """
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKC', text)
+    if casefold:
+        text = text.casefold()
+    text = text.translate(_PUNCT_TABLE)
+    text = _REPEATED_PUNCT.sub(r'\1', text)
+    parts = _WHITESPACE.split(text.strip())
+    if len(parts) == 1:
+        return parts[0]
+    result = [parts[0]]
+    for part in parts[1:]:
+        if _is_word_char(result[-1][-1]) and _is_word_char(part[0]):
+            result.append(' ')
+        result.append(part)
+    return ''.join(result)
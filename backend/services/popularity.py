@@ -0,0 +1,120 @@
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List
+
+from .interprocess import atomic_write
+
+
+class PopularityTracker:
+    def __init__(self, path: Path, max_keys: int = 20000, decay_interval: float = 3600.0):
+        """
+        初始化按缓存键统计的访问热度
+
+        计数按 decay_interval 周期减半，使热度反映近期访问；
+        跟踪的键超过 max_keys 时丢弃热度较低的一半。
+
+        Args:
+            path: 热点列表的持久化文件
+            max_keys: 最多跟踪的键数量
+            decay_interval: 热度减半的周期（秒）
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_keys = max_keys
+        self.decay_interval = decay_interval
+        self._lock = threading.Lock()
+        # 缓存键 -> {'count', 'title', 'author', 'style_id', 'last_access'}
+        self._keys: Dict[str, Dict[str, Any]] = {}
+        self._last_decay = time.time()
+
+    def record(self, cache_key: str, title: str, author: str, style_id: str) -> None:
+        """记录一次访问"""
+        now = time.time()
+        with self._lock:
+            entry = self._keys.get(cache_key)
+            if entry is None:
+                entry = self._keys[cache_key] = {
+                    'count': 0.0, 'title': title, 'author': author or '', 'style_id': style_id,
+                }
+            entry['count'] += 1
+            entry['last_access'] = now
+            if now - self._last_decay >= self.decay_interval:
+                self._decay_locked(now)
+            if len(self._keys) > self.max_keys:
+                self._trim_locked()
+
+    def _decay_locked(self, now: float) -> None:
+        periods = int((now - self._last_decay) // self.decay_interval)
+        factor = 0.5 ** periods
+        for key in list(self._keys):
+            entry = self._keys[key]
+            entry['count'] *= factor
+            if entry['count'] < 0.5:
+                del self._keys[key]
+        self._last_decay += periods * self.decay_interval
+
+    def _trim_locked(self) -> None:
+        ranked = sorted(self._keys, key=lambda k: self._keys[k]['count'], reverse=True)
+        for key in ranked[self.max_keys // 2:]:
+            del self._keys[key]
+
+    def top(self, n: int, min_count: float = 1.0) -> List[Dict[str, Any]]:
+        """按热度从高到低返回前 n 个键"""
+        with self._lock:
+            ranked = sorted(self._keys.items(), key=lambda item: item[1]['count'], reverse=True)
+        return [
+            {'cache_key': key, **entry}
+            for key, entry in ranked[:n]
+            if entry['count'] >= min_count
+        ]
+
+    def count(self, cache_key: str) -> float:
+        """某个键当前的热度，未跟踪时为0"""
+        with self._lock:
+            entry = self._keys.get(cache_key)
+            return entry['count'] if entry is not None else 0.0
+
+    def forget(self, cache_key: str) -> None:
+        with self._lock:
+            self._keys.pop(cache_key, None)
+
+    def save(self, n: int = 1000) -> None:
+        """将热点列表写入文件（原子替换，多个 worker 同时保存时不会互相破坏）"""
+        data = {'saved_at': time.time(), 'keys': self.top(n)}
+        atomic_write(self.path, json.dumps(data, ensure_ascii=False))
+
+    def load(self) -> int:
+        """
+        从文件恢复热点列表，按保存至今经过的时间衰减
+
+        Returns:
+            恢复的键数量
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return 0
+        elapsed = max(0.0, time.time() - data.get('saved_at', 0))
+        factor = 0.5 ** int(elapsed // self.decay_interval)
+        with self._lock:
+            for item in data.get('keys', []):
+                count = item.get('count', 0) * factor
+                if count < 0.5 or item['cache_key'] in self._keys:
+                    continue
+                self._keys[item['cache_key']] = {
+                    'count': count,
+                    'title': item.get('title', ''),
+                    'author': item.get('author', ''),
+                    'style_id': item.get('style_id', ''),
+                    'last_access': item.get('last_access', 0),
+                }
+        return len(self._keys)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'tracked_keys': len(self._keys),
+            'hot_list': str(self.path),
+        }
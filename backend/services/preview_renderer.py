@@ -0,0 +1,117 @@
+import hashlib
+import html
+import re
+from dataclasses import dataclass
+from typing import Dict, Any, Tuple
+
+
+# 预览页骨架；{{name}} 为插槽，渲染时填入转义后的值
+PREVIEW_SKELETON = """<!doctype html>
+<html lang='zh-CN'>
+<head>
+  <meta charset='utf-8'>
+  <meta name='viewport' content='width=device-width, initial-scale=1'>
+  <title>{{style_name}} - 预览</title>
+  <style>
+    body { margin:0; background:#f5f5f5; font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial; }
+    .card { width: 720px; height: 960px; margin: 24px auto; background:#fff; display:flex; flex-direction:column; justify-content:center; align-items:center; border-radius: 8px; box-shadow:0 8px 24px rgba(0,0,0,.08); }
+    h1 { font-size: 48px; margin: 0 24px 12px; text-align:center; }
+    p { color:#666; margin: 0 24px; }
+  </style>
+  </head>
+  <body>
+    <div class='card'>
+      <h1>{{title}}</h1>
+      <p>{{author}}</p>
+      <p style='margin-top:24px;color:#999;'>风格：{{style_name}}</p>
+    </div>
+  </body>
+</html>"""
+
+NOT_FOUND_HTML = '<!doctype html><html><body>未找到该风格</body></html>'
+
+# 骨架内容变化时 ETag 随之变化
+SKELETON_VERSION = hashlib.sha256(PREVIEW_SKELETON.encode('utf-8')).hexdigest()[:12]
+
+_SLOT_PATTERN = re.compile(r'\{\{(\w+)\}\}')
+
+
+@dataclass(frozen=True)
+class PreviewPlan:
+    """
+    预编译的预览页：literals 与 slots 交替排列，
+    len(literals) == len(slots) + 1；模板相关的插槽在编译时已填好
+    """
+    literals: Tuple[str, ...]
+    slots: Tuple[str, ...]
+
+    def render(self, title: str, author: str) -> str:
+        values = {
+            'title': html.escape(title),
+            'author': html.escape(author or ''),
+        }
+        parts = [self.literals[0]]
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            parts.append(values[slot])
+            parts.append(literal)
+        return ''.join(parts)
+
+
+def compile_preview_plan(template: Dict[str, Any]) -> PreviewPlan:
+    """将骨架切分为字面量与插槽，并把风格名等模板字段直接合并进字面量"""
+    fixed = {'style_name': html.escape(template.get('name', ''))}
+    pieces = _SLOT_PATTERN.split(PREVIEW_SKELETON)
+    literals = [pieces[0]]
+    slots = []
+    for slot, literal in zip(pieces[1::2], pieces[2::2]):
+        if slot in fixed:
+            literals[-1] += fixed[slot] + literal
+        else:
+            slots.append(slot)
+            literals.append(literal)
+    return PreviewPlan(literals=tuple(literals), slots=tuple(slots))
+
+
+# 模板ID -> (模板对象, 预览计划)；注册表重新加载后模板对象变化，计划随之重新编译
+_plan_cache: Dict[str, Tuple[Dict[str, Any], PreviewPlan]] = {}
+
+
+def get_preview_plan(template: Dict[str, Any]) -> PreviewPlan:
+    """获取模板对应的预览计划，首次使用时编译"""
+    style_id = template.get('id', '')
+    cached = _plan_cache.get(style_id)
+    if cached is not None and cached[0] is template:
+        return cached[1]
+    plan = compile_preview_plan(template)
+    _plan_cache[style_id] = (template, plan)
+    return plan
+
+
+def render_preview(title: str, author: str, template: Dict[str, Any]) -> str:
+    """渲染预览HTML，标题与作者均经过HTML转义"""
+    return get_preview_plan(template).render(title, author)
+
+
+def preview_etag(title: str, author: str, style_id: str, template_version: str) -> str:
+    """
+    计算预览的强 ETag，无需渲染即可判断客户端缓存是否仍然有效
+
+    Args:
+        title: 标题
+        author: 作者
+        style_id: 风格ID
+        template_version: 模板版本（templates.json 的内容哈希）
+    """
+    key = '\x00'.join((SKELETON_VERSION, template_version, style_id, title, author or ''))
+    return '"' + hashlib.sha256(key.encode('utf-8')).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """判断 If-None-Match 头是否包含给定 ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    # 弱比较：忽略 W/ 前缀
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return any(tag == etag or tag == 'W/' + etag for tag in candidates)
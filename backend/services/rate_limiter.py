@@ -0,0 +1,125 @@
+import asyncio
+import os
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional
+
+
+class AdaptiveLimiter:
+    def __init__(self, min_concurrency: int = 1, max_concurrency: int = 64,
+                 initial_concurrency: int = 8, rate: float = 0.0, burst: int = 10,
+                 decrease_interval: float = 1.0):
+        """
+        初始化自适应限流器
+
+        并发上限采用 AIMD：每次成功加性增长，收到限流信号时减半，超时与服务端错误时保持不变；
+        另有令牌桶限制每秒请求数。服务端返回 Retry-After 时整体暂停发送。
+
+        Args:
+            min_concurrency: 并发上限的下界
+            max_concurrency: 并发上限的上界
+            initial_concurrency: 初始并发上限
+            rate: 每秒请求数，0 表示不限制
+            burst: 令牌桶容量
+            decrease_interval: 两次减半之间的最小间隔（秒），避免同一波限流把上限压到底
+        """
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.limit = float(min(max(initial_concurrency, min_concurrency), max_concurrency))
+        self.rate = rate
+        self.burst = burst
+        self.decrease_interval = decrease_interval
+        self.in_flight = 0
+        self.throttled = 0
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._last_decrease = 0.0
+        self._paused_until = 0.0
+        self._cond = asyncio.Condition()
+
+    @classmethod
+    def from_env(cls) -> 'AdaptiveLimiter':
+        """按环境变量创建限流器"""
+        return cls(
+            min_concurrency=int(os.environ.get('DEEPSEEK_MIN_CONCURRENCY', '1')),
+            max_concurrency=int(os.environ.get('DEEPSEEK_MAX_CONCURRENCY', '64')),
+            initial_concurrency=int(os.environ.get('DEEPSEEK_INITIAL_CONCURRENCY', '8')),
+            rate=float(os.environ.get('DEEPSEEK_RPS', '0')),
+            burst=int(os.environ.get('DEEPSEEK_BURST', '10')),
+        )
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    async def acquire(self) -> None:
+        """等待直到可以发起一次上游请求"""
+        async with self._cond:
+            while True:
+                now = time.monotonic()
+                wait: Optional[float] = None
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self.in_flight < int(self.limit):
+                    if self.rate <= 0:
+                        self.in_flight += 1
+                        return
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        self.in_flight += 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+                try:
+                    await asyncio.wait_for(self._cond.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(self, outcome: str = 'success', retry_after: Optional[float] = None) -> None:
+        """
+        归还并发名额并根据结果调整上限
+
+        Args:
+            outcome: 本次请求的结果：'success' 正常完成，上限加性增长；
+                     'throttled' 收到限流/过载信号（429、503），上限减半；
+                     'error' 超时、连接失败、5xx 或其他错误，说明上游不健康，上限不再增长
+            retry_after: 服务端要求的等待时间（秒）
+        """
+        async with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if outcome == 'throttled':
+                self.throttled += 1
+                if now - self._last_decrease >= self.decrease_interval:
+                    self.limit = max(float(self.min_concurrency), self.limit / 2)
+                    self._last_decrease = now
+                if retry_after:
+                    self._paused_until = max(self._paused_until, now + retry_after)
+            elif outcome == 'success':
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取限流器状态"""
+        return {
+            'limit': round(self.limit, 2),
+            'in_flight': self.in_flight,
+            'rate': self.rate,
+            'throttled': self.throttled,
+            'paused_seconds': round(max(0.0, self._paused_until - time.monotonic()), 3),
+        }
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头（秒数或 HTTP 日期），无法解析时返回None"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
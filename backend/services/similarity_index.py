@@ -0,0 +1,142 @@
+import hashlib
+import random
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, FrozenSet, List, Optional, Set, Tuple
+
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def shingles(text: str, n: int = 2) -> FrozenSet[str]:
+    """字符 n-gram 集合；短于 n 的文本整体作为一个元素"""
+    if len(text) <= n:
+        return frozenset([text]) if text else frozenset()
+    return frozenset(text[i:i + n] for i in range(len(text) - n + 1))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class SimilarityIndex:
+    def __init__(self, threshold: float = 0.85, num_perm: int = 64, bands: int = 16,
+                 ngram: int = 2, max_entries: int = 100000):
+        """
+        初始化标题近似匹配索引
+
+        每个 (风格, 作者) 分组内，按标题的字符 n-gram 计算 MinHash 签名，
+        用 LSH 分段桶找出候选，再以精确 Jaccard 相似度确认是否达到阈值。
+
+        Args:
+            threshold: 判定为近似标题的 Jaccard 相似度下限
+            num_perm: MinHash 签名长度
+            bands: LSH 分段数，num_perm 需能被整除；分段越多召回越高、候选越多
+            ngram: 字符 n-gram 长度
+            max_entries: 索引条目上限，超出后淘汰最早加入的条目
+        """
+        if num_perm % bands:
+            raise ValueError('num_perm 必须能被 bands 整除')
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.ngram = ngram
+        self.max_entries = max_entries
+        # 固定种子，保证重启前后签名一致
+        rng = random.Random(1)
+        self._perms = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+                       for _ in range(num_perm)]
+        self._lock = threading.Lock()
+        # 缓存键 -> (分组, 标题 n-gram 集合, 各分段桶键)
+        self._entries: "OrderedDict[str, Tuple[str, FrozenSet[str], Tuple[Any, ...]]]" = OrderedDict()
+        self._buckets: Dict[Any, Set[str]] = {}
+        self.lookups = 0
+        self.hits = 0
+
+    @staticmethod
+    def _group(style_id: str, author: str) -> str:
+        return f"{style_id}\x00{author}"
+
+    def _signature(self, grams: FrozenSet[str]) -> List[int]:
+        hashes = [int.from_bytes(hashlib.blake2b(g.encode('utf-8'), digest_size=4).digest(), 'little')
+                  for g in grams]
+        if not hashes:
+            return [_MAX_HASH] * self.num_perm
+        return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) & _MAX_HASH for a, b in self._perms]
+
+    def _band_keys(self, group: str, grams: FrozenSet[str]) -> Tuple[Any, ...]:
+        signature = self._signature(grams)
+        return tuple(
+            (group, band, tuple(signature[band * self.rows:(band + 1) * self.rows]))
+            for band in range(self.bands)
+        )
+
+    def add(self, cache_key: str, style_id: str, author: str, title: str) -> None:
+        """加入或更新一条索引；title、author 应为规范化后的文本"""
+        group = self._group(style_id, author)
+        grams = shingles(title, self.ngram)
+        band_keys = self._band_keys(group, grams)
+        with self._lock:
+            self._remove_locked(cache_key)
+            self._entries[cache_key] = (group, grams, band_keys)
+            for band_key in band_keys:
+                self._buckets.setdefault(band_key, set()).add(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._remove_locked(next(iter(self._entries)))
+
+    def _remove_locked(self, cache_key: str) -> None:
+        entry = self._entries.pop(cache_key, None)
+        if entry is None:
+            return
+        for band_key in entry[2]:
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(cache_key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def remove(self, cache_key: str) -> None:
+        with self._lock:
+            self._remove_locked(cache_key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def query(self, style_id: str, author: str, title: str) -> Optional[Tuple[str, float]]:
+        """
+        查找最相似的已缓存标题
+
+        Returns:
+            (缓存键, Jaccard 相似度)，没有达到阈值的候选时返回None
+        """
+        group = self._group(style_id, author)
+        grams = shingles(title, self.ngram)
+        band_keys = self._band_keys(group, grams)
+        best: Optional[Tuple[str, float]] = None
+        with self._lock:
+            self.lookups += 1
+            candidates: Set[str] = set()
+            for band_key in band_keys:
+                candidates |= self._buckets.get(band_key, set())
+            for key in candidates:
+                score = jaccard(grams, self._entries[key][1])
+                if score >= self.threshold and (best is None or score > best[1]):
+                    best = (key, score)
+            if best is not None:
+                self.hits += 1
+        return best
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取索引统计信息"""
+        return {
+            'threshold': self.threshold,
+            'entries': len(self._entries),
+            'lookups': self.lookups,
+            'hits': self.hits,
+        }
@@ -0,0 +1,139 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .metrics import registry
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        """
+        初始化请求合并器
+
+        同一个键同时只会有一次上游调用在进行，期间到达的相同请求等待并共享这次调用的结果。
+        """
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.collapsed = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行 fn，若相同键已有调用在进行则等待其结果
+
+        Args:
+            key: 合并键（通常为缓存键）
+            fn: 真正发起调用的协程函数
+
+        Returns:
+            fn 的返回值；fn 抛出的异常会传递给所有等待者
+        """
+        task = self._calls.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.collapsed += 1
+        # shield：某个等待者断开连接被取消时，不影响其他等待者共享的上游调用
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取合并统计信息"""
+        return {
+            'in_flight': len(self._calls),
+            'leaders': self.leaders,
+            'collapsed': self.collapsed,
+        }
+
+
+class _Broadcast:
+    def __init__(self) -> None:
+        self.chunks: List[str] = []
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def publish(self, chunk: str) -> None:
+        self.chunks.append(chunk)
+        self.notify()
+
+    def notify(self) -> None:
+        # 每次通知换一个新事件，所有等待旧事件的订阅者一起被唤醒
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+
+class StreamFlight:
+    def __init__(self) -> None:
+        """
+        初始化流式请求合并器
+
+        同一个键同时只会有一次流式上游调用在进行，期间到达的相同请求先补发已生成的片段，
+        再和发起者一起接收后续片段，最后共享调用的结果。
+        """
+        self._streams: Dict[str, _Broadcast] = {}
+        self.leaders = 0
+        self.collapsed = 0
+
+    async def subscribe(self, key: str,
+                        fn: Callable[[Callable[[str], None]], Awaitable[Any]]) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        执行 fn 并订阅它产出的片段，若相同键已有调用在进行则加入该调用
+
+        Args:
+            key: 合并键（通常为缓存键）
+            fn: 真正发起调用的协程函数，参数为发布片段的回调
+
+        Yields:
+            ('chunk', 片段)，最后是 ('done', fn 的返回值)；fn 抛出的异常会传递给所有订阅者
+        """
+        stream = self._streams.get(key)
+        if stream is None:
+            self.leaders += 1
+            stream = _Broadcast()
+            stream.task = asyncio.ensure_future(fn(stream.publish))
+            self._streams[key] = stream
+            stream.task.add_done_callback(lambda t: self._forget(key, stream))
+        else:
+            self.collapsed += 1
+        # 订阅者断开连接只是停止迭代，不取消其他订阅者共享的上游调用
+        index = 0
+        while True:
+            changed = stream.changed
+            while index < len(stream.chunks):
+                index += 1
+                yield 'chunk', stream.chunks[index - 1]
+            if stream.task.done():
+                break
+            await changed.wait()
+        yield 'done', stream.task.result()
+
+    def _forget(self, key: str, stream: _Broadcast) -> None:
+        if self._streams.get(key) is stream:
+            del self._streams[key]
+        stream.notify()
+        # 所有订阅者都已断开时也取走异常，避免 "exception was never retrieved" 警告
+        if not stream.task.cancelled():
+            stream.task.exception()
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取合并统计信息"""
+        return {
+            'in_flight': len(self._streams),
+            'leaders': self.leaders,
+            'collapsed': self.collapsed,
+        }
+
+
+# 全局生成请求合并实例
+generation_flight = SingleFlight()
+# 全局流式生成请求合并实例
+stream_flight = StreamFlight()
+
+registry.callback('generation_in_flight', 'Distinct generations currently running', 'gauge',
+                  lambda: {(): len(generation_flight._calls) + len(stream_flight._streams)})
+registry.callback('generation_collapsed_total', 'Requests that joined an in-flight generation', 'counter',
+                  lambda: {(): generation_flight.collapsed + stream_flight.collapsed})
@@ -0,0 +1,144 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # 可选依赖，未安装时只预压缩 gzip
+    brotli = None
+
+from .compression import accepts
+
+
+# 只处理前端自身的文本资源；图片等二进制文件压缩收益不大
+ASSET_SUFFIXES = ('.css', '.js')
+# 小于该大小的文件压缩后反而可能更大，不生成压缩版本
+MIN_COMPRESS_BYTES = 256
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+
+@dataclass
+class Asset:
+    """单个静态资源及其预压缩版本"""
+    path: str
+    hashed_path: str
+    media_type: str
+    etag: str
+    # 编码 -> 数据；'identity' 为原始内容
+    variants: Dict[str, bytes] = field(default_factory=dict)
+
+    def negotiate(self, accept_encoding: str) -> Tuple[Optional[str], bytes]:
+        """
+        按客户端 Accept-Encoding 选择最小的可用版本
+
+        Returns:
+            (Content-Encoding，原始内容时为None, 数据)
+        """
+        for codec in ('br', 'gzip'):
+            if codec in self.variants and accepts(accept_encoding, codec):
+                return codec, self.variants[codec]
+        return None, self.variants['identity']
+
+
+def _content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def _hashed_name(path: str, digest: str) -> str:
+    """css/style.css -> css/style.<hash>.css"""
+    stem, dot, suffix = path.rpartition('.')
+    return f"{stem}.{digest}.{suffix}" if dot else f"{path}.{digest}"
+
+
+def _build_asset(path: str, data: bytes, hashed_path: str) -> Asset:
+    media_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if media_type.startswith('text/') or media_type in ('application/javascript', 'image/svg+xml'):
+        media_type += '; charset=utf-8'
+    asset = Asset(
+        path=path,
+        hashed_path=hashed_path,
+        media_type=media_type,
+        etag=f'"{_content_hash(data)}"',
+        variants={'identity': data},
+    )
+    if len(data) >= MIN_COMPRESS_BYTES:
+        # mtime=0 保证多次构建得到相同的压缩结果
+        asset.variants['gzip'] = gzip.compress(data, compresslevel=9, mtime=0)
+        if brotli is not None:
+            asset.variants['br'] = brotli.compress(data, quality=11)
+    return asset
+
+
+class StaticAssets:
+    def __init__(self, root: str):
+        """
+        初始化前端静态资源表
+
+        启动时一次性读取前端资源，生成带内容哈希的文件名（如 css/style.<hash>.css）
+        以及 gzip/brotli 预压缩版本；index.html 中的资源引用被改写为带哈希的地址，
+        因此带哈希的资源可以长期强缓存，只有 index.html 需要回源校验。
+
+        Args:
+            root: 前端目录
+        """
+        self.root = Path(root)
+        # 原始路径与带哈希路径都映射到同一资源
+        self._assets: Dict[str, Asset] = {}
+        self._hashed: Dict[str, str] = {}
+        self.index: Optional[Asset] = None
+
+    def build(self) -> None:
+        """扫描前端目录并构建资源表"""
+        assets: Dict[str, Asset] = {}
+        hashed: Dict[str, str] = {}
+        for file in sorted(self.root.rglob('*')):
+            if not file.is_file() or file.suffix not in ASSET_SUFFIXES:
+                continue
+            path = file.relative_to(self.root).as_posix()
+            data = file.read_bytes()
+            asset = _build_asset(path, data, _hashed_name(path, _content_hash(data)))
+            assets[path] = asset
+            assets[asset.hashed_path] = asset
+            hashed[path] = asset.hashed_path
+
+        index = None
+        index_file = self.root / 'index.html'
+        if index_file.is_file():
+            html = index_file.read_text(encoding='utf-8')
+            # 将 "/css/style.css" 这类绝对引用替换为带哈希的地址
+            if hashed:
+                pattern = re.compile(r'(["\'])/(' + '|'.join(re.escape(p) for p in hashed) + r')\1')
+                html = pattern.sub(lambda m: f"{m.group(1)}/{hashed[m.group(2)]}{m.group(1)}", html)
+            index = _build_asset('index.html', html.encode('utf-8'), 'index.html')
+
+        self._assets = assets
+        self._hashed = hashed
+        self.index = index
+
+    def get(self, path: str) -> Optional[Tuple[Asset, bool]]:
+        """
+        按请求路径查找资源
+
+        Returns:
+            (资源, 是否为带哈希的地址)，不存在时返回None
+        """
+        asset = self._assets.get(path)
+        if asset is None:
+            return None
+        return asset, path == asset.hashed_path
+
+
+FRONTEND_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'frontend'
+)
+
+# 全局静态资源表，启动时构建
+static_assets = StaticAssets(FRONTEND_DIR)
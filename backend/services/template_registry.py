@@ -0,0 +1,174 @@
+import hashlib
+import json
+import marshal
+import os
+import threading
+import time
+from typing import Dict, Any, Optional, List
+
+
+# 预编译模板包（convert_csv_to_json.py 生成）的文件头
+BUNDLE_MAGIC = b'XHSTPL1\n'
+
+# 参与模板 version 计算的字段，需与 convert_csv_to_json.py 中的 VERSION_FIELDS 保持一致
+VERSION_FIELDS = ('prompt_template', 'requirements', 'style_details')
+
+
+def template_version(template: Dict[str, Any]) -> str:
+    """模板的内容版本：提示词相关字段的哈希，字段不变时 version 不变"""
+    canonical = json.dumps({field: template.get(field) for field in VERSION_FIELDS},
+                           ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def _with_versions(templates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    加载时按当前内容计算每个模板的 version
+
+    version 不保存在 templates.json 中（convert_csv_to_json.py 不输出该字段）；
+    文件中若带有 version（旧版本生成或手工添加）也会被覆盖，过期的值不会让旧缓存一直命中。
+    """
+    for template in templates:
+        template['version'] = template_version(template)
+    return templates
+
+
+class TemplateRegistry:
+    def __init__(self, templates_path: str, check_interval: float = 2.0, bundle_path: Optional[str] = None):
+        """
+        初始化模板注册表
+
+        模板在启动时一次性加载到内存，按 id 建立索引，并预先计算 /styles 的返回列表。
+        之后只在文件的 mtime 或内容哈希变化时重新加载，查询本身不涉及任何 I/O。
+
+        Args:
+            templates_path: templates.json 文件路径
+            check_interval: 检查文件变化的最小间隔（秒）
+            bundle_path: 预编译模板包路径；其记录的哈希与 templates.json 一致时直接加载，
+                         省去 JSON 解析与 /styles 投影，缺失或过期时回退到解析 JSON
+        """
+        self.templates_path = templates_path
+        self.check_interval = check_interval
+        self.bundle_path = bundle_path
+        self.loaded_from = ''  # 'bundle' 或 'json'，尚未加载时为空
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+        self._mtime: Optional[float] = None
+        # 快照整体替换，读者无需加锁即可拿到一致的数据
+        self._snapshot = self._empty_snapshot()
+
+    @staticmethod
+    def _empty_snapshot() -> Dict[str, Any]:
+        return {
+            'hash': '',
+            'templates': [],
+            'by_id': {},
+            'styles': [],
+        }
+
+    @staticmethod
+    def _build_snapshot(raw: bytes) -> Dict[str, Any]:
+        """解析模板文件内容并生成索引与 /styles 投影"""
+        data = json.loads(raw.decode('utf-8'))
+        templates = _with_versions(data['templates'])
+        return {
+            'hash': hashlib.sha256(raw).hexdigest(),
+            'templates': templates,
+            'by_id': {t['id']: t for t in templates},
+            'styles': [{
+                'id': t['id'],
+                'name': t['name'],
+                'description': t.get('description', ''),
+                'example_image': t.get('example_image', ''),
+            } for t in templates],
+        }
+
+    def _load_bundle(self, digest: str) -> Optional[Dict[str, Any]]:
+        """加载与 templates.json 内容哈希一致的预编译模板包，不可用时返回None"""
+        if not self.bundle_path:
+            return None
+        try:
+            with open(self.bundle_path, 'rb') as f:
+                raw = f.read()
+            if not raw.startswith(BUNDLE_MAGIC):
+                return None
+            payload = marshal.loads(raw[len(BUNDLE_MAGIC):])
+            if payload.get('source_hash') != digest:
+                print("模板包与 templates.json 不一致，改为解析 JSON（运行 convert_csv_to_json.py --bundle-only 重新生成）")
+                return None
+            templates = _with_versions(payload['templates'])
+            return {
+                'hash': digest,
+                'templates': templates,
+                'by_id': {t['id']: t for t in templates},
+                'styles': payload['styles'],
+            }
+        except (OSError, EOFError, ValueError, TypeError, KeyError, AttributeError):
+            return None
+
+    def load(self) -> bool:
+        """
+        检查模板文件并在内容变化时重新加载
+
+        Returns:
+            是否发生了重新加载
+        """
+        with self._lock:
+            self._last_check = time.monotonic()
+            try:
+                mtime = os.stat(self.templates_path).st_mtime
+                if mtime == self._mtime:
+                    return False
+                with open(self.templates_path, 'rb') as f:
+                    raw = f.read()
+                digest = hashlib.sha256(raw).hexdigest()
+                self._mtime = mtime
+                if digest == self._snapshot['hash']:
+                    # 仅 mtime 变化（如 touch），内容未变，无需重新解析
+                    return False
+                snapshot = self._load_bundle(digest)
+                self.loaded_from = 'bundle' if snapshot is not None else 'json'
+                self._snapshot = snapshot if snapshot is not None else self._build_snapshot(raw)
+                return True
+            except Exception as e:
+                # 加载失败时保留旧快照，避免一次错误的编辑导致服务不可用
+                print(f"Error loading templates: {e}")
+                return False
+
+    def _maybe_reload(self) -> None:
+        if time.monotonic() - self._last_check >= self.check_interval:
+            self.load()
+
+    @property
+    def version(self) -> str:
+        """当前模板文件内容的哈希值"""
+        self._maybe_reload()
+        return self._snapshot['hash']
+
+    def version_of(self, style_id: str) -> str:
+        """获取模板的内容版本，模板不存在时返回空字符串"""
+        template = self.get(style_id)
+        return template['version'] if template is not None else ''
+
+    def get(self, style_id: str) -> Optional[Dict[str, Any]]:
+        """按 id 获取模板，不存在则返回None"""
+        self._maybe_reload()
+        return self._snapshot['by_id'].get(style_id)
+
+    def all(self) -> List[Dict[str, Any]]:
+        """获取全部模板"""
+        self._maybe_reload()
+        return self._snapshot['templates']
+
+    def list_styles(self) -> List[Dict[str, Any]]:
+        """获取预先计算好的风格列表"""
+        self._maybe_reload()
+        return self._snapshot['styles']
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+TEMPLATES_JSON = os.path.join(PROJECT_ROOT, 'templates.json')
+TEMPLATES_BUNDLE = os.path.join(PROJECT_ROOT, 'templates.bundle')
+
+# 全局模板注册表实例
+template_registry = TemplateRegistry(TEMPLATES_JSON, bundle_path=TEMPLATES_BUNDLE)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+冷启动测量：在全新的解释器中导入 Vercel 入口（api/index.py）并处理第一个请求
+
+    python bench/cold_start.py                      # 默认运行 10 次，导入耗时中位数超出预算时退出码为1
+    python bench/cold_start.py --budget-ms 500 --runs 20 --output bench/cold_start.json
+    python bench/cold_start.py --importtime         # 额外列出自身耗时最多的模块
+
+默认预算 650ms：Python 3.11 上实测导入中位数约 490–550ms，其中 FastAPI 自身的导入
+（主要是 fastapi.openapi.models）占大半且无法延迟，预算在此基础上留出余量。
+
+测量项：
+    import_ms         import api.index 的耗时
+    first_styles_ms   第一次 GET /styles（包含模板加载）
+    first_preview_ms  第一次 GET /generate/preview
+    lazy_ok           导入与预览之后 AI 生成相关模块（httpx、deepseek_service、cache_service）仍未被导入
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+
+ROOT = Path(__file__).resolve().parent.parent
+# 只应在 /generate/ai 时才导入的模块
+LAZY_MODULES = ('httpx', 'services.deepseek_service', 'services.cache_service')
+
+
+async def _asgi_get(app: Any, path: str, query: str = '') -> int:
+    """直接以 ASGI 调用应用，返回状态码（不依赖 HTTP 客户端库）"""
+    status = 0
+    sent = False
+
+    async def receive() -> Dict[str, Any]:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await asyncio.sleep(3600)
+        return {'type': 'http.disconnect'}
+
+    async def send(message: Dict[str, Any]) -> None:
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+        'root_path': '', 'headers': [(b'host', b'localhost')], 'client': ('127.0.0.1', 0),
+        'server': ('localhost', 80),
+    }
+    await app(scope, receive, send)
+    return status
+
+
+def child() -> None:
+    """在子进程中执行一次冷启动测量，结果以 JSON 输出到 stdout"""
+    sys.path.insert(0, str(ROOT))
+    started = time.perf_counter()
+    from api.index import app
+    import_ms = (time.perf_counter() - started) * 1000
+
+    async def requests() -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        styles_status = await _asgi_get(app, '/styles')
+        t1 = time.perf_counter()
+        preview_status = await _asgi_get(app, '/generate/preview', 'title=test&style_id=style_1')
+        t2 = time.perf_counter()
+        return {
+            'first_styles_ms': (t1 - t0) * 1000,
+            'first_preview_ms': (t2 - t1) * 1000,
+            'statuses': [styles_status, preview_status],
+        }
+
+    result = asyncio.run(requests())
+    result['import_ms'] = import_ms
+    result['lazy_ok'] = not any(m in sys.modules for m in LAZY_MODULES)
+    print(json.dumps(result))
+
+
+def run_once(python: str) -> Dict[str, Any]:
+    proc = subprocess.run(
+        [python, str(Path(__file__).resolve()), '--child'],
+        cwd=str(ROOT), capture_output=True, text=True, check=True
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def import_profile(python: str, top: int) -> List[Dict[str, Any]]:
+    """用 -X importtime 找出自身导入耗时最多的模块"""
+    proc = subprocess.run(
+        [python, '-X', 'importtime', '-c', 'import api.index'],
+        cwd=str(ROOT), capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        rows.append({'module': name, 'self_ms': int(self_us) / 1000, 'cumulative_ms': int(cumulative_us) / 1000})
+    rows.sort(key=lambda r: r['self_ms'], reverse=True)
+    return rows[:top]
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {}
+    for metric in ('import_ms', 'first_styles_ms', 'first_preview_ms'):
+        values = [r[metric] for r in runs]
+        summary[metric] = {
+            'p50': round(statistics.median(values), 1),
+            'max': round(max(values), 1),
+        }
+    summary['lazy_ok'] = all(r['lazy_ok'] for r in runs)
+    summary['statuses_ok'] = all(r['statuses'] == [200, 200] for r in runs)
+    return summary
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='测量 api/index.py 的冷启动耗时')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=float(os.environ.get('COLD_START_BUDGET_MS', '650')),
+                        help='导入耗时中位数的预算（毫秒）')
+    parser.add_argument('--importtime', action='store_true', help='列出自身导入耗时最多的模块')
+    parser.add_argument('--output', help='结果写入的 JSON 文件')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return 0
+
+    runs = [run_once(sys.executable) for _ in range(args.runs)]
+    result = {
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        'budget_ms': args.budget_ms,
+        **summarize(runs),
+    }
+    if args.importtime:
+        result['top_imports'] = import_profile(sys.executable, 15)
+    result['ok'] = (result['import_ms']['p50'] <= args.budget_ms
+                    and result['lazy_ok'] and result['statuses_ok'])
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    if not result['ok']:
+        print(f"冷启动未达标：导入耗时中位数 {result['import_ms']['p50']}ms（预算 {args.budget_ms}ms），"
+              f"延迟导入 {'正常' if result['lazy_ok'] else '失效'}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+本地模拟的 DeepSeek 对话接口，用于压测时替代真实上游
+
+支持配置响应延迟、抖动、错误率以及流式输出的分段数：
+
+    python bench/fake_deepseek.py --port 9100 --latency 0.8 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import zlib
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+app = FastAPI(title='Fake DeepSeek')
+
+config = {
+    'latency': float(os.environ.get('FAKE_LATENCY', '0.5')),
+    'jitter': float(os.environ.get('FAKE_JITTER', '0.1')),
+    'error_rate': float(os.environ.get('FAKE_ERROR_RATE', '0')),
+    'chunks': int(os.environ.get('FAKE_CHUNKS', '20')),
+    'html_bytes': int(os.environ.get('FAKE_HTML_BYTES', '6000')),
+}
+
+stats = {'requests': 0, 'streams': 0, 'errors': 0}
+
+
+def _delay() -> float:
+    return max(0.0, random.uniform(config['latency'] - config['jitter'], config['latency'] + config['jitter']))
+
+
+def _fake_html(messages: list) -> str:
+    # 内容随请求变化，避免所有结果在缓存中去重成同一个内容块；
+    # 种子放在属性里而不是注释里，写入缓存前的后处理会删除注释
+    seed = json.dumps(messages[-1], ensure_ascii=False) if messages else ''
+    filler = ('<div class="deco"></div>' * (config['html_bytes'] // 24 + 1))[:config['html_bytes']]
+    return f"```html\n<!doctype html><html><body data-seed=\"{zlib.crc32(seed.encode('utf-8'))}\">{filler}</body></html>\n```"
+
+
+def _usage(prompt: str, completion: str) -> dict:
+    prompt_tokens = len(prompt) // 2
+    hit = prompt_tokens * 3 // 4
+    return {
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': len(completion) // 4,
+        'prompt_cache_hit_tokens': hit,
+        'prompt_cache_miss_tokens': prompt_tokens - hit,
+    }
+
+
+def _maybe_error():
+    """按错误率返回 503 或 500，503 携带 Retry-After 以覆盖限流处理逻辑"""
+    if random.random() >= config['error_rate']:
+        return None
+    stats['errors'] += 1
+    if random.random() < 0.5:
+        return JSONResponse(status_code=503, headers={'Retry-After': '1'},
+                            content={'error': {'message': 'server overloaded'}})
+    return JSONResponse(status_code=500, content={'error': {'message': 'internal error'}})
+
+
+@app.get('/v1/models')
+def list_models():
+    return {'object': 'list', 'data': [{'id': 'deepseek-chat', 'object': 'model'}]}
+
+
+@app.get('/stats')
+def get_stats():
+    return {**stats, 'config': config}
+
+
+@app.post('/v1/chat/completions')
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats['requests'] += 1
+    error = _maybe_error()
+    if error is not None:
+        await asyncio.sleep(config['latency'] / 10)
+        return error
+
+    messages = body.get('messages', [])
+    prompt = ''.join(m.get('content', '') for m in messages)
+    content = _fake_html(messages)
+    usage = _usage(prompt, content)
+    created = int(time.time())
+
+    if not body.get('stream'):
+        await asyncio.sleep(_delay())
+        return {
+            'id': f'fake-{stats["requests"]}',
+            'object': 'chat.completion',
+            'created': created,
+            'model': body.get('model', 'deepseek-chat'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': usage,
+        }
+
+    stats['streams'] += 1
+    chunk_count = max(1, config['chunks'])
+    size = len(content) // chunk_count + 1
+
+    async def events():
+        # 总耗时与非流式一致，均匀分摊到各个分段
+        pause = _delay() / chunk_count
+        for start in range(0, len(content), size):
+            await asyncio.sleep(pause)
+            chunk = {
+                'id': f'fake-{stats["requests"]}',
+                'object': 'chat.completion.chunk',
+                'created': created,
+                'choices': [{'index': 0, 'delta': {'content': content[start:start + size]}}],
+            }
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+        yield f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n"
+        yield 'data: [DONE]\n\n'
+
+    return StreamingResponse(events(), media_type='text/event-stream')
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description='本地模拟 DeepSeek 接口')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--latency', type=float, default=config['latency'], help='平均响应时间（秒）')
+    parser.add_argument('--jitter', type=float, default=config['jitter'], help='响应时间抖动（秒）')
+    parser.add_argument('--error-rate', type=float, default=config['error_rate'], help='返回 5xx 的概率')
+    parser.add_argument('--chunks', type=int, default=config['chunks'], help='流式输出的分段数')
+    args = parser.parse_args()
+    config.update(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, chunks=args.chunks)
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
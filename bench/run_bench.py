@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+端到端压测：启动模拟 DeepSeek 与后端服务，按固定并发运行各类负载
+
+    python bench/run_bench.py --concurrency 8 32 --requests 400 --output bench/result.json
+    python bench/run_bench.py --baseline bench/baseline.json      # 与基线比较，退化时退出码为1
+    python bench/run_bench.py --save-baseline bench/baseline.json # 保存本次结果为基线
+
+负载：
+    preview     GET /generate/preview，每次不同标题
+    cache_hit   POST /generate/ai，标题集合已预热
+    cache_miss  POST /generate/ai，每次不同标题，均需调用（模拟的）上游
+    stream      POST /generate/ai/stream，每次不同标题，读完整个事件流
+    batch       POST /generate/batch，每批若干条目，读完整个 NDJSON
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+
+ROOT = Path(__file__).resolve().parent.parent
+WORKLOADS = ('preview', 'cache_hit', 'cache_miss', 'stream', 'batch')
+# 与基线比较的指标，以及数值变大是否表示退化
+COMPARED_METRICS = {'p50_ms': True, 'p95_ms': True, 'p99_ms': True, 'rps': False}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """最近秩法计算百分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _summarize(latencies: List[float], errors: int, elapsed: float, concurrency: int) -> Dict[str, Any]:
+    values = sorted(latencies)
+    total = len(values) + errors
+    return {
+        'concurrency': concurrency,
+        'requests': total,
+        'errors': errors,
+        'rps': round(total / elapsed, 2) if elapsed > 0 else 0,
+        'mean_ms': round(sum(values) / len(values) * 1000, 2) if values else 0,
+        'p50_ms': round(_percentile(values, 50) * 1000, 2),
+        'p95_ms': round(_percentile(values, 95) * 1000, 2),
+        'p99_ms': round(_percentile(values, 99) * 1000, 2),
+    }
+
+
+async def _drive(concurrency: int, total: int, call: Callable[[int], Awaitable[bool]]) -> Dict[str, Any]:
+    """以固定并发执行 total 次调用，call(i) 返回是否成功"""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                ok = await call(i)
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return _summarize(latencies, errors, time.perf_counter() - started, concurrency)
+
+
+def _payload(title: str, style_id: str = 'style_1') -> Dict[str, str]:
+    return {'title': title, 'author': 'bench', 'style_id': style_id}
+
+
+async def run_workload(name: str, base_url: str, concurrency: int, total: int,
+                       batch_size: int) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency * 2)
+    # 每轮使用不同前缀，保证未命中类负载不会命中上一轮写入的缓存
+    run_id = uuid.uuid4().hex[:8]
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        if name == 'preview':
+            async def call(i: int) -> bool:
+                resp = await client.get('/generate/preview', params=_payload(f'preview {run_id} {i}'))
+                return resp.status_code == 200
+
+        elif name == 'cache_hit':
+            hot = [f'hot {run_id} {i}' for i in range(min(total, 50))]
+            for title in hot:
+                await client.post('/generate/ai', json=_payload(title))
+
+            async def call(i: int) -> bool:
+                resp = await client.post('/generate/ai', json=_payload(hot[i % len(hot)]))
+                return resp.status_code == 200
+
+        elif name == 'cache_miss':
+            async def call(i: int) -> bool:
+                resp = await client.post('/generate/ai', json=_payload(f'miss {run_id} {i}'))
+                return resp.status_code == 200
+
+        elif name == 'stream':
+            async def call(i: int) -> bool:
+                async with client.stream('POST', '/generate/ai/stream',
+                                         json=_payload(f'stream {run_id} {i}')) as resp:
+                    body = [line async for line in resp.aiter_lines()]
+                return resp.status_code == 200 and 'event: done' in body
+
+        elif name == 'batch':
+            async def call(i: int) -> bool:
+                items = [_payload(f'batch {run_id} {i} {j}') for j in range(batch_size)]
+                resp = await client.post('/generate/batch', json={'items': items})
+                results = [json.loads(line) for line in resp.text.splitlines() if line]
+                return resp.status_code == 200 and all(r.get('status') == 'ok' for r in results)
+
+        else:
+            raise ValueError(f'未知负载: {name}')
+
+        # 批量负载每次请求包含多条，请求数相应减少
+        count = max(1, total // batch_size) if name == 'batch' else total
+        result = await _drive(concurrency, count, call)
+        if name == 'batch':
+            result['batch_size'] = batch_size
+        return result
+
+
+def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'进程提前退出: {url}')
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f'等待服务启动超时: {url}')
+
+
+def start_servers(args: argparse.Namespace, workdir: Path) -> List[subprocess.Popen]:
+    """启动模拟上游与后端；后端在临时目录中运行，缓存与任务库不污染仓库"""
+    fake_port, app_port = _free_port(), _free_port()
+    fake = subprocess.Popen([
+        sys.executable, str(ROOT / 'bench' / 'fake_deepseek.py'),
+        '--port', str(fake_port),
+        '--latency', str(args.latency),
+        '--jitter', str(args.jitter),
+        '--error-rate', str(args.error_rate),
+        '--chunks', str(args.chunks),
+    ])
+    _wait_ready(f'http://127.0.0.1:{fake_port}/v1/models', fake)
+
+    env = {
+        **os.environ,
+        'DEEPSEEK_API_KEY': 'bench',
+        'DEEPSEEK_API_BASE': f'http://127.0.0.1:{fake_port}',
+        # 保留调用方已有的 PYTHONPATH（如通过它安装的依赖）
+        'PYTHONPATH': os.pathsep.join(p for p in (str(ROOT / 'backend'), os.environ.get('PYTHONPATH', '')) if p),
+    }
+    app = subprocess.Popen([
+        sys.executable, '-m', 'uvicorn', 'app:app',
+        '--host', '127.0.0.1', '--port', str(app_port),
+        '--workers', str(args.workers), '--log-level', 'warning',
+    ], cwd=str(workdir), env=env, stdout=subprocess.DEVNULL)
+    args.base_url = f'http://127.0.0.1:{app_port}'
+    try:
+        _wait_ready(f'{args.base_url}/styles', app)
+    except RuntimeError:
+        fake.terminate()
+        raise
+    return [fake, app]
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    与基线比较，返回退化描述列表
+
+    延迟类指标增大、吞吐下降超过 tolerance（比例）即视为退化。
+    """
+    regressions = []
+    base_runs = {(r['workload'], r['concurrency']): r for r in baseline.get('runs', [])}
+    for run in results['runs']:
+        base = base_runs.get((run['workload'], run['concurrency']))
+        if base is None:
+            continue
+        changes = {}
+        for metric, higher_is_worse in COMPARED_METRICS.items():
+            old, new = base.get(metric), run.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            changes[metric] = round(change, 4)
+            worse = change > tolerance if higher_is_worse else change < -tolerance
+            if worse:
+                regressions.append(
+                    f"{run['workload']}@{run['concurrency']} {metric}: {old} -> {new} ({change:+.1%})"
+                )
+        run['vs_baseline'] = changes
+    return regressions
+
+
+async def run_all(args: argparse.Namespace) -> Dict[str, Any]:
+    runs = []
+    for concurrency in args.concurrency:
+        for name in args.workloads:
+            print(f'运行 {name} 并发 {concurrency} ...', file=sys.stderr)
+            result = await run_workload(name, args.base_url, concurrency, args.requests, args.batch_size)
+            runs.append({'workload': name, **result})
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'workers': args.workers,
+            'requests': args.requests,
+            'fake_upstream': {
+                'latency': args.latency,
+                'jitter': args.jitter,
+                'error_rate': args.error_rate,
+                'chunks': args.chunks,
+            },
+        },
+        'runs': runs,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='封面生成服务端到端压测')
+    parser.add_argument('--workloads', nargs='+', choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=200, help='每个负载每个并发级别的请求数')
+    parser.add_argument('--batch-size', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=1, help='后端 uvicorn 工作进程数')
+    parser.add_argument('--latency', type=float, default=0.5, help='模拟上游平均延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--chunks', type=int, default=20)
+    parser.add_argument('--base-url', help='压测已在运行的后端，不启动本地服务')
+    parser.add_argument('--output', help='结果JSON输出路径，默认输出到标准输出')
+    parser.add_argument('--baseline', help='用于比较的基线JSON')
+    parser.add_argument('--save-baseline', help='将本次结果保存为基线')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='允许的退化比例')
+    args = parser.parse_args()
+
+    procs: List[subprocess.Popen] = []
+    with tempfile.TemporaryDirectory(prefix='xhs-bench-') as workdir:
+        try:
+            if not args.base_url:
+                procs = start_servers(args, Path(workdir))
+            results = asyncio.run(run_all(args))
+        finally:
+            for proc in reversed(procs):
+                proc.terminate()
+                proc.wait(timeout=10)
+
+    regressions: Optional[List[str]] = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        results['regressions'] = regressions
+
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + '\n', encoding='utf-8')
+    else:
+        print(text)
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(text + '\n', encoding='utf-8')
+
+    if regressions:
+        print('性能退化:', file=sys.stderr)
+        for line in regressions:
+            print(f'  {line}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
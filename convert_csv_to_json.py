@@ -3,26 +3,64 @@
 """
 CSV转JSON转换脚本
 将小红书封面生成提示词CSV文件转换为项目开发需要的JSON格式
+
+默认增量构建：每行按内容哈希，未变化的行直接复用构建缓存中的解析结果；
+模板 id 按名称沿用已有 templates.json 中的 id，新模板的 id 由名称派生，插入或调整行序不会改变已有 id；
+按 version（提示词相关字段的内容哈希）报告内容变化的模板，输出内容未变化时不重写文件。
+version 不写入 templates.json：服务端加载模板时按内容计算，手工编辑后也不会过期。
 """
 
+import argparse
 import csv
+import hashlib
+import io
 import json
+import marshal
+import os
 import re
-from typing import Dict, List, Any
+import tempfile
+import time
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+# 预编译模板包的文件头，需与 backend/services/template_registry.py 中的 BUNDLE_MAGIC 保持一致
+BUNDLE_MAGIC = b'XHSTPL1\n'
+
+# 参与 version 计算的字段（决定生成提示词的内容），需与 backend/services/template_registry.py 中的 VERSION_FIELDS 保持一致；
+# 这里只用于报告哪些模板的内容发生了变化
+VERSION_FIELDS = ('prompt_template', 'requirements', 'style_details')
+
+CSV_COLUMNS = ('提示词', '基本要求', '风格', '用户输入内容', '风格名称', '风格示例图')
+
+# 构建缓存格式变化（解析逻辑修改）时递增，旧缓存随之失效
+BUILD_CACHE_FORMAT = 3
+
+# 比较手工编辑时忽略的字段：priority 由行序决定
+_POSITIONAL_FIELDS = ('priority',)
+
+_WHITESPACE = re.compile(r'\s+')
+_STYLE_NAME = re.compile(r'#\s*([^#\n]+)')
+_BOLD_SECTION = re.compile(r'\*\*([^*]+)\*\*')
+_STYLE_TITLE_LINE = re.compile(r'^#.*?(?=\n##|\Z)', re.S)
+_STYLE_SECTION = re.compile(r'(^|\n)##\s*([^\n#]+)\n(.*?)(?=\n##|\Z)', re.S)
+_HEADING_SEPARATOR = re.compile(r'[\-—:：]\s*')
+_USER_INPUT_FIELD = re.compile(r'^-\s*([^：:]+)\s*[：:]')
+
+class HandEditError(RuntimeError):
+    """templates.json 在上次构建之后被手工修改，重新生成会覆盖这些修改"""
 
 def clean_text(text: str) -> str:
     """清理文本，移除多余的空白字符"""
     if not text:
         return ""
-    return re.sub(r'\s+', ' ', text.strip())
+    return _WHITESPACE.sub(' ', text.strip())
 
 def extract_style_name(style_text: str) -> str:
     """从风格文本中提取风格名称"""
     if not style_text:
         return ""
-    
+
     # 查找以#开头的风格名称
-    match = re.search(r'#\s*([^#\n]+)', style_text)
+    match = _STYLE_NAME.search(style_text)
     if match:
         return clean_text(match.group(1))
     return ""
@@ -31,36 +69,36 @@ def parse_requirements(requirements_text: str) -> Dict[str, str]:
     """解析基本要求文本"""
     if not requirements_text:
         return {}
-    
+
     requirements = {}
-    sections = re.split(r'\*\*([^*]+)\*\*', requirements_text)
-    
+    sections = _BOLD_SECTION.split(requirements_text)
+
     for i in range(1, len(sections), 2):
         if i + 1 < len(sections):
             section_name = sections[i].strip()
             section_content = sections[i + 1].strip()
             requirements[section_name] = clean_text(section_content)
-    
+
     return requirements
 
 def parse_style_details(style_text: str) -> Dict[str, str]:
     """解析风格详情文本"""
     if not style_text:
         return {}
-    
+
     # 去掉首行以 # 开头的风格名描述，便于解析后续 ## 段落
-    text = re.sub(r'^#.*?(?=\n##|\Z)', '', style_text, flags=re.S)
+    text = _STYLE_TITLE_LINE.sub('', style_text)
 
     style_details: Dict[str, str] = {}
     # 匹配形如：\n## 标题\n内容... 直到下一个 ## 或文本末尾
-    for match in re.finditer(r'(^|\n)##\s*([^\n#]+)\n(.*?)(?=\n##|\Z)', text, flags=re.S):
+    for match in _STYLE_SECTION.finditer(text):
         raw_heading = match.group(2).strip()
         body = match.group(3).strip()
 
         # 标题可能为 "设计风格- xxx"，将 "-" 之后的部分并入正文开头
         heading_main = raw_heading
         heading_extra = ''
-        m2 = re.split(r'[\-—:：]\s*', raw_heading, maxsplit=1)
+        m2 = _HEADING_SEPARATOR.split(raw_heading, maxsplit=1)
         if len(m2) == 2:
             heading_main = m2[0].strip()
             heading_extra = m2[1].strip()
@@ -93,7 +131,7 @@ def parse_user_inputs(input_text: str) -> List[str]:
         if not line or '：' not in line:
             continue
         # 形如 "- 封面文案：[]" 或 "- 账号名称：[]"
-        match = re.match(r'^-\s*([^：:]+)\s*[：:]', line)
+        match = _USER_INPUT_FIELD.match(line)
         if match:
             field_name = match.group(1).strip()
             if field_name and field_name not in inputs:
@@ -101,85 +139,345 @@ def parse_user_inputs(input_text: str) -> List[str]:
 
     return inputs
 
-def convert_csv_to_json(csv_file_path: str, json_file_path: str):
-    """将CSV文件转换为JSON格式"""
-    
-    templates = []
-    
-    with open(csv_file_path, 'r', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        
-        for row_num, row in enumerate(reader, start=2):
-            # 跳过空行
-            if not any(row.values()):
-                continue
-                
-            # 提取数据（保留原始换行，便于正则/分段解析）
-            prompt = clean_text(row.get('提示词', '') or '')
-            requirements_text = (row.get('基本要求', '') or '')
-            style_text = (row.get('风格', '') or '')
-            user_input_text = (row.get('用户输入内容', '') or '')
-            style_name = clean_text(row.get('风格名称', ''))
-            example_image = clean_text(row.get('风格示例图', ''))
-            
-            # 如果没有风格名称，尝试从风格文本中提取
-            if not style_name and style_text:
-                style_name = extract_style_name(style_text)
-            
-            # 解析基本要求
-            requirements = parse_requirements(requirements_text)
-            
-            # 解析风格详情
-            style_details = parse_style_details(style_text)
-            
-            # 解析用户输入
-            user_inputs = parse_user_inputs(user_input_text)
-            
-            # 构建模板对象
-            template = {
-                "id": f"style_{row_num - 1}",
-                "name": style_name or f"风格_{row_num - 1}",
-                "description": style_details.get('设计风格', ''),
-                "prompt_template": prompt,
-                "requirements": requirements,
-                "style_details": style_details,
-                "user_inputs": user_inputs,
-                "example_image": example_image,
-                "variables": ["title", "author"],
-                "category": "小红书封面",
-                "priority": row_num - 1
-            }
-            
-            templates.append(template)
-    
-    # 构建最终的JSON结构
-    result = {
-        "project_info": {
+def row_hash(row: Dict[str, Optional[str]]) -> str:
+    """CSV 行内容的哈希，作为构建缓存的键"""
+    digest = hashlib.sha256()
+    for column in CSV_COLUMNS:
+        digest.update((row.get(column) or '').encode('utf-8'))
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+def template_version(template: Dict[str, Any]) -> str:
+    """模板的内容版本：提示词相关字段的哈希，字段不变时 version 不变"""
+    canonical = json.dumps({field: template.get(field) for field in VERSION_FIELDS},
+                           ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+def parse_row(row: Dict[str, Optional[str]]) -> Dict[str, Any]:
+    """解析一行 CSV 为模板内容（不含 id、priority 等与行位置有关的字段）"""
+    # 提取数据（保留原始换行，便于正则/分段解析）
+    prompt = clean_text(row.get('提示词', '') or '')
+    requirements_text = (row.get('基本要求', '') or '')
+    style_text = (row.get('风格', '') or '')
+    user_input_text = (row.get('用户输入内容', '') or '')
+    style_name = clean_text(row.get('风格名称', '') or '')
+    example_image = clean_text(row.get('风格示例图', '') or '')
+
+    # 如果没有风格名称，尝试从风格文本中提取
+    if not style_name and style_text:
+        style_name = extract_style_name(style_text)
+
+    style_details = parse_style_details(style_text)
+    return {
+        "name": style_name,
+        "description": style_details.get('设计风格', ''),
+        "prompt_template": prompt,
+        "requirements": parse_requirements(requirements_text),
+        "style_details": style_details,
+        "user_inputs": parse_user_inputs(user_input_text),
+        "example_image": example_image,
+        "variables": ["title", "author"],
+        "category": "小红书封面",
+    }
+
+def _indent_fragment(value: Any, prefix: str) -> str:
+    """按 indent=2 序列化对象并去掉首尾括号，每行加上 prefix，用于拼接输出文件"""
+    lines = json.dumps(value, ensure_ascii=False, indent=2).split('\n')
+    return '\n'.join(prefix + line for line in lines[1:-1])
+
+def compile_row(row: Dict[str, Optional[str]]) -> Dict[str, Any]:
+    """
+    解析一行并预先计算 version 与序列化片段，结果按行哈希保存在构建缓存中
+
+    输出文件的大部分耗时在于带缩进的 JSON 序列化（只有纯 Python 实现），
+    缓存片段后未变化的行只需拼接字符串。
+    """
+    body = parse_row(row)
+    return {
+        'body': body,
+        'version': template_version(body),
+        'json': _indent_fragment(body, '    '),
+    }
+
+def render_templates_json(project_info: Dict[str, Any], templates: List[Dict[str, Any]],
+                          fragments: List[Optional[str]]) -> str:
+    """
+    拼接 templates.json 的内容，结果与 json.dumps(result, ensure_ascii=False, indent=2) 完全一致
+
+    fragments[i] 为第 i 个模板除 id、priority 之外字段的序列化片段，为None时现场序列化。
+    """
+    if not templates:
+        return json.dumps({"project_info": project_info, "templates": [], "total_templates": 0},
+                          ensure_ascii=False, indent=2)
+    items = []
+    for template, fragment in zip(templates, fragments):
+        if fragment is None:
+            items.append('    ' + json.dumps(template, ensure_ascii=False, indent=2).replace('\n', '\n    '))
+            continue
+        items.append(
+            '    {\n'
+            f'      "id": {json.dumps(template["id"], ensure_ascii=False)},\n'
+            f'{fragment},\n'
+            f'      "priority": {template["priority"]}\n'
+            '    }'
+        )
+    return (
+        '{\n'
+        f'  "project_info": {json.dumps(project_info, ensure_ascii=False, indent=2).replace(chr(10), chr(10) + "  ")},\n'
+        '  "templates": [\n'
+        + ',\n'.join(items) +
+        '\n  ],\n'
+        f'  "total_templates": {len(templates)}\n'
+        '}'
+    )
+
+def iter_rows(csv_text: str) -> Iterator[Tuple[int, Dict[str, Optional[str]]]]:
+    """逐行解析 CSV 文本，跳过空行，返回 (行号, 行)"""
+    for row_num, row in enumerate(csv.DictReader(io.StringIO(csv_text, newline='')), start=2):
+        if any(row.values()):
+            yield row_num, row
+
+def read_bytes(path: str) -> Optional[bytes]:
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+def load_build_cache(path: str, with_rows: bool = True) -> Dict[str, Any]:
+    """
+    读取构建缓存，不可用时返回空缓存
+
+    缓存为 marshal 格式（加载远快于同等大小的 JSON），依次存放头部（哈希、id、各模板的 version）
+    与各行的解析结果；with_rows 为 False 时只读取头部，用于判断是否无需重新构建。
+    """
+    try:
+        with open(path, 'rb') as f:
+            cache = marshal.load(f)
+            if isinstance(cache, dict) and cache.get('format') == BUILD_CACHE_FORMAT:
+                cache['rows'] = marshal.load(f) if with_rows else {}
+                return cache
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    return {'format': BUILD_CACHE_FORMAT, 'rows': {}}
+
+def save_build_cache(path: str, header: Dict[str, Any], rows: Dict[str, Dict[str, Any]]) -> None:
+    atomic_write(path, marshal.dumps(header, 4) + marshal.dumps(rows, 4))
+
+def atomic_write(path: str, data: bytes) -> None:
+    """先写同目录临时文件再替换，读取方不会看到写了一半的文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+def assign_id(name: str, digest: str, previous_ids: Dict[str, str], used: set) -> str:
+    """按名称沿用已有 id；新模板的 id 由名称派生（无名称时由行内容派生）"""
+    candidate = previous_ids.get(name) if name else None
+    if not candidate or candidate in used:
+        seed = name or digest
+        candidate = f"style_{hashlib.sha256(seed.encode('utf-8')).hexdigest()[:8]}"
+        if candidate in used:
+            candidate = f"style_{digest[:12]}"
+    used.add(candidate)
+    return candidate
+
+def write_bundle(json_file_path: str, bundle_file_path: str) -> None:
+    """
+    由 templates.json 生成预编译模板包，供 serverless 冷启动时直接加载
+
+    模板包为 marshal 格式，包含模板列表、/styles 列表以及 templates.json 的内容哈希；
+    加载方发现哈希与当前 templates.json 不一致时会回退到解析 JSON。
+    """
+    with open(json_file_path, 'rb') as f:
+        raw = f.read()
+    templates = json.loads(raw.decode('utf-8'))['templates']
+    payload = {
+        'source_hash': hashlib.sha256(raw).hexdigest(),
+        'templates': templates,
+        'styles': [{
+            'id': t['id'],
+            'name': t['name'],
+            'description': t.get('description', ''),
+            'example_image': t.get('example_image', ''),
+        } for t in templates],
+    }
+    atomic_write(bundle_file_path, BUNDLE_MAGIC + marshal.dumps(payload, 4))
+    print(f"模板包: {bundle_file_path}")
+
+def _content(template: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in template.items() if k not in _POSITIONAL_FIELDS and k != 'version'}
+
+def convert_csv_to_json(csv_file_path: str, json_file_path: str, bundle_file_path: str = '',
+                        cache_file_path: str = '', incremental: bool = True,
+                        force: bool = False) -> Dict[str, List[str]]:
+    """
+    将CSV文件转换为JSON格式
+
+    构建缓存记录每行的解析结果与序列化片段、上次输出的 id 与各模板的 version 以及输入输出的哈希：
+    CSV 与输出都未变化时直接返回；否则只解析内容变化的行，其余行复用缓存。
+
+    Args:
+        csv_file_path: 提示词 CSV 路径
+        json_file_path: 输出的 templates.json 路径
+        bundle_file_path: 预编译模板包路径，为空时不生成
+        cache_file_path: 构建缓存路径，默认为 json_file_path 同目录下的 .templates_build_cache
+        incremental: 为 False 时忽略构建缓存，全部重新解析
+        force: templates.json 不是上次构建的输出且其中的模板与 CSV 生成的内容不同时，
+               默认抛出 HandEditError 而不覆盖（手工修改应先同步到 CSV）；为 True 时直接覆盖
+
+    Returns:
+        {'added': [...], 'changed': [...], 'removed': [...]}：version 发生变化的模板 id，
+        可据此只失效这些风格的缓存
+    """
+    started = time.perf_counter()
+    if not cache_file_path:
+        cache_file_path = os.path.join(os.path.dirname(os.path.abspath(json_file_path)),
+                                       '.templates_build_cache')
+
+    csv_raw = read_bytes(csv_file_path)
+    if csv_raw is None:
+        raise FileNotFoundError(2, 'No such file', csv_file_path)
+    csv_hash = hashlib.sha256(csv_raw).hexdigest()
+    previous_raw = read_bytes(json_file_path)
+    output_hash = hashlib.sha256(previous_raw).hexdigest() if previous_raw is not None else ''
+
+    cache = load_build_cache(cache_file_path, with_rows=False) if incremental else {}
+    output_known = bool(output_hash) and cache.get('output_hash') == output_hash
+    if (output_known and cache.get('csv_hash') == csv_hash
+            and (not bundle_file_path or os.path.exists(bundle_file_path))):
+        print(f"无变化（{(time.perf_counter() - started) * 1000:.1f}ms）: {json_file_path}")
+        return {'added': [], 'changed': [], 'removed': []}
+    cached_rows: Dict[str, Dict[str, Any]] = load_build_cache(cache_file_path)['rows'] if incremental else {}
+
+    # 上次的输出就是缓存记录的那份时直接使用缓存中的 id 与 version，否则（手工编辑过等）解析输出文件
+    if output_known:
+        project_info = cache['project_info']
+        previous_ids: Dict[str, str] = cache['ids']
+        previous_versions: Dict[str, Optional[str]] = cache['versions']
+        previous_templates: Dict[str, Dict[str, Any]] = {}
+    else:
+        previous = {}
+        if previous_raw is not None:
+            try:
+                previous = json.loads(previous_raw.decode('utf-8'))
+            except ValueError:
+                pass
+        project_info = previous.get('project_info')
+        previous_templates = {t['id']: t for t in previous.get('templates', [])}
+        previous_ids = {}
+        previous_versions = {}
+        for t in previous.get('templates', []):
+            previous_ids.setdefault(t.get('name', ''), t['id'])
+            previous_versions[t['id']] = template_version(t)
+    if not project_info:
+        project_info = {
             "name": "小红书封面生成器",
             "description": "基于DeepSeek AI的小红书封面自动生成工具",
             "version": "1.0.0",
             "created_at": "2024-01-01"
-        },
-        "templates": templates,
-        "total_templates": len(templates)
+        }
+
+    templates = []
+    versions: Dict[str, str] = {}
+    fragments: List[Optional[str]] = []
+    rows: Dict[str, Dict[str, Any]] = {}
+    used_ids: set = set()
+    parsed = reused = 0
+
+    for row_num, row in iter_rows(csv_raw.decode('utf-8')):
+        digest = row_hash(row)
+        entry = cached_rows.get(digest)
+        if entry is None:
+            entry = compile_row(row)
+            parsed += 1
+        else:
+            reused += 1
+        rows[digest] = entry
+        body = entry['body']
+
+        template_id = assign_id(body['name'], digest, previous_ids, used_ids)
+        template = {
+            "id": template_id,
+            **body,
+            "name": body['name'] or f"风格_{len(templates) + 1}",
+            "priority": len(templates) + 1,
+        }
+        templates.append(template)
+        versions[template_id] = entry['version']
+        # 名称为空时使用了按位置生成的名称，缓存的片段不适用
+        fragments.append(entry['json'] if body['name'] else None)
+
+    changes = {
+        'added': [t['id'] for t in templates if t['id'] not in previous_versions],
+        'changed': [t['id'] for t in templates if t['id'] in previous_versions
+                    and previous_versions[t['id']] != versions[t['id']]],
+        'removed': [tid for tid in previous_versions if tid not in used_ids],
     }
-    
-    # 保存JSON文件
-    with open(json_file_path, 'w', encoding='utf-8') as jsonfile:
-        json.dump(result, jsonfile, ensure_ascii=False, indent=2)
-    
-    print(f"转换完成！")
+
+    # 无法确认 templates.json 由上次构建生成（手工编辑过或没有构建缓存）时，
+    # 与 CSV 结果不同的模板可能包含只存在于 JSON 中的修改，不直接覆盖
+    edited = [t['id'] for t in templates
+              if t['id'] in previous_templates and _content(previous_templates[t['id']]) != _content(t)]
+    if edited and not force:
+        raise HandEditError(
+            f"{json_file_path} 中的模板与 CSV 生成的内容不同，可能包含手工修改: {', '.join(edited)}；"
+            "请先把修改同步到 CSV，或确认以 CSV 为准后加 --force 重新生成"
+        )
+
+    # 内容未变化时不重写，文件的 mtime 不变，服务端也就不会重新加载
+    data = render_templates_json(project_info, templates, fragments).encode('utf-8')
+    unchanged = data == previous_raw
+    if not unchanged:
+        atomic_write(json_file_path, data)
+
+    ids: Dict[str, str] = {}
+    for t in templates:
+        ids.setdefault(t['name'], t['id'])
+    save_build_cache(cache_file_path, {
+        'format': BUILD_CACHE_FORMAT,
+        'csv_hash': csv_hash,
+        'output_hash': hashlib.sha256(data).hexdigest(),
+        'project_info': project_info,
+        'ids': ids,
+        'versions': versions,
+    }, rows)
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"转换完成！（{elapsed_ms:.1f}ms，解析 {parsed} 行，复用 {reused} 行）")
     print(f"CSV文件: {csv_file_path}")
-    print(f"JSON文件: {json_file_path}")
+    print(f"JSON文件: {json_file_path}{'（无变化）' if unchanged else ''}")
     print(f"共转换了 {len(templates)} 个模板")
+    for kind, label in (('added', '新增'), ('changed', '内容变化'), ('removed', '删除')):
+        if changes[kind]:
+            print(f"{label}: {', '.join(changes[kind])}")
+
+    if bundle_file_path and (not unchanged or not os.path.exists(bundle_file_path)):
+        write_bundle(json_file_path, bundle_file_path)
+    return changes
 
 if __name__ == "__main__":
-    csv_file = "小红书封面生成提示词.csv"
-    json_file = "templates.json"
-    
+    parser = argparse.ArgumentParser(description='将提示词CSV转换为 templates.json 与预编译模板包')
+    parser.add_argument('--csv', default="小红书封面生成提示词.csv")
+    parser.add_argument('--json', default="templates.json")
+    parser.add_argument('--bundle', default="templates.bundle", help='预编译模板包路径，为空时不生成')
+    parser.add_argument('--bundle-only', action='store_true', help='只由现有 templates.json 重新生成模板包')
+    parser.add_argument('--full', action='store_true', help='忽略构建缓存，重新解析全部行')
+    parser.add_argument('--force', action='store_true', help='templates.json 含有手工修改时仍以 CSV 为准覆盖')
+    args = parser.parse_args()
+
     try:
-        convert_csv_to_json(csv_file, json_file)
-    except FileNotFoundError:
-        print(f"错误：找不到文件 {csv_file}")
+        if args.bundle_only:
+            write_bundle(args.json, args.bundle)
+        else:
+            convert_csv_to_json(args.csv, args.json, args.bundle, incremental=not args.full, force=args.force)
+    except FileNotFoundError as e:
+        print(f"错误：找不到文件 {e.filename}")
     except Exception as e:
         print(f"转换过程中出现错误：{e}")
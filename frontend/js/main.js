@@ -9,15 +9,46 @@ window.App = (function () {
     return res.json();
   }
 
-  async function generate(payload) {
-    const endpoint = (window.useAI ? '/generate/ai' : '/generate/preview');
-    const res = await fetch(`${apiBase}${endpoint}`, {
+  // 预览走 GET 并直接返回HTML，浏览器凭 ETag 回源校验，内容未变时服务端只回 304
+  async function fetchPreview(payload) {
+    const params = new URLSearchParams(payload);
+    const res = await fetch(`${apiBase}/generate/preview?${params}`);
+    if (!res.ok) throw new Error('生成失败');
+    return res.text();
+  }
+
+  // 通过 SSE 流式接收AI生成的HTML，每收到一段调用一次 onDelta，结束时返回 done 事件（含最终HTML）
+  async function generateStream(payload, onDelta) {
+    const res = await fetch(`${apiBase}/generate/ai/stream`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify(payload)
     });
-    if (!res.ok) throw new Error('生成失败');
-    return res.json();
+    if (!res.ok || !res.body) throw new Error('生成失败');
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let sep;
+      while ((sep = buffer.indexOf('\n\n')) !== -1) {
+        const raw = buffer.slice(0, sep);
+        buffer = buffer.slice(sep + 2);
+        let event = 'message';
+        let data = '';
+        raw.split('\n').forEach(line => {
+          if (line.startsWith('event:')) event = line.slice(6).trim();
+          else if (line.startsWith('data:')) data += line.slice(5).trim();
+        });
+        const body = data ? JSON.parse(data) : {};
+        if (event === 'chunk') onDelta(body.delta || '');
+        else if (event === 'error') throw new Error(body.message || '生成失败');
+        else if (event === 'done') return body;
+      }
+    }
+    throw new Error('生成中断');
   }
 
   function fillStyleOptions(selectEl, styles) {
@@ -64,6 +95,22 @@ window.App = (function () {
     doc.close();
   }
 
+  // 流式写入预览：首段到达时打开文档，之后逐段追加
+  function createStreamingPreview() {
+    const iframe = document.getElementById('preview');
+    const doc = iframe.contentDocument || iframe.contentWindow.document;
+    let opened = false;
+    return {
+      write(html) {
+        if (!opened) { doc.open(); opened = true; }
+        doc.write(html);
+      },
+      close() {
+        if (opened) doc.close();
+      }
+    };
+  }
+
   function showLoading() {
     const overlay = document.getElementById('loading-overlay');
     if (overlay) {
@@ -145,8 +192,23 @@ window.App = (function () {
       showLoading();
       
       try {
-        const { html } = await generate(payload);
-        setPreview(html);
+        if (window.useAI) {
+          const preview = createStreamingPreview();
+          let result;
+          try {
+            result = await generateStream(payload, delta => {
+              // 首段内容到达即可关闭loading，后续内容边生成边显示
+              hideLoading();
+              preview.write(delta);
+            });
+          } finally {
+            preview.close();
+          }
+          // 完成后换成后处理过的最终HTML，导出与复制得到的和缓存内容一致
+          if (result.html) setPreview(result.html);
+        } else {
+          setPreview(await fetchPreview(payload));
+        }
       } catch (err) {
         console.error(err);
         alert('生成失败');
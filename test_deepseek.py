@@ -2,6 +2,7 @@
 """
 测试 DeepSeek API 连接和响应的脚本
 """
+import asyncio
 import os
 import sys
 import json
@@ -11,7 +12,7 @@ from pathlib import Path
 backend_path = Path(__file__).parent / 'backend'
 sys.path.insert(0, str(backend_path))
 
-from services.deepseek_service import DeepSeekClient, generate_cover_html
+from services.deepseek_service import DeepSeekClient, generate_cover_html, shutdown_deepseek_client
 
 def test_deepseek_client():
     """测试 DeepSeek 客户端基本功能"""
@@ -31,7 +32,7 @@ def test_deepseek_client():
         ]
         
         print("\n发送测试请求...")
-        response = client.chat(messages, max_tokens=50)
+        response = asyncio.run(client.chat(messages, max_tokens=50))
         print(f"✓ API 响应成功: {response}")
         
         return True
@@ -88,7 +89,13 @@ def test_cover_generation():
         print(f"作者: {author}")
         
         # 生成封面
-        html_content = generate_cover_html(title, author, template)
+        async def run():
+            try:
+                return await generate_cover_html(title, author, template)
+            finally:
+                await shutdown_deepseek_client()
+
+        html_content = asyncio.run(run())
         
         print(f"✓ 封面生成成功")
         print(f"  - HTML 长度: {len(html_content)} 字符")
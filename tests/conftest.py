@@ -0,0 +1,80 @@
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import AsyncIterator, List, Optional
+
+import pytest
+
+# services 以 backend 目录为根导入（与 app.py、api/index.py 相同）
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+# 全局缓存实例在导入时创建目录，避免在工作目录下留下 cache/
+os.environ.setdefault('CACHE_DIR', tempfile.mkdtemp(prefix='xhs-cover-test-'))
+
+
+class FakeDeepSeekClient:
+    """代替 DeepSeekClient：按标题返回带代码围栏的HTML，记录调用次数"""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.delay = 0.0
+        self.error: Optional[Exception] = None
+        self.chunk_size = 8
+        self.started = asyncio.Event()
+
+    def _html(self, messages: List[dict]) -> str:
+        title = messages[-1]['content'].split('- 标题：', 1)[1].split('\n', 1)[0]
+        return f"```html\n<html><body><h1>{title}</h1><p>第{self.calls}次生成</p></body></html>\n```"
+
+    async def chat(self, messages: List[dict], style_id: str = '', **kwargs) -> str:
+        self.calls += 1
+        self.started.set()
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self._html(messages)
+
+    async def stream_chat(self, messages: List[dict], style_id: str = '', **kwargs) -> AsyncIterator[str]:
+        self.calls += 1
+        self.started.set()
+        if self.error is not None:
+            raise self.error
+        html = self._html(messages)
+        for i in range(0, len(html), self.chunk_size):
+            await asyncio.sleep(self.delay / 4)
+            yield html[i:i + self.chunk_size]
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """每个测试独立的缓存服务与熔断器，替换各模块引用的全局实例"""
+    import services.batch_service as batch_module
+    import services.cache_service as cache_module
+    import services.cache_warmer as warmer_module
+    import services.deepseek_service as deepseek_module
+    from services.circuit_breaker import CircuitBreaker
+
+    service = cache_module.CacheService(str(tmp_path / 'cache'), memory_max_bytes=1 << 20)
+    for module in (cache_module, batch_module, warmer_module):
+        monkeypatch.setattr(module, 'cache_service', service)
+    monkeypatch.setattr(deepseek_module, 'upstream_breaker', CircuitBreaker(failure_threshold=3, reset_timeout=60))
+    return service
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    import services.deepseek_service as deepseek_module
+
+    client = FakeDeepSeekClient()
+    monkeypatch.setattr(deepseek_module, 'get_deepseek_client', lambda: client)
+    return client
+
+
+@pytest.fixture
+def style():
+    from services.template_registry import template_registry
+
+    template_registry.load()
+    return template_registry.all()[0]
@@ -0,0 +1,75 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(params=['backend', 'vercel'])
+def client(request):
+    # 两个入口共用 backend/routers 中的路由，行为应一致；不触发 startup，避免启动后台任务
+    if request.param == 'backend':
+        from app import app
+    else:
+        from api.index import app
+    return TestClient(app)
+
+
+def test_preview_etag_revalidation(client, style):
+    params = {'title': '标题', 'style_id': style['id']}
+    first = client.get('/generate/preview', params=params)
+    assert first.status_code == 200
+    assert first.headers['content-type'].startswith('text/html')
+    etag = first.headers['etag']
+
+    second = client.get('/generate/preview', params=params, headers={'If-None-Match': etag})
+    assert second.status_code == 304
+    assert second.content == b''
+
+    changed = client.get('/generate/preview', params={**params, 'title': '新标题'}, headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+
+    # POST 默认返回 JSON，ETag 与 GET 相同
+    posted = client.post('/generate/preview', json=params)
+    assert posted.headers['etag'] == etag
+    assert posted.json()['html'] == first.text
+
+
+def test_styles_etag(client, style):
+    first = client.get('/styles')
+    assert any(s['id'] == style['id'] for s in first.json())
+    assert client.get('/styles', headers={'If-None-Match': first.headers['etag']}).status_code == 304
+
+
+def test_unknown_style(client):
+    response = client.post('/generate/ai', json={'title': '标题', 'style_id': 'missing'})
+    assert response.status_code == 404
+    assert response.json()['error']['code'] == 'STYLE_NOT_FOUND'
+
+
+def test_stream_events(client, cache, upstream, style):
+    response = client.post('/generate/ai/stream', json={'title': '流式', 'style_id': style['id']})
+    assert response.headers['content-type'].startswith('text/event-stream')
+    events = []
+    for block in response.text.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    assert {event for event, _ in events[:-1]} == {'chunk'}
+    assert ''.join(data['delta'] for _, data in events[:-1]).startswith('<html>')
+    event, done = events[-1]
+    assert event == 'done'
+    assert done['html'] == cache.get('流式', '', style['id'])
+
+
+def test_vercel_entry_defers_ai_modules(tmp_path):
+    # 在全新解释器中导入入口，AI生成相关模块不应被加载
+    code = ("import sys, api.index; "
+            "print([m for m in ('httpx', 'services.deepseek_service', 'services.cache_service') if m in sys.modules])")
+    result = subprocess.run([sys.executable, '-c', code], cwd=str(ROOT), capture_output=True, text=True, check=True,
+                            env={'CACHE_DIR': str(tmp_path)})
+    assert result.stdout.strip() == '[]'
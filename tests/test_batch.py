@@ -0,0 +1,72 @@
+import asyncio
+
+from services.batch_service import generate_batch
+from services.deepseek_service import DeepSeekError
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def collect(items, concurrency=None):
+    return [result async for result in generate_batch(items, concurrency)]
+
+
+def item(title: str, style_id: str, author: str = '') -> dict:
+    return {'title': title, 'author': author, 'style_id': style_id}
+
+
+def test_duplicates_generated_once(cache, upstream, style):
+    items = [item('甲', style['id']), item('乙', style['id']), item('甲', style['id'])]
+    results = {r['title']: r for r in run(collect(items))}
+    assert results['甲']['indexes'] == [0, 2]
+    assert results['乙']['indexes'] == [1]
+    assert all(r['status'] == 'ok' and not r['cached'] for r in results.values())
+    assert upstream.calls == 2
+    assert results['甲']['html'] == cache.get('甲', '', style['id'])
+
+
+def test_cached_and_unknown_style(cache, upstream, style):
+    cache.set('已缓存', '', style['id'], '<p>cached</p>')
+    results = run(collect([item('已缓存', style['id']), item('标题', 'missing')]))
+    assert results[0] == {**item('已缓存', style['id']), 'indexes': [0], 'status': 'ok', 'cached': True,
+                          'html': '<p>cached</p>', 'cache_key': cache.cache_key('已缓存', '', style['id'])}
+    assert results[1]['status'] == 'error'
+    assert results[1]['error']['code'] == 'STYLE_NOT_FOUND'
+    assert upstream.calls == 0
+
+
+def test_concurrency_is_bounded(cache, upstream, style):
+    active, peak = 0, 0
+    chat = upstream.chat
+
+    async def tracked(messages, **kwargs):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        try:
+            return await chat(messages, **kwargs)
+        finally:
+            active -= 1
+
+    upstream.chat = tracked
+    upstream.delay = 0.02
+    results = run(collect([item(f"标题{i}", style['id']) for i in range(6)], concurrency=2))
+    assert len(results) == 6
+    assert upstream.calls == 6
+    assert peak == 2
+
+
+def test_failure_only_affects_its_item(cache, upstream, style):
+    chat = upstream.chat
+
+    async def flaky(messages, **kwargs):
+        if '- 标题：坏\n' in messages[-1]['content']:
+            raise DeepSeekError('boom', retryable=False)
+        return await chat(messages, **kwargs)
+
+    upstream.chat = flaky
+    results = {r['title']: r for r in run(collect([item('好', style['id']), item('坏', style['id'])]))}
+    assert results['好']['status'] == 'ok'
+    assert results['坏']['status'] == 'error'
+    assert results['坏']['error']['code'] == 'AI_GENERATE_FAILED'
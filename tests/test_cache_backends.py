@@ -0,0 +1,191 @@
+import hashlib
+import json
+import threading
+import time
+
+import pytest
+
+from services.cache_backends import JsonDirBackend, MemoryBackend, SQLiteBackend, migrate
+from services.compression import compress, decompress
+
+
+def record(style_id: str = 'style_1', digest: str = '', html: str = '', **extra):
+    data = {'timestamp': time.time(), 'title': '标题', 'author': '', 'style_id': style_id, **extra}
+    if digest:
+        data.update(blob=digest, size=len(html.encode('utf-8')))
+    else:
+        data['html'] = html
+    return data
+
+
+def write_html(backend, key: str, html: str, style_id: str = 'style_1') -> str:
+    codec, data = compress(html, 'gzip')
+    digest = hashlib.sha256(html.encode('utf-8')).hexdigest()
+    backend.write(key, record(style_id, digest, html), (codec, data, len(html.encode('utf-8'))))
+    return digest
+
+
+@pytest.fixture(params=['json', 'sqlite', 'memory'])
+def backend(request, tmp_path):
+    if request.param == 'json':
+        return JsonDirBackend(tmp_path / 'cache')
+    if request.param == 'sqlite':
+        return SQLiteBackend(tmp_path / 'cache.db')
+    return MemoryBackend()
+
+
+def test_read_write_delete(backend):
+    backend.write('a', record(html='<p>a</p>'))
+    assert backend.read('a')['html'] == '<p>a</p>'
+    assert backend.read('missing') is None
+    assert backend.delete('a')
+    assert not backend.delete('a')
+    assert backend.read('a') is None
+
+
+def test_delete_older_than_and_count(backend):
+    now = time.time()
+    backend.write('old', record(html='<p>old</p>', timestamp=now - 100))
+    backend.write('new', record(html='<p>new</p>', timestamp=now))
+    counts = backend.count(now - 50)
+    assert (counts['total'], counts['valid'], counts['expired']) == (2, 1, 1)
+    assert backend.delete_older_than(now - 50) == 1
+    assert [key for key, _ in backend.items()] == ['new']
+    assert backend.clear() == 1
+    assert backend.count(0)['total'] == 0
+
+
+def test_failure_records(backend):
+    now = time.time()
+    backend.write_failure('a', {'timestamp': now, 'expires_at': now + 30, 'failures': 1, 'error': 'boom'})
+    backend.write_failure('b', {'timestamp': now - 100, 'expires_at': now - 70, 'failures': 3, 'error': 'old'})
+    assert backend.read_failure('a')['error'] == 'boom'
+    assert backend.count_failures(now) == 1
+    assert backend.clear_failures(now - 50) == 1
+    assert backend.read_failure('b') is None
+    backend.delete_failure('a')
+    assert backend.read_failure('a') is None
+
+
+def test_shared_blob_released_with_last_reference(backend):
+    digest = write_html(backend, 'a', '<p>same</p>')
+    write_html(backend, 'b', '<p>same</p>')
+    assert backend.blob_stats()['blobs'] == 1
+    backend.delete('a')
+    assert backend.get_blob(digest) is not None
+    backend.delete('b')
+    assert backend.get_blob(digest) is None
+
+
+def test_overwrite_releases_old_blob(backend):
+    old = write_html(backend, 'a', '<p>v1</p>')
+    new = write_html(backend, 'a', '<p>v2</p>')
+    assert backend.get_blob(old) is None
+    assert decompress(*backend.get_blob(new)) == '<p>v2</p>'
+
+
+def test_style_entries(backend):
+    write_html(backend, 'a', '<p>a</p>', 'style_1')
+    write_html(backend, 'b', '<p>b</p>', 'style_2')
+    write_html(backend, 'c', '<p>c</p>', 'style_1')
+    assert [key for key, _ in backend.style_entries('style_1')] == ['a', 'c']
+    backend.delete('a')
+    assert [key for key, _ in backend.style_entries('style_1')] == ['c']
+
+
+def test_migrate_json_to_sqlite(tmp_path):
+    source = JsonDirBackend(tmp_path / 'cache')
+    shared = write_html(source, 'a', '<p>shared</p>')
+    write_html(source, 'b', '<p>shared</p>')
+    write_html(source, 'c', '<p>other</p>', 'style_2')
+    source.write('legacy', record(html='<p>inline</p>'))
+
+    target = SQLiteBackend(tmp_path / 'cache' / 'cache.db')
+    assert migrate(source, target) == 4
+    assert target.count(0)['total'] == 4
+    assert target.blob_stats()['blobs'] == 2
+    assert target.read('legacy')['html'] == '<p>inline</p>'
+    assert decompress(*target.get_blob(target.read('a')['blob'])) == '<p>shared</p>'
+
+    # 迁移后的引用计数正确：两个引用都删除后内容块才被回收
+    target.delete('a')
+    assert target.get_blob(shared) is not None
+    target.delete('b')
+    assert target.get_blob(shared) is None
+
+
+def test_migrate_skips_records_with_missing_blob(tmp_path):
+    source = MemoryBackend()
+    source.write('orphan', record(digest='missing', html='x'))
+    target = SQLiteBackend(tmp_path / 'cache.db')
+    assert migrate(source, target) == 0
+    assert target.read('orphan') is None
+
+
+def test_json_style_index_reads_only_that_style(tmp_path):
+    backend = JsonDirBackend(tmp_path / 'cache')
+    for i in range(20):
+        write_html(backend, f'other{i}', f'<p>{i}</p>', 'style_2')
+    write_html(backend, 'a', '<p>a</p>', 'style_1')
+    loaded = []
+    load = backend._load
+    backend._load = lambda cache_file: loaded.append(cache_file.stem) or load(cache_file)
+    assert [key for key, _ in backend.style_entries('style_1')] == ['a']
+    assert loaded == ['a']
+
+
+def test_json_style_index_shared_between_workers(tmp_path):
+    worker_a = JsonDirBackend(tmp_path / 'cache')
+    worker_b = JsonDirBackend(tmp_path / 'cache')
+    write_html(worker_a, 'a', '<p>a</p>', 'style_1')
+    assert [key for key, _ in worker_b.style_entries('style_1')] == ['a']
+    # 同一键改写为其他风格后从原风格的索引中移除
+    write_html(worker_b, 'a', '<p>a</p>', 'style_2')
+    assert worker_a.style_entries('style_1') == []
+    assert [key for key, _ in worker_a.style_entries('style_2')] == ['a']
+
+
+def test_json_style_index_built_for_existing_records(tmp_path):
+    cache_dir = tmp_path / 'cache'
+    cache_dir.mkdir()
+    (cache_dir / 'legacy.json').write_text(
+        json.dumps(record('style_1', html='<p>legacy</p>')), encoding='utf-8')
+    backend = JsonDirBackend(cache_dir)
+    assert [key for key, _ in backend.style_entries('style_1')] == ['legacy']
+
+
+def test_json_style_index_prunes_removed_records(tmp_path):
+    backend = JsonDirBackend(tmp_path / 'cache')
+    write_html(backend, 'a', '<p>a</p>', 'style_1')
+    (tmp_path / 'cache' / 'a.json').unlink()
+    assert backend.style_entries('style_1') == []
+    assert not any((tmp_path / 'cache' / 'styles' / 'style_1').iterdir())
+
+
+def test_json_clear_removes_index_and_blobs(tmp_path):
+    backend = JsonDirBackend(tmp_path / 'cache')
+    write_html(backend, 'a', '<p>a</p>', 'style_1')
+    assert backend.clear() == 1
+    assert backend.style_entries('style_1') == []
+    assert backend.blob_stats()['blobs'] == 0
+    digest = write_html(backend, 'b', '<p>b</p>', 'style_1')
+    assert backend.get_blob(digest) is not None
+    assert [key for key, _ in backend.style_entries('style_1')] == ['b']
+
+
+def test_json_clear_during_writes_leaves_no_dangling_records(tmp_path):
+    backend = JsonDirBackend(tmp_path / 'cache')
+
+    def writer(worker: int) -> None:
+        for i in range(30):
+            write_html(backend, f'{worker}-{i}', f'<p>{worker}-{i}</p>')
+
+    threads = [threading.Thread(target=writer, args=(worker,)) for worker in range(3)]
+    for thread in threads:
+        thread.start()
+    for _ in range(5):
+        backend.clear()
+    for thread in threads:
+        thread.join()
+    for key, stored in backend.items():
+        assert backend.get_blob(stored['blob']) is not None, key
@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+from services.batch_service import generate_batch
+from services.cache_warmer import CacheWarmer, prewarm_items
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def collect(items):
+    return [result async for result in generate_batch(items, 4)]
+
+
+def test_peek_does_not_record(cache):
+    cache.set('标题', '', 'style_1', '<p>a</p>')
+    key = cache.cache_key('标题', '', 'style_1')
+    assert cache.get('标题', '', 'style_1', record=False) == '<p>a</p>'
+    assert cache.lookup('缺失', '', 'style_1', record=False) is None
+    stats = cache.get_cache_stats()
+    assert stats['lookups']['memory'] == {'hit': 0, 'miss': 0}
+    assert stats['lookups']['disk'] == {'hit': 0, 'stale': 0, 'miss': 0}
+    assert stats['memory']['hits'] == 0
+    assert cache.popularity.count(key) == 0
+
+
+def test_batch_counts_each_item_once(cache, upstream, style):
+    items = [{'title': '新标题', 'author': '', 'style_id': style['id']}] * 2
+    results = run(collect(items))
+    assert [r['status'] for r in results] == ['ok']
+    assert results[0]['indexes'] == [0, 1]
+    assert upstream.calls == 1
+
+    key = cache.cache_key('新标题', '', style['id'])
+    assert cache.popularity.count(key) == 1
+    lookups = cache.get_cache_stats()['lookups']
+    assert lookups['memory']['miss'] == 1
+    assert lookups['disk']['miss'] == 1
+
+
+def test_prewarm_jobs_do_not_touch_popularity(cache, upstream, style, tmp_path):
+    from services.job_queue import JobQueue
+
+    async def scenario():
+        queue = JobQueue(str(tmp_path / 'jobs.db'), workers=1, poll_interval=0.01)
+        await queue.start()
+        try:
+            job_id = queue.submit('预热标题', '', style['id'], prewarm=True)
+            return await queue.wait(job_id, 5)
+        finally:
+            await queue.stop()
+
+    assert run(scenario())['status'] == 'done'
+    assert cache.popularity.count(cache.cache_key('预热标题', '', style['id'])) == 0
+    assert cache.get_cache_stats()['lookups']['disk']['miss'] == 0
+
+
+def test_warmer_refreshes_hot_entries_close_to_expiry(cache, upstream, style):
+    warmer = CacheWarmer(rate=0, refresh_ahead=0.2, min_count=1)
+    for title in ('快过期', '刚写入', '已丢失'):
+        cache.popularity.record(cache.cache_key(title, '', style['id']), title, '', style['id'])
+    cache.set('快过期', '', style['id'], '<p>old</p>')
+    cache.set('刚写入', '', style['id'], '<p>new</p>')
+    key = cache.cache_key('快过期', '', style['id'])
+    record = cache.backend.read(key)
+    record['timestamp'] = time.time() - cache.cache_ttl * 0.9
+    cache.backend.write(key, record)
+
+    assert run(warmer.run_once()) == 2
+    assert upstream.calls == 2
+    assert '快过期' in cache.get('快过期', '', style['id'])
+    assert '已丢失' in cache.get('已丢失', '', style['id'])
+    assert cache.get('刚写入', '', style['id']) == '<p>new</p>'
+
+
+def test_warmer_skips_entries_another_worker_refreshed(cache, upstream, style):
+    warmer = CacheWarmer(rate=0, min_count=1)
+    cache.popularity.record(cache.cache_key('标题', '', style['id']), '标题', '', style['id'])
+    # 判断需要刷新之后、拿到生成锁之前，其他 worker 已经写入
+    warmer._needs_refresh = lambda cache_key, now: True
+    cache.set('标题', '', style['id'], '<p>fresh</p>')
+    run(warmer.run_once())
+    assert upstream.calls == 0
+    assert cache.get('标题', '', style['id']) == '<p>fresh</p>'
+
+
+def test_prewarm_items_expand_titles_and_styles():
+    items = prewarm_items(['一', ' ', '二'], '作者', ['a', 'b'])
+    assert [(i['title'], i['style_id']) for i in items] == [('一', 'a'), ('一', 'b'), ('二', 'a'), ('二', 'b')]
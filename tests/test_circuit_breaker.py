@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+def open_breaker(**kwargs) -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.0, **kwargs)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.state == 'closed' and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+    assert breaker.rejected == 1
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+
+
+def test_half_open_allows_single_trial():
+    breaker = open_breaker()
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
+    assert not breaker.allow()
+
+
+def test_half_open_trial_success_closes():
+    breaker = open_breaker()
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.allow() and breaker.allow()
+
+
+def test_half_open_trial_failure_reopens():
+    breaker = open_breaker()
+    breaker.reset_timeout = 60
+    breaker.opened_at = time.monotonic() - 61
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+
+
+def test_trial_released_when_call_ends_without_outcome():
+    breaker = open_breaker()
+    with pytest.raises(RuntimeError):
+        with breaker.trial():
+            raise RuntimeError('client disconnected')
+    assert breaker.state == 'half_open'
+    assert breaker.allow()
+
+
+def test_trial_context_rejects_when_open():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        with breaker.trial():
+            pass
+
+
+def test_closed_call_does_not_release_another_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    with breaker.trial():
+        # 调用进行中熔断器打开，随后另一个请求占用了试探名额
+        breaker.record_failure()
+        assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_stuck_trial_expires():
+    breaker = open_breaker(trial_timeout=0.05)
+    assert breaker.allow()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+
+def test_late_failures_do_not_extend_open_period():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    opened_at = breaker.opened_at
+    # 熔断前发出的调用在打开之后才陆续失败
+    time.sleep(0.01)
+    breaker.record_failure()
+    assert breaker.opened_at == opened_at
+    breaker.opened_at -= 61
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
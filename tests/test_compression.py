@@ -0,0 +1,42 @@
+import pytest
+
+from services.cache_service import CacheService
+from services.compression import accepts, compress, decompress
+
+
+def test_gzip_roundtrip_is_deterministic():
+    html = '<p>小红书封面</p>' * 50
+    codec, data = compress(html, 'gzip')
+    assert codec == 'gzip'
+    assert compress(html, 'gzip') == (codec, data)
+    assert len(data) < len(html.encode('utf-8'))
+    assert decompress(codec, data) == html
+
+
+def test_unknown_codec_rejected():
+    with pytest.raises(ValueError):
+        decompress('br', b'')
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip, deflate, br', True),
+    ('GZIP', True),
+    ('*', True),
+    ('gzip;q=0, deflate', False),
+    ('', False),
+])
+def test_accepts(header, expected):
+    assert accepts(header, 'gzip') is expected
+
+
+def test_identical_html_stored_once(tmp_path):
+    cache = CacheService(str(tmp_path / 'cache'), memory_max_bytes=0)
+    cache.set('标题一', '', 'style_1', '<p>same</p>')
+    cache.set('标题二', '', 'style_1', '<p>same</p>')
+    stats = cache.get_cache_stats()['storage']
+    assert stats['blobs'] == 1
+    assert stats['logical_bytes'] == 2 * len('<p>same</p>')
+
+    key = cache.cache_key('标题一', '', 'style_1')
+    codec, data = cache.get_encoded(key)
+    assert decompress(codec, data) == '<p>same</p>'
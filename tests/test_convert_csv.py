@@ -0,0 +1,123 @@
+import csv
+import io
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from convert_csv_to_json import CSV_COLUMNS, HandEditError, convert_csv_to_json  # noqa: E402
+from services.template_registry import TemplateRegistry  # noqa: E402
+
+
+def row(name: str, prompt: str = '写一个封面') -> dict:
+    return {
+        '提示词': prompt,
+        '基本要求': '**尺寸**\n- 比例严格为3:4',
+        '风格': f"# {name}\n## 设计风格\n{name}的描述",
+        '用户输入内容': '- 封面文案：[]',
+        '风格名称': name,
+        '风格示例图': '',
+    }
+
+
+def write_csv(path, rows) -> None:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS)
+    writer.writeheader()
+    writer.writerows(rows)
+    path.write_text(buffer.getvalue(), encoding='utf-8')
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return tmp_path / 'prompts.csv', tmp_path / 'templates.json', tmp_path / 'templates.bundle'
+
+
+def convert(paths, **kwargs):
+    csv_path, json_path, bundle_path = paths
+    return convert_csv_to_json(str(csv_path), str(json_path), str(bundle_path), **kwargs)
+
+
+def load(json_path) -> dict:
+    return {t['name']: t for t in json.loads(json_path.read_text(encoding='utf-8'))['templates']}
+
+
+def test_ids_survive_inserted_rows(paths):
+    csv_path, json_path, _ = paths
+    write_csv(csv_path, [row('极简'), row('复古')])
+    convert(paths)
+    before = load(json_path)
+
+    write_csv(csv_path, [row('新风格'), row('极简'), row('复古')])
+    changes = convert(paths)
+    after = load(json_path)
+    assert after['极简']['id'] == before['极简']['id']
+    assert after['复古']['id'] == before['复古']['id']
+    assert after['极简']['priority'] == 2
+    assert changes == {'added': [after['新风格']['id']], 'changed': [], 'removed': []}
+
+
+def test_incremental_run_reports_only_changed_rows(paths):
+    csv_path, json_path, _ = paths
+    write_csv(csv_path, [row('极简'), row('复古')])
+    convert(paths)
+    os.utime(json_path, (1_000_000, 1_000_000))
+
+    # 输入未变化时不重写输出
+    assert convert(paths) == {'added': [], 'changed': [], 'removed': []}
+    assert json_path.stat().st_mtime == 1_000_000
+
+    write_csv(csv_path, [row('极简', '写一个新封面'), row('复古')])
+    changes = convert(paths)
+    assert changes == {'added': [], 'changed': [load(json_path)['极简']['id']], 'removed': []}
+
+
+def test_output_matches_json_dumps_and_bundle_loads(paths):
+    csv_path, json_path, bundle_path = paths
+    write_csv(csv_path, [row('极简'), row('复古')])
+    convert(paths)
+    text = json_path.read_text(encoding='utf-8')
+    data = json.loads(text)
+    assert text == json.dumps(data, ensure_ascii=False, indent=2)
+    assert all('version' not in t for t in data['templates'])
+
+    registry = TemplateRegistry(str(json_path), bundle_path=str(bundle_path))
+    registry.load()
+    assert registry.loaded_from == 'bundle'
+    assert [s['name'] for s in registry.list_styles()] == ['极简', '复古']
+
+
+def test_hand_edits_are_not_overwritten(paths):
+    csv_path, json_path, _ = paths
+    write_csv(csv_path, [row('极简'), row('复古')])
+    convert(paths)
+    data = json.loads(json_path.read_text(encoding='utf-8'))
+    data['templates'][0]['prompt_template'] = '手工修改'
+    json_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding='utf-8')
+
+    with pytest.raises(HandEditError):
+        convert(paths)
+    assert load(json_path)['极简']['prompt_template'] == '手工修改'
+
+    convert(paths, force=True)
+    assert load(json_path)['极简']['prompt_template'] == '写一个封面'
+
+
+def test_committed_templates_match_csv(tmp_path):
+    # 仓库中的 templates.json 应与转换脚本对当前 CSV 的输出完全一致
+    json_path = tmp_path / 'templates.json'
+    shutil.copy(ROOT / 'templates.json', json_path)
+    changes = convert_csv_to_json(str(ROOT / '小红书封面生成提示词.csv'), str(json_path),
+                                  cache_file_path=str(tmp_path / 'build_cache'))
+    assert changes == {'added': [], 'changed': [], 'removed': []}
+    assert json_path.read_bytes() == (ROOT / 'templates.json').read_bytes()
+
+    registry = TemplateRegistry(str(ROOT / 'templates.json'), bundle_path=str(ROOT / 'templates.bundle'))
+    registry.load()
+    assert registry.loaded_from == 'bundle'
@@ -0,0 +1,131 @@
+import asyncio
+
+import httpx
+import pytest
+
+from services.deepseek_service import DeepSeekClient, DeepSeekError
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def completion(content: str) -> dict:
+    return {'choices': [{'message': {'content': content}}],
+            'usage': {'prompt_tokens': 10, 'completion_tokens': 5}}
+
+
+@pytest.fixture
+def make_client(monkeypatch):
+    monkeypatch.setenv('DEEPSEEK_API_KEY', 'test-key')
+    monkeypatch.setenv('DEEPSEEK_RETRY_BASE', '0')
+
+    def make(handler) -> DeepSeekClient:
+        client = DeepSeekClient()
+        client._http = httpx.AsyncClient(base_url='https://deepseek.test', transport=httpx.MockTransport(handler))
+        return client
+
+    return make
+
+
+def test_retries_retryable_status(make_client, monkeypatch):
+    monkeypatch.setenv('DEEPSEEK_RETRY', '3')
+    statuses = iter([503, 500, 200])
+
+    def handler(request):
+        status = next(statuses)
+        return httpx.Response(status, json=completion('<p>ok</p>') if status == 200 else {})
+
+    client = make_client(handler)
+    assert run(client.chat([])) == '<p>ok</p>'
+    assert client.limiter.throttled == 1
+
+
+def test_client_error_not_retried(make_client, monkeypatch):
+    monkeypatch.setenv('DEEPSEEK_RETRY', '3')
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(400, json={})
+
+    with pytest.raises(DeepSeekError) as info:
+        run(make_client(handler).chat([]))
+    assert len(calls) == 1
+    assert not info.value.retryable
+
+
+@pytest.mark.parametrize('retry', ['0', '1'])
+def test_single_attempt_raises_deepseek_error(make_client, monkeypatch, retry):
+    monkeypatch.setenv('DEEPSEEK_RETRY', retry)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(502, json={})
+
+    with pytest.raises(DeepSeekError) as info:
+        run(make_client(handler).chat([]))
+    assert len(calls) == 1
+    assert info.value.retryable
+
+
+def test_server_errors_do_not_raise_concurrency_limit(make_client, monkeypatch):
+    monkeypatch.setenv('DEEPSEEK_RETRY', '3')
+
+    def handler(request):
+        raise httpx.ConnectTimeout('timed out', request=request)
+
+    client = make_client(handler)
+    before = client.limiter.limit
+    with pytest.raises(DeepSeekError):
+        run(client.chat([]))
+    assert client.limiter.limit == before
+    assert client.limiter.in_flight == 0
+
+
+def test_stream_single_attempt_raises_deepseek_error(make_client, monkeypatch):
+    monkeypatch.setenv('DEEPSEEK_RETRY', '0')
+
+    async def consume(client):
+        return [delta async for delta in client.stream_chat([])]
+
+    with pytest.raises(DeepSeekError):
+        run(consume(make_client(lambda request: httpx.Response(500, json={}))))
+
+
+def test_shared_client_until_shutdown(monkeypatch):
+    import services.deepseek_service as deepseek_module
+
+    monkeypatch.setenv('DEEPSEEK_API_KEY', 'test-key')
+    monkeypatch.setattr(deepseek_module, '_client', None)
+    client = deepseek_module.get_deepseek_client()
+    assert deepseek_module.get_deepseek_client() is client
+    assert deepseek_module.get_limiter_stats() == client.limiter.get_stats()
+
+    run(deepseek_module.shutdown_deepseek_client())
+    assert client._http.is_closed
+    assert deepseek_module.get_limiter_stats() is None
+    assert deepseek_module.get_deepseek_client() is not client
+    run(deepseek_module.shutdown_deepseek_client())
+
+
+def test_usage_and_prompt_cache_hit_ratio(make_client, monkeypatch):
+    import services.deepseek_service as deepseek_module
+
+    monkeypatch.setattr(deepseek_module, 'usage_stats', dict.fromkeys(deepseek_module.usage_stats, 0))
+    usages = iter([
+        {'prompt_tokens': 100, 'completion_tokens': 20, 'prompt_cache_hit_tokens': 0, 'prompt_cache_miss_tokens': 100},
+        {'prompt_tokens': 100, 'completion_tokens': 30, 'prompt_cache_hit_tokens': 80, 'prompt_cache_miss_tokens': 20},
+    ])
+
+    def handler(request):
+        return httpx.Response(200, json={'choices': [{'message': {'content': 'ok'}}], 'usage': next(usages)})
+
+    client = make_client(handler)
+    run(client.chat([]))
+    run(client.chat([]))
+    stats = deepseek_module.get_usage_stats()
+    assert stats['requests'] == 2
+    assert stats['completion_tokens'] == 50
+    assert stats['prompt_cache_hit_ratio'] == 0.4
@@ -0,0 +1,20 @@
+import importlib.util
+from pathlib import Path
+
+from services.deepseek_service import finalize_html, strip_code_fence
+
+_PATH = Path(__file__).resolve().parent.parent / 'bench' / 'fake_deepseek.py'
+_spec = importlib.util.spec_from_file_location('fake_deepseek', _PATH)
+fake_deepseek = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(fake_deepseek)
+
+
+def cached_html(title: str) -> str:
+    messages = [{'role': 'user', 'content': f'- 标题：{title}'}]
+    return finalize_html(strip_code_fence(fake_deepseek._fake_html(messages)))
+
+
+def test_responses_stay_distinct_after_postprocess():
+    # 写入缓存的是后处理后的内容，不同请求仍应得到不同的内容块
+    assert cached_html('标题一') != cached_html('标题二')
+    assert cached_html('标题一') == cached_html('标题一')
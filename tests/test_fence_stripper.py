@@ -0,0 +1,46 @@
+import pytest
+
+from services.deepseek_service import FenceStripper, strip_code_fence
+
+
+def feed_in_chunks(text: str, size: int) -> str:
+    stripper = FenceStripper()
+    parts = [stripper.feed(text[i:i + size]) for i in range(0, len(text), size)]
+    return ''.join(parts) + stripper.finish()
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('```html\n<html><body>`a`</body></html>\n```', '<html><body>`a`</body></html>'),
+    ('  ```html\n\n  <p>x</p>\n```  \n', '<p>x</p>'),
+    ('```\n<p>x</p>```', '<p>x</p>'),
+    ('<p>x</p>', '<p>x</p>'),
+    ('\n <p>`code`</p> \n', '<p>`code`</p>'),
+    ('<p>x</p>\n```', '<p>x</p>\n```'),
+    ('```html', '```html'),
+    ('``', '``'),
+    ('', ''),
+])
+def test_strip_code_fence(text, expected):
+    assert strip_code_fence(text) == expected
+
+
+@pytest.mark.parametrize('text', [
+    '```html\n<html><body>`a`</body></html>\n```',
+    '  ```html\n\n  <p>x</p>\n```  \n',
+    '<p>x</p>\n```',
+    '\n <p>`code`</p> \n',
+    '```html',
+])
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 8])
+def test_incremental_output_matches_whole(text, size):
+    # 任意切分方式（包括把反引号拆开）的增量输出与一次性处理一致
+    assert feed_in_chunks(text, size) == strip_code_fence(text)
+
+
+def test_body_is_emitted_before_closing_fence():
+    stripper = FenceStripper()
+    assert stripper.feed('```ht') == ''
+    assert stripper.feed('ml\n<p>') == '<p>'
+    assert stripper.feed('x</p>\n``') == 'x</p>'
+    assert stripper.feed('`') == ''
+    assert stripper.finish() == ''
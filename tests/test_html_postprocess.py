@@ -0,0 +1,79 @@
+from services.html_postprocess import postprocess_html
+
+
+def test_duplicate_links_removed():
+    html = ('<link rel="stylesheet" href="https://fonts.example.com/a.css">'
+            '<link rel="stylesheet" href="https://fonts.example.com/a.css/">')
+    assert postprocess_html(html).count('<link') == 1
+
+
+def test_preload_and_stylesheet_with_same_href_kept():
+    html = ('<link rel="preload" href="font.css" as="style">'
+            '<link rel="stylesheet" href="font.css">')
+    result = postprocess_html(html)
+    assert 'rel="preload"' in result
+    assert 'rel="stylesheet"' in result
+
+
+def test_stylesheet_link_after_import_removed():
+    html = '<style>@import url("font.css");</style><link rel="stylesheet" href="font.css">'
+    assert '<link' not in postprocess_html(html)
+
+
+def test_duplicate_imports_across_style_blocks_removed():
+    html = '<style>@import url("a.css");body{margin:0}</style><style>@import url("a.css");</style>'
+    result = postprocess_html(html)
+    assert result.count('@import') == 1
+    # 去重后为空的样式块整体删除
+    assert result.count('<style>') == 1
+
+
+def test_canvas_height_fixed_to_3_4():
+    html = '<style>.card { width: 720px; height: 900px; }</style><div class="card"></div>'
+    assert '.card{width:720px;height:960px}' in postprocess_html(html)
+
+
+def test_inline_canvas_height_fixed():
+    html = '<div style="width: 600px; height: 600px">x</div>'
+    assert postprocess_html(html) == '<div style="width: 600px; height: 800px">x</div>'
+
+
+def test_valid_canvas_leaves_other_elements_alone():
+    html = '<style>.card{width:720px;height:960px}.bg{width:1080px;height:1080px}</style>'
+    result = postprocess_html(html)
+    assert '.bg{width:1080px;height:1080px}' in result
+    assert '.card{width:720px;height:960px}' in result
+
+
+def test_wide_banner_not_stretched():
+    html = '<style>.header{width:1080px;height:200px}</style><div class="poster"><div class="header"></div></div>'
+    assert '.header{width:1080px;height:200px}' in postprocess_html(html)
+
+
+def test_square_background_not_stretched():
+    html = '<body><div class="poster"><div style="width: 1080px; height: 1080px"></div></div></body>'
+    assert 'height: 1080px' in postprocess_html(html)
+
+
+def test_root_container_fixed_even_if_far_from_3_4():
+    html = ('<style>.poster{width:1080px;height:1080px}.header{width:1080px;height:200px}</style>'
+            '<body><div class="poster"><div class="header"></div></div></body>')
+    result = postprocess_html(html)
+    assert '.poster{width:1080px;height:1440px}' in result
+    assert '.header{width:1080px;height:200px}' in result
+
+
+def test_small_elements_ignored():
+    html = '<style>.icon{width:48px;height:20px}</style>'
+    assert '.icon{width:48px;height:20px}' in postprocess_html(html)
+
+
+def test_whitespace_and_comments():
+    html = '<div>\n  <!-- note -->\n  <p>a   b</p>\n</div>\n<pre>  keep\n  this</pre>'
+    assert postprocess_html(html) == '<div><p>a b</p></div><pre>  keep\n  this</pre>'
+
+
+def test_whitespace_around_removed_comment_kept_as_one_space():
+    assert postprocess_html('<p><span>a</span> <!-- x --> <span>b</span></p>') == '<p><span>a</span> <span>b</span></p>'
+    assert postprocess_html('<p>a <!-- x -->\n b</p>') == '<p>a b</p>'
+    assert postprocess_html('<p>a<!-- x -->b</p>') == '<p>ab</p>'
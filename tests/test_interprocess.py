@@ -0,0 +1,92 @@
+import asyncio
+
+from services.interprocess import GenerationLocks, SharedCounters
+
+
+def test_counters_are_batched_until_flush(tmp_path):
+    first = SharedCounters(tmp_path, ('hits', 'epoch'), flush_interval=60)
+    second = SharedCounters(tmp_path, ('hits', 'epoch'), flush_interval=60)
+    first.add('hits')
+    first.add('hits')
+    # 本进程立即可见，其他 worker 在合并后才看到
+    assert first.get('hits') == 2
+    assert second.get('hits') == 0
+    first.flush()
+    assert second.get('hits') == 2
+    assert second.snapshot() == {'hits': 2, 'epoch': 0}
+
+
+def test_flush_on_add_is_visible_immediately(tmp_path):
+    first = SharedCounters(tmp_path, ('hits', 'epoch'), flush_interval=60)
+    second = SharedCounters(tmp_path, ('hits', 'epoch'), flush_interval=60)
+    first.add('hits')
+    first.add('epoch', flush=True)
+    assert second.get('epoch') == 1
+    assert second.get('hits') == 1
+
+
+def test_waiter_wakes_when_holder_releases(tmp_path):
+    # 两个实例模拟两个 worker
+    holder = GenerationLocks(tmp_path, timeout=5)
+    waiter = GenerationLocks(tmp_path, timeout=5)
+
+    async def main():
+        order = []
+
+        async def hold():
+            async with holder.hold('key') as waited:
+                assert not waited
+                await asyncio.sleep(0.2)
+                order.append('released')
+
+        async def wait():
+            await asyncio.sleep(0.05)
+            async with waiter.hold('key') as waited:
+                assert waited
+                order.append('acquired')
+
+        await asyncio.gather(hold(), wait())
+        return order
+
+    order = asyncio.run(main())
+    assert order == ['released', 'acquired']
+    assert waiter.get_stats() == {'waits': 1, 'timeouts': 0}
+    assert list(tmp_path.glob('*.lock')) == []
+
+
+def test_timeout_gives_up_and_releases_late_lock(tmp_path):
+    holder = GenerationLocks(tmp_path, timeout=5)
+    waiter = GenerationLocks(tmp_path, timeout=0.1)
+
+    async def main():
+        release = asyncio.Event()
+
+        async def hold():
+            async with holder.hold('key'):
+                await release.wait()
+
+        task = asyncio.create_task(hold())
+        await asyncio.sleep(0.01)
+        async with waiter.hold('key') as waited:
+            assert waited
+        release.set()
+        await task
+        # 放弃等待后线程拿到的锁会自行释放，后续请求不会被卡住
+        await asyncio.sleep(0.1)
+        async with holder.hold('key') as waited:
+            return waited
+
+    assert asyncio.run(main()) is False
+    assert waiter.get_stats()['timeouts'] == 1
+
+
+def test_distinct_keys_do_not_wait(tmp_path):
+    locks = GenerationLocks(tmp_path, timeout=5)
+
+    async def main():
+        async with locks.hold('a'):
+            async with locks.hold('b') as waited:
+                return waited
+
+    assert asyncio.run(main()) is False
+    assert locks.get_stats()['waits'] == 0
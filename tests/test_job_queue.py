@@ -0,0 +1,119 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+import services.job_queue as job_queue_module
+from services.job_queue import JobQueue
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'jobs.db')
+
+
+def test_importing_module_does_not_create_queue():
+    assert job_queue_module._queue is None
+
+
+def test_job_runs_to_completion(cache, upstream, style, db_path):
+    async def scenario():
+        queue = JobQueue(db_path, workers=2, poll_interval=0.01)
+        await queue.start()
+        try:
+            job_id = queue.submit('任务标题', '', style['id'])
+            assert queue.get(job_id)['status'] in ('queued', 'running')
+            return await queue.wait(job_id, 5), queue.get_stats()
+        finally:
+            await queue.stop()
+
+    job, stats = run(scenario())
+    assert job['status'] == 'done'
+    assert '任务标题' in job['html']
+    assert stats['done'] == 1 and stats['completed_since_start'] == 1
+
+
+def test_unknown_style_fails(db_path):
+    async def scenario():
+        queue = JobQueue(db_path, workers=1, poll_interval=0.01)
+        await queue.start()
+        try:
+            return await queue.wait(queue.submit('标题', '', 'missing'), 5)
+        finally:
+            await queue.stop()
+
+    job = run(scenario())
+    assert job['status'] == 'failed'
+    assert job['error'] == '未找到该风格'
+
+
+def test_only_expired_leases_are_requeued(db_path):
+    crashed = JobQueue(db_path, lease=60)
+    alive = JobQueue(db_path, lease=60)
+    stale_job = crashed.submit('崩溃', '', 'style_1')
+    live_job = alive.submit('执行中', '', 'style_1')
+    assert crashed._claim()['id'] == stale_job
+    assert alive._claim()['id'] == live_job
+    crashed._execute('UPDATE jobs SET heartbeat_at = ? WHERE id = ?', (time.time() - 120, stale_job))
+
+    restarted = JobQueue(db_path, lease=60)
+    assert restarted.requeue_expired() == 1
+    assert restarted.get(stale_job)['status'] == 'queued'
+    assert restarted.get(live_job)['status'] == 'running'
+
+
+def test_stop_requeues_own_running_jobs(cache, upstream, style, db_path):
+    upstream.delay = 5
+
+    async def scenario():
+        queue = JobQueue(db_path, workers=1, poll_interval=0.01)
+        await queue.start()
+        job_id = queue.submit('慢任务', '', style['id'])
+        await asyncio.wait_for(upstream.started.wait(), 5)
+        await queue.stop()
+        return queue.get(job_id)
+
+    assert run(scenario())['status'] == 'queued'
+
+
+def test_worker_survives_locked_database(cache, upstream, style, db_path, monkeypatch):
+    async def scenario():
+        queue = JobQueue(db_path, workers=1, poll_interval=0.01)
+        claim = queue._claim
+        failures = iter([sqlite3.OperationalError('database is locked')] * 2)
+
+        def flaky_claim():
+            error = next(failures, None)
+            if error is not None:
+                raise error
+            return claim()
+
+        monkeypatch.setattr(queue, '_claim', flaky_claim)
+        await queue.start()
+        try:
+            return await queue.wait(queue.submit('标题', '', style['id']), 5)
+        finally:
+            await queue.stop()
+
+    assert run(scenario())['status'] == 'done'
+
+
+def test_submit_from_worker_thread_wakes_queue(cache, upstream, style, db_path):
+    async def scenario():
+        queue = JobQueue(db_path, workers=1, poll_interval=30)
+        await queue.start()
+        try:
+            job_id = await asyncio.get_running_loop().run_in_executor(
+                None, queue.submit, '线程提交', '', style['id'])
+            return await queue.wait(job_id, 5)
+        finally:
+            await queue.stop()
+
+    started = time.monotonic()
+    assert run(scenario())['status'] == 'done'
+    assert time.monotonic() - started < 5
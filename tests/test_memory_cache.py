@@ -0,0 +1,51 @@
+import time
+
+from services.cache_service import CacheService
+from services.memory_cache import MemoryCache
+
+
+def test_evicts_least_recently_used_by_bytes():
+    cache = MemoryCache(max_bytes=10)
+    cache.set('a', 0, 'aaaa')
+    cache.set('b', 0, 'bbbb')
+    assert cache.get('a') is not None
+    cache.set('c', 0, 'cccc')
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.get_stats()['bytes'] == 8
+    assert cache.evictions == 1
+
+
+def test_oversized_entry_not_stored():
+    cache = MemoryCache(max_bytes=4)
+    cache.set('a', 0, '封面内容')
+    assert cache.get('a') is None
+
+
+def test_expired_entry_counts_as_miss():
+    cache = MemoryCache()
+    cache.set('old', time.time() - 100, '<p>old</p>')
+    cache.set('new', time.time(), '<p>new</p>')
+    assert cache.get('old', max_age=50) is None
+    assert cache.get('new', max_age=50)[1] == '<p>new</p>'
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['expired'], stats['entries']) == (1, 1, 1, 1)
+
+
+def test_service_counts_memory_hits_only_for_fresh_entries(tmp_path):
+    cache = CacheService(str(tmp_path / 'cache'), cache_ttl=60, memory_max_bytes=1 << 20)
+    cache.set('标题', '', 'style_1', '<p>a</p>')
+    assert cache.lookup('标题', '', 'style_1') == ('<p>a</p>', False)
+
+    # 内存副本超过 cache_ttl 后不算命中，由存储后端返回旧内容
+    key = cache.cache_key('标题', '', 'style_1')
+    record = cache.backend.read(key)
+    record['timestamp'] -= 120
+    cache.backend.write(key, record)
+    cache.memory.set(key, record['timestamp'], '<p>a</p>')
+    assert cache.lookup('标题', '', 'style_1') == ('<p>a</p>', True)
+
+    stats = cache.get_cache_stats()
+    assert stats['memory']['hits'] == 1
+    assert stats['lookups']['memory'] == {'hit': 1, 'miss': 1}
+    assert stats['lookups']['disk']['stale'] == 1
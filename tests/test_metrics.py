@@ -0,0 +1,57 @@
+from fastapi.testclient import TestClient
+
+from services.metrics import MetricsRegistry
+
+
+def test_render_counter_and_gauge():
+    registry = MetricsRegistry()
+    requests = registry.counter('requests_total', 'Requests', ('route',))
+    requests.inc('/a')
+    requests.inc('/a', amount=2)
+    requests.inc('say "hi"\n')
+    gauge = registry.gauge('in_flight', 'In flight')
+    gauge.inc(amount=3)
+    gauge.dec()
+    assert registry.render() == (
+        '# HELP requests_total Requests\n'
+        '# TYPE requests_total counter\n'
+        'requests_total{route="/a"} 3\n'
+        'requests_total{route="say \\"hi\\"\\n"} 1\n'
+        '# HELP in_flight In flight\n'
+        '# TYPE in_flight gauge\n'
+        'in_flight 2\n'
+    )
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram('latency_seconds', 'Latency', ('mode',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, 'chat')
+    assert registry.render().splitlines()[2:] == [
+        'latency_seconds_bucket{mode="chat",le="0.1"} 2',
+        'latency_seconds_bucket{mode="chat",le="1"} 3',
+        'latency_seconds_bucket{mode="chat",le="+Inf"} 4',
+        'latency_seconds_sum{mode="chat"} 3.65',
+        'latency_seconds_count{mode="chat"} 4',
+    ]
+
+
+def test_failing_callback_is_skipped():
+    registry = MetricsRegistry()
+    registry.callback('broken', 'Broken', 'gauge', lambda: 1 / 0)
+    registry.callback('size', 'Size', 'gauge', lambda: {('memory',): 5}, ('tier',))
+    assert registry.render() == '# HELP size Size\n# TYPE size gauge\nsize{tier="memory"} 5\n'
+
+
+def test_requests_labelled_by_route_template():
+    from app import app
+
+    client = TestClient(app)
+    client.get('/generate/preview', params={'title': '指标', 'style_id': 'missing'})
+    client.get('/no/such/path')
+    text = client.get('/metrics').text
+    assert 'http_requests_total{method="GET",route="/generate/preview",status="404"}' in text
+    assert 'route="unmatched",status="404"' in text
+    assert '指标' not in text
+    assert '# TYPE http_request_duration_seconds histogram' in text
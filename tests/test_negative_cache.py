@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+import pytest
+
+import services.cache_service as cache_module
+from services.cache_service import CacheService
+from services.deepseek_service import CachedFailureError, DeepSeekError, generate_cover_html
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_ttl_doubles_up_to_max(tmp_path):
+    cache = CacheService(str(tmp_path / 'cache'), negative_ttl=30, negative_max_ttl=100)
+    retry_after = []
+    for _ in range(4):
+        cache.record_failure('key', 'boom')
+        failure = cache.get_failure('key')
+        assert failure['error'] == 'boom'
+        retry_after.append(round(failure['retry_after']))
+    assert retry_after == [30, 60, 100, 100]
+    assert cache.get_failure('key')['failures'] == 4
+
+    cache.clear_failure('key')
+    assert cache.get_failure('key') is None
+
+
+def test_backoff_restarts_after_quiet_period(tmp_path, monkeypatch):
+    cache = CacheService(str(tmp_path / 'cache'), negative_ttl=30, negative_max_ttl=100)
+    now = time.time()
+    monkeypatch.setattr(cache_module.time, 'time', lambda: now)
+    cache.record_failure('key', 'boom')
+    cache.record_failure('key', 'boom')
+
+    # 上一条记录过期后不到 negative_max_ttl 再次失败：继续翻倍
+    now += 61
+    assert cache.get_failure('key') is None
+    cache.record_failure('key', 'boom')
+    assert cache.get_failure('key')['failures'] == 3
+
+    # 过期后超过 negative_max_ttl 才再次失败：重新计数
+    now += 100 + 101
+    cache.record_failure('key', 'boom')
+    assert cache.get_failure('key') == {'timestamp': now, 'expires_at': now + 30, 'failures': 1,
+                                        'error': 'boom', 'retry_after': 30}
+
+
+def test_disabled_when_ttl_is_zero(tmp_path):
+    cache = CacheService(str(tmp_path / 'cache'), negative_ttl=0)
+    cache.record_failure('key', 'boom')
+    assert cache.get_failure('key') is None
+
+
+def test_failed_generation_is_not_retried_within_ttl(cache, upstream, style):
+    upstream.error = DeepSeekError('boom', retryable=False)
+    with pytest.raises(DeepSeekError):
+        run(generate_cover_html('失败标题', '', style))
+    assert upstream.calls == 1
+
+    with pytest.raises(CachedFailureError) as info:
+        run(generate_cover_html('失败标题', '', style))
+    assert upstream.calls == 1
+    assert 0 < info.value.retry_after <= cache.negative_ttl
+    assert 'boom' in str(info.value)
+
+    # 其他请求不受影响；过期后重新生成，成功时删除失败记录
+    upstream.error = None
+    run(generate_cover_html('其他标题', '', style))
+    key = cache.cache_key('失败标题', '', style['id'])
+    record = cache.backend.read_failure(key)
+    cache.backend.write_failure(key, dict(record, expires_at=time.time() - 1))
+    run(generate_cover_html('失败标题', '', style))
+    assert upstream.calls == 3
+    assert cache.backend.read_failure(key) is None
@@ -0,0 +1,60 @@
+import pytest
+
+from services.cache_service import CacheService
+from services.normalization import normalize_text
+from services.similarity_index import SimilarityIndex
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('５个省钱技巧', '5个省钱技巧'),
+    ('5 个省钱技巧', '5个省钱技巧'),
+    ('  hello   world  ', 'hello world'),
+    ('《省钱》技巧。。。', '<省钱>技巧.'),
+    ('真的吗！！！？？', '真的吗!?'),
+    ('Hello World', 'Hello World'),
+    ('', ''),
+])
+def test_normalize_text(text, expected):
+    assert normalize_text(text) == expected
+
+
+def test_casefold_only_on_request():
+    assert normalize_text('ＨＥＬＬＯ Ｗorld', casefold=True) == 'hello world'
+    assert normalize_text('ＨＥＬＬＯ') == 'HELLO'
+
+
+def test_equivalent_titles_share_cache(tmp_path):
+    cache = CacheService(str(tmp_path / 'cache'), memory_max_bytes=0)
+    cache.set('5 个省钱技巧！！', '', 'style_1', '<p>a</p>')
+    assert cache.get('5个省钱技巧!', '', 'style_1') == '<p>a</p>'
+    assert cache.counters.get('normalized_hits') == 1
+    # 封面原样渲染标题文字，大小写不同的标题不能共用缓存
+    assert cache.cache_key('iPhone 技巧', '', 'style_1') != cache.cache_key('IPHONE 技巧', '', 'style_1')
+
+    raw = CacheService(str(tmp_path / 'raw'), memory_max_bytes=0, normalize_titles=False)
+    assert raw.cache_key('5 个省钱技巧', '', 'style_1') != raw.cache_key('5个省钱技巧', '', 'style_1')
+
+
+def test_similarity_index():
+    index = SimilarityIndex(threshold=0.8, max_entries=2)
+    index.add('a', 'style_1', '', '十个省钱小技巧分享')
+    assert index.query('style_1', '', '十个省钱小技巧分享!')[0] == 'a'
+    assert index.query('style_1', '作者', '十个省钱小技巧分享!') is None
+    assert index.query('style_2', '', '十个省钱小技巧分享!') is None
+    assert index.query('style_1', '', '周末去哪里玩') is None
+
+    index.add('b', 'style_1', '', '周末去哪里玩')
+    index.add('c', 'style_1', '', '周末去哪里玩呢')
+    # 超出上限后淘汰最早加入的条目
+    assert index.query('style_1', '', '十个省钱小技巧分享') is None
+    index.remove('c')
+    assert index.query('style_1', '', '周末去哪里玩呢')[0] == 'b'
+    assert index.get_stats() == {'threshold': 0.8, 'entries': 1, 'lookups': 6, 'hits': 2}
+
+
+def test_near_duplicate_title_served_from_cache(tmp_path):
+    cache = CacheService(str(tmp_path / 'cache'), memory_max_bytes=0, similarity_threshold=0.8)
+    cache.set('十个省钱小技巧分享', '', 'style_1', '<p>a</p>')
+    assert cache.get('十个省钱小技巧分享！', '', 'style_1') == '<p>a</p>'
+    assert cache.get('十个省钱小技巧分享！', '作者', 'style_1') is None
+    assert cache.get('十个省钱小技巧分享！', '', 'style_2') is None
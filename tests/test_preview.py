@@ -0,0 +1,37 @@
+from services.preview_renderer import etag_matches, preview_etag, render_preview
+
+
+def template(name: str = '极简') -> dict:
+    return {'id': 'style_1', 'name': name}
+
+
+def test_render_escapes_input():
+    html = render_preview('<b>标题</b>', 'A & B', template('<风格>'))
+    assert '<h1>&lt;b&gt;标题&lt;/b&gt;</h1>' in html
+    assert '<p>A &amp; B</p>' in html
+    assert '风格：&lt;风格&gt;' in html
+    assert '{{' not in html
+
+
+def test_etag_changes_with_every_input():
+    base = preview_etag('标题', '', 'style_1', 'v1')
+    assert base == preview_etag('标题', '', 'style_1', 'v1')
+    assert base.startswith('"') and base.endswith('"')
+    others = {
+        preview_etag('标题2', '', 'style_1', 'v1'),
+        preview_etag('标题', '作者', 'style_1', 'v1'),
+        preview_etag('标题', '', 'style_2', 'v1'),
+        preview_etag('标题', '', 'style_1', 'v2'),
+    }
+    assert len(others) == 4
+    assert base not in others
+
+
+def test_etag_matches():
+    etag = '"abc"'
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('W/"abc"', etag)
+    assert etag_matches('"x", "abc"', etag)
+    assert etag_matches('*', etag)
+    assert not etag_matches('"x"', etag)
+    assert not etag_matches('', etag)
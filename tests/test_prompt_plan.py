@@ -0,0 +1,33 @@
+from services.deepseek_service import build_prompt_html, get_prompt_plan
+
+
+def template(prompt: str = '写一个封面') -> dict:
+    return {
+        'id': 'style_1',
+        'prompt_template': prompt,
+        'requirements': {'尺寸': '3:4', '留白': ''},
+        'style_details': {'设计风格': '极简', '文字排版风格': '粗体'},
+    }
+
+
+def test_requests_share_prefix():
+    target = template()
+    first = build_prompt_html('标题一', '作者', target)
+    second = build_prompt_html('另一个标题', '', target)
+    assert first[0] == second[0]
+    prefix = get_prompt_plan(target).user_prefix
+    assert first[1]['content'] == f"{prefix}- 标题：标题一\n- 作者：作者"
+    assert second[1]['content'] == f"{prefix}- 标题：另一个标题\n- 作者："
+    # 空的要求不出现在提示词中
+    assert '留白' not in prefix
+
+
+def test_plan_compiled_once_per_template_object():
+    target = template()
+    assert get_prompt_plan(target) is get_prompt_plan(target)
+
+    # 注册表重新加载后得到新的模板对象，计划随之重新编译
+    reloaded = template('写一个新封面')
+    plan = get_prompt_plan(reloaded)
+    assert plan is not get_prompt_plan(target)
+    assert plan.user_prefix.startswith('写一个新封面')
@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+from services.rate_limiter import AdaptiveLimiter, parse_retry_after
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_success_increases_limit_additively():
+    async def scenario():
+        limiter = AdaptiveLimiter(initial_concurrency=4)
+        await limiter.acquire()
+        await limiter.release('success')
+        return limiter
+
+    limiter = run(scenario())
+    assert limiter.limit == 4.25
+    assert limiter.in_flight == 0
+
+
+def test_throttle_halves_limit_once_per_interval():
+    async def scenario():
+        limiter = AdaptiveLimiter(initial_concurrency=8, decrease_interval=60)
+        for _ in range(2):
+            await limiter.acquire()
+        await limiter.release('throttled')
+        await limiter.release('throttled')
+        return limiter
+
+    limiter = run(scenario())
+    assert limiter.limit == 4
+    assert limiter.throttled == 2
+
+
+def test_errors_do_not_raise_limit():
+    async def scenario():
+        limiter = AdaptiveLimiter(initial_concurrency=4)
+        for _ in range(3):
+            await limiter.acquire()
+            await limiter.release('error')
+        return limiter
+
+    assert run(scenario()).limit == 4
+
+
+def test_retry_after_pauses_new_requests():
+    async def scenario():
+        limiter = AdaptiveLimiter(initial_concurrency=4)
+        await limiter.acquire()
+        await limiter.release('throttled', retry_after=0.1)
+        started = time.monotonic()
+        await limiter.acquire()
+        return time.monotonic() - started
+
+    assert run(scenario()) >= 0.09
+
+
+def test_concurrency_capped_at_limit():
+    async def scenario():
+        limiter = AdaptiveLimiter(min_concurrency=1, initial_concurrency=2)
+        await limiter.acquire()
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0.01)
+        blocked = not waiter.done()
+        await limiter.release('success')
+        await asyncio.wait_for(waiter, 1)
+        return blocked, limiter.in_flight
+
+    assert run(scenario()) == (True, 2)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('3') == 3.0
+    assert parse_retry_after('-1') == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+from services.cache_backends import RedisBackend
+from services.compression import decompress
+
+from test_cache_backends import record, write_html
+
+fakeredis = pytest.importorskip('fakeredis')
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+def redis_backend(server, **kwargs) -> RedisBackend:
+    return RedisBackend(client=fakeredis.FakeRedis(server=server), entry_ttl=100, **kwargs)
+
+
+def test_redis_roundtrip_and_ttl(redis_server):
+    backend = redis_backend(redis_server)
+    digest = write_html(backend, 'a', '<p>redis</p>')
+    stored = backend.read('a')
+    assert stored['blob'] == digest and stored['style_id'] == 'style_1'
+    assert decompress(*backend.get_blob(digest)) == '<p>redis</p>'
+    assert 0 < backend.client.ttl('covers:e:a') <= 100
+    # 内容块比记录多保留一分钟
+    assert backend.client.ttl(f'covers:b:{digest}') > 100
+    assert backend.count(0)['total'] == 1
+    assert backend.fallback_calls == 0
+
+
+def test_redis_style_index_prunes_deleted_keys(redis_server):
+    backend = redis_backend(redis_server)
+    write_html(backend, 'a', '<p>a</p>')
+    write_html(backend, 'b', '<p>b</p>')
+    backend.delete('a')
+    assert [key for key, _ in backend.style_entries('style_1')] == ['b']
+    assert backend.client.smembers('covers:s:style_1') == {b'b'}
+
+
+def test_redis_failures(redis_server):
+    backend = redis_backend(redis_server)
+    now = time.time()
+    backend.write_failure('k', {'timestamp': now, 'expires_at': now + 30, 'failures': 2, 'error': 'boom'})
+    assert backend.read_failure('k')['failures'] == 2
+    assert backend.count_failures(now) == 1
+    backend.delete_failure('k')
+    assert backend.read_failure('k') is None
+
+
+def test_redis_falls_back_to_memory_when_unavailable(redis_server):
+    backend = redis_backend(redis_server, retry_interval=60)
+    redis_server.connected = False
+    write_html(backend, 'a', '<p>fallback</p>')
+    assert backend.fallback_calls == 1
+    assert decompress(*backend.get_blob(backend.read('a')['blob'])) == '<p>fallback</p>'
+
+    # retry_interval 内即使 Redis 已恢复也继续使用后备存储
+    redis_server.connected = True
+    assert backend.read('a') is not None
+    assert backend.client.exists('covers:e:a') == 0
+
+
+def test_redis_retries_after_interval(redis_server):
+    backend = redis_backend(redis_server, retry_interval=0.05)
+    redis_server.connected = False
+    assert backend.read('a') is None
+    assert backend.fallback_calls == 1
+    redis_server.connected = True
+    time.sleep(0.06)
+    write_html(backend, 'a', '<p>back</p>')
+    assert backend.client.exists('covers:e:a') == 1
+
+
+def test_redis_connection_refused_uses_fallback():
+    pytest.importorskip('redis')
+    backend = RedisBackend(url='redis://127.0.0.1:1/0', socket_timeout=0.2, retry_interval=60)
+    backend.write('a', record(html='<p>x</p>'))
+    assert backend.read('a')['html'] == '<p>x</p>'
+    assert backend.fallback_calls == 2
@@ -0,0 +1,118 @@
+import asyncio
+
+from services.deepseek_service import finalize_html, generate_cover_html, stream_cover_html
+from services.interprocess import GenerationLocks
+from services.singleflight import SingleFlight, StreamFlight
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def collect(stream):
+    return [event async for event in stream]
+
+
+def test_single_flight_shares_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 'html'
+
+    async def main():
+        return await asyncio.gather(*(flight.do('key', fn) for _ in range(5)))
+
+    assert run(main()) == ['html'] * 5
+    assert calls == [1]
+    assert flight.get_stats() == {'in_flight': 0, 'leaders': 1, 'collapsed': 4}
+
+
+def test_cancelled_waiter_does_not_cancel_call():
+    flight = SingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.05)
+        return 'html'
+
+    async def main():
+        first = asyncio.ensure_future(flight.do('key', fn))
+        second = asyncio.ensure_future(flight.do('key', fn))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert run(main()) == 'html'
+
+
+def test_stream_flight_replays_chunks_to_late_subscribers():
+    flight = StreamFlight()
+
+    async def fn(publish):
+        for chunk in ('a', 'b', 'c'):
+            publish(chunk)
+            await asyncio.sleep(0.01)
+        return 'abc!'
+
+    async def main():
+        first = asyncio.ensure_future(collect(flight.subscribe('key', fn)))
+        await asyncio.sleep(0.015)
+        second = await collect(flight.subscribe('key', fn))
+        return await first, second
+
+    first, second = run(main())
+    expected = [('chunk', 'a'), ('chunk', 'b'), ('chunk', 'c'), ('done', 'abc!')]
+    assert first == expected
+    assert second == expected
+    assert flight.get_stats() == {'in_flight': 0, 'leaders': 1, 'collapsed': 1}
+
+
+def test_generate_collapses_concurrent_misses(cache, upstream, style):
+    upstream.delay = 0.05
+
+    async def main():
+        return await asyncio.gather(*(generate_cover_html('并发标题', '', style) for _ in range(3)))
+
+    results = run(main())
+    assert upstream.calls == 1
+    assert len(set(results)) == 1
+
+
+def test_concurrent_streams_share_one_upstream_call(cache, upstream, style):
+    upstream.delay = 0.05
+
+    async def main():
+        return await asyncio.gather(*(collect(stream_cover_html('流式标题', '', style)) for _ in range(3)))
+
+    results = run(main())
+    assert upstream.calls == 1
+    assert results[0] == results[1] == results[2]
+    event, html = results[0][-1]
+    assert event == 'done'
+    # done 携带后处理后的最终HTML，与缓存内容一致
+    assert html == cache.get('流式标题', '', style['id'])
+    assert ''.join(content for event, content in results[0][:-1]).startswith('<html>')
+
+
+def test_stream_hit_sends_only_done(cache, upstream, style):
+    cache.set('已缓存', '', style['id'], '<p>cached</p>')
+    assert run(collect(stream_cover_html('已缓存', '', style))) == [('done', '<p>cached</p>')]
+    assert upstream.calls == 0
+
+
+def test_stream_reuses_result_of_other_worker(cache, upstream, style):
+    # 另一个 worker 持有同一键的生成锁，并在释放前写入缓存
+    other = GenerationLocks(cache.generation_locks.lock_dir, timeout=5)
+    key = cache.cache_key('跨进程标题', '', style['id'])
+
+    async def main():
+        async with other.hold(key):
+            stream = asyncio.ensure_future(collect(stream_cover_html('跨进程标题', '', style)))
+            await asyncio.sleep(0.05)
+            cache.set('跨进程标题', '', style['id'], finalize_html('<p>other</p>'))
+        return await stream
+
+    assert run(main()) == [('done', finalize_html('<p>other</p>'))]
+    assert upstream.calls == 0
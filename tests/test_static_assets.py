@@ -0,0 +1,82 @@
+import gzip
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services.static_assets import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, StaticAssets
+
+
+@pytest.fixture
+def assets(tmp_path):
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'js').mkdir()
+    (tmp_path / 'css' / 'style.css').write_text('body{margin:0}', encoding='utf-8')
+    (tmp_path / 'js' / 'main.js').write_text('console.log(1);\n' * 40, encoding='utf-8')
+    (tmp_path / 'index.html').write_text(
+        '<link rel="stylesheet" href="/css/style.css"><script src=\'/js/main.js\'></script>'
+        '<script src="https://cdn.example.com/js/main.js"></script>', encoding='utf-8')
+    assets = StaticAssets(str(tmp_path))
+    assets.build()
+    return assets
+
+
+def test_hashed_paths_and_index_rewrite(assets):
+    css, hashed = assets.get('css/style.css')
+    assert not hashed
+    assert css.hashed_path.startswith('css/style.') and css.hashed_path.endswith('.css')
+    assert assets.get(css.hashed_path) == (css, True)
+    assert css.media_type == 'text/css; charset=utf-8'
+    assert assets.get('css/missing.css') is None
+
+    js, _ = assets.get('js/main.js')
+    index = assets.index.variants['identity'].decode('utf-8')
+    assert f'href="/{css.hashed_path}"' in index
+    assert f"src='/{js.hashed_path}'" in index
+    # 外部地址不改写
+    assert 'https://cdn.example.com/js/main.js' in index
+
+
+def test_negotiate_precompressed(assets):
+    js, _ = assets.get('js/main.js')
+    encoding, data = js.negotiate('gzip, deflate')
+    assert encoding == 'gzip'
+    assert gzip.decompress(data) == js.variants['identity']
+    assert js.negotiate('identity') == (None, js.variants['identity'])
+    assert js.negotiate('gzip;q=0') == (None, js.variants['identity'])
+
+    # 太小的文件不生成压缩版本
+    css, _ = assets.get('css/style.css')
+    assert css.negotiate('gzip') == (None, b'body{margin:0}')
+
+
+@pytest.fixture
+def client():
+    from app import app
+    from services.static_assets import static_assets
+
+    # 不触发 startup，这里手动构建资源表
+    static_assets.build()
+    return TestClient(app)
+
+
+def test_asset_cache_headers(client):
+    from services.static_assets import static_assets
+
+    asset, _ = static_assets.get('js/main.js')
+
+    hashed = client.get('/' + asset.hashed_path, headers={'Accept-Encoding': 'gzip'})
+    assert hashed.headers['cache-control'] == IMMUTABLE_CACHE_CONTROL
+    assert hashed.headers['content-encoding'] == 'gzip'
+    assert hashed.content == asset.variants['identity']
+
+    plain = client.get('/js/main.js')
+    assert plain.headers['cache-control'] == REVALIDATE_CACHE_CONTROL
+    assert plain.headers['etag'] == asset.etag
+
+    revalidated = client.get('/js/main.js', headers={'If-None-Match': asset.etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b''
+
+    index = client.get('/')
+    assert asset.hashed_path in index.text
+    assert client.get('/js/missing.js').status_code == 404
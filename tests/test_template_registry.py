@@ -0,0 +1,80 @@
+import json
+import os
+
+import pytest
+
+from services.template_registry import TemplateRegistry
+
+
+def write_templates(path, templates, mtime) -> None:
+    path.write_text(json.dumps({'templates': templates}, ensure_ascii=False), encoding='utf-8')
+    os.utime(path, (mtime, mtime))
+
+
+def template(style_id: str, name: str) -> dict:
+    return {
+        'id': style_id,
+        'name': name,
+        'description': f'{name}的描述',
+        'example_image': '',
+        'prompt_template': f'{name}的提示词',
+        'requirements': {},
+        'style_details': {},
+    }
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / 'templates.json'
+    write_templates(path, [template('style_1', '极简'), template('style_2', '复古')], mtime=1_000_000)
+    return path
+
+
+def test_get_and_list_styles(path):
+    registry = TemplateRegistry(str(path), check_interval=0)
+    assert registry.load()
+    assert registry.get('style_2')['name'] == '复古'
+    assert registry.get('missing') is None
+    assert registry.list_styles() == [
+        {'id': 'style_1', 'name': '极简', 'description': '极简的描述', 'example_image': ''},
+        {'id': 'style_2', 'name': '复古', 'description': '复古的描述', 'example_image': ''},
+    ]
+    assert registry.loaded_from == 'json'
+
+
+def test_reloads_when_file_changes(path):
+    registry = TemplateRegistry(str(path), check_interval=0)
+    registry.load()
+    before = registry.version
+    write_templates(path, [template('style_1', '极简新版')], mtime=2_000_000)
+    assert registry.get('style_1')['name'] == '极简新版'
+    assert registry.get('style_2') is None
+    assert registry.version != before
+
+
+def test_touch_without_changes_keeps_snapshot(path):
+    registry = TemplateRegistry(str(path), check_interval=0)
+    registry.load()
+    templates = registry.all()
+    os.utime(path, (3_000_000, 3_000_000))
+    assert not registry.load()
+    assert registry.all() is templates
+
+
+def test_check_interval_limits_stat_calls(path):
+    registry = TemplateRegistry(str(path), check_interval=60)
+    registry.load()
+    write_templates(path, [template('style_1', '改名')], mtime=2_000_000)
+    # 检查间隔内不重新读取文件
+    assert registry.get('style_1')['name'] == '极简'
+    assert registry.load()
+    assert registry.get('style_1')['name'] == '改名'
+
+
+def test_broken_edit_keeps_previous_templates(path):
+    registry = TemplateRegistry(str(path), check_interval=0)
+    registry.load()
+    path.write_text('{"templates": [', encoding='utf-8')
+    os.utime(path, (2_000_000, 2_000_000))
+    assert not registry.load()
+    assert registry.get('style_1')['name'] == '极简'
@@ -0,0 +1,97 @@
+import json
+import os
+
+import pytest
+
+import services.cache_service as cache_module
+from services.cache_service import CacheService
+from services.template_registry import TemplateRegistry, template_version
+
+
+def template(style_id: str, prompt: str) -> dict:
+    return {
+        'id': style_id,
+        'name': style_id,
+        'prompt_template': prompt,
+        'requirements': ['3:4'],
+        'style_details': {'color': 'red'},
+    }
+
+
+def write_templates(path, templates, mtime=None) -> None:
+    path.write_text(json.dumps({'templates': templates}, ensure_ascii=False), encoding='utf-8')
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_version_tracks_prompt_fields():
+    base = template('style_1', '写一个封面')
+    assert template_version(base) == template_version(dict(base, name='改名', priority=3))
+    assert template_version(base) != template_version(dict(base, prompt_template='写一个新封面'))
+    assert template_version(base) != template_version(dict(base, requirements=['1:1']))
+
+
+def test_stored_version_is_ignored(tmp_path):
+    path = tmp_path / 'templates.json'
+    stale = dict(template('style_1', 'v2'), version=template_version(template('style_1', 'v1')))
+    write_templates(path, [stale])
+    loaded = TemplateRegistry(str(path)).get('style_1')
+    assert loaded['version'] == template_version(template('style_1', 'v2'))
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    path = tmp_path / 'templates.json'
+    write_templates(path, [template('style_1', 'v1'), template('style_2', 'other')], mtime=1_000_000)
+    registry = TemplateRegistry(str(path), check_interval=0)
+    registry.load()
+    monkeypatch.setattr(cache_module, 'template_registry', registry)
+    return registry
+
+
+def test_registry_recomputes_version_after_edit(registry, tmp_path):
+    path = tmp_path / 'templates.json'
+    before = registry.version_of('style_1')
+    data = json.loads(path.read_text(encoding='utf-8'))
+    data['templates'][0]['version'] = before
+    data['templates'][0]['prompt_template'] = 'v2'
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+    os.utime(path, (2_000_000, 2_000_000))
+    assert registry.version_of('style_1') != before
+    assert registry.version_of('missing') == ''
+
+
+def test_template_edit_invalidates_only_that_style(registry, tmp_path):
+    cache = CacheService(str(tmp_path / 'cache'), memory_max_bytes=0)
+    cache.set('标题', '', 'style_1', '<p>v1</p>')
+    cache.set('标题', '', 'style_2', '<p>other</p>')
+    assert cache.get('标题', '', 'style_1') == '<p>v1</p>'
+
+    write_templates(tmp_path / 'templates.json', [template('style_1', 'v2'), template('style_2', 'other')],
+                    mtime=2_000_000)
+    assert cache.get('标题', '', 'style_1') is None
+    assert cache.get('标题', '', 'style_2') == '<p>other</p>'
+
+
+def test_invalidate_style(registry, tmp_path):
+    cache = CacheService(str(tmp_path / 'cache'), memory_max_bytes=1 << 20)
+    cache.set('冷门', '', 'style_1', '<p>a</p>')
+    cache.set('热门', '', 'style_1', '<p>b</p>')
+    cache.set('热门', '', 'style_2', '<p>c</p>')
+    for _ in range(3):
+        cache.get('热门', '', 'style_1')
+
+    cleared, items = cache.invalidate_style('style_1')
+    assert cleared == 2
+    assert [item['title'] for item in items] == ['热门', '冷门']
+    assert cache.get('热门', '', 'style_1') is None
+    assert cache.get('热门', '', 'style_2') == '<p>c</p>'
+
+
+def test_invalidate_reaches_other_workers_memory(registry, tmp_path):
+    worker_a = CacheService(str(tmp_path / 'cache'), memory_max_bytes=1 << 20)
+    worker_b = CacheService(str(tmp_path / 'cache'), memory_max_bytes=1 << 20)
+    worker_a.set('标题', '', 'style_1', '<p>a</p>')
+    assert worker_b.get('标题', '', 'style_1') == '<p>a</p>'
+    worker_a.invalidate_style('style_1')
+    assert worker_b.get('标题', '', 'style_1') is None